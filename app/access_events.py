@@ -0,0 +1,142 @@
+"""
+access_events.py - Push channel for resume access-status changes
+Clients waiting for owner approval block on an in-process waiter instead of
+polling the database. gate_control publishes the change locally, and the
+approval statement itself fires a Postgres NOTIFY on `access_status` so every
+other worker process receives it through one shared LISTEN connection. If
+LISTEN is unavailable the in-process pub/sub still serves the local worker.
+"""
+
+import select
+import threading
+import time
+from app.config import Config
+
+CHANNEL = "access_status"
+
+
+class Waiter:
+    def __init__(self):
+        self.event = threading.Event()
+        self.status = None
+
+
+_waiters = {}  # token -> set of Waiter
+_waiters_lock = threading.Lock()
+_listener = {"thread": None, "connected": False}
+_listener_lock = threading.Lock()
+
+
+def publish(token, status):
+    """Wake everyone waiting on `token` (and refresh the status cache)"""
+    from app import access_tokens
+    access_tokens.cache_status(token, status)
+
+    with _waiters_lock:
+        waiters = list(_waiters.get(token, ()))
+    for waiter in waiters:
+        waiter.status = status
+        waiter.event.set()
+
+
+def _subscribe(token):
+    waiter = Waiter()
+    with _waiters_lock:
+        _waiters.setdefault(token, set()).add(waiter)
+    return waiter
+
+
+def _unsubscribe(token, waiter):
+    with _waiters_lock:
+        waiters = _waiters.get(token)
+        if waiters:
+            waiters.discard(waiter)
+            if not waiters:
+                del _waiters[token]
+
+
+def wait_for_change(token, known_status, timeout):
+    """
+    Block until the token's status differs from `known_status` or `timeout`
+    seconds pass. Returns the latest status. Waiting itself never queries the
+    database; only the initial check may (through the status cache).
+    """
+    from app import access_tokens
+    ensure_listener()
+
+    # Subscribe before checking so a change between the two isn't missed
+    waiter = _subscribe(token)
+    try:
+        current = access_tokens.get_status(token)
+        if current != known_status:
+            return current
+        waiter.event.wait(timeout)
+        return waiter.status or current
+    finally:
+        _unsubscribe(token, waiter)
+
+
+def waiting_count():
+    with _waiters_lock:
+        return sum(len(w) for w in _waiters.values())
+
+
+# =============================================================================
+# Cross-process delivery: one LISTEN connection per worker process
+# =============================================================================
+def ensure_listener():
+    if not Config.ACCESS_PUSH_LISTEN or not Config.DATABASE_URL:
+        return
+    with _listener_lock:
+        thread = _listener["thread"]
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_listen_forever, name="access-listener", daemon=True)
+            thread.start()
+            _listener["thread"] = thread
+
+
+def _listen_forever():
+    import psycopg2
+
+    backoff = 1
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(Config.DATABASE_URL)
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {CHANNEL};")
+            _listener["connected"] = True
+            backoff = 1
+            print(f"📡 [Access] Listening for status changes on '{CHANNEL}'")
+
+            while True:
+                # Wake periodically so a dead socket is noticed
+                readable, _, _ = select.select([conn], [], [], 30)
+                if not readable:
+                    cur.execute("SELECT 1;")
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    token, _, status = notify.payload.rpartition(":")
+                    if token:
+                        publish(token, status)
+        except Exception as e:
+            print(f"⚠️ [Access] Listener disconnected ({e}), in-process delivery only; retrying in {backoff}s")
+        finally:
+            _listener["connected"] = False
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+
+def get_stats():
+    return {
+        "waiting_clients": waiting_count(),
+        "listener_connected": _listener["connected"],
+    }
@@ -0,0 +1,136 @@
+"""
+access_tokens.py - Resume access-token store
+Request, approval and download are each a single conditional statement
+(INSERT ... SELECT WHERE, UPDATE ... RETURNING inside a CTE), run as a
+prepared statement on a pooled connection (a plain query behind a
+transaction pooler, see app/db.py): one round trip per call, and no window
+between "check" and "update" for two concurrent downloads to both consume a
+single-use token. Status lookups
+(polled by the mobile app) go through a short-TTL cache.
+"""
+
+from datetime import datetime, timedelta
+from app.cache import TTLCache
+from app.config import Config
+from app.memory import register_cache
+from app.db import execute_prepared
+
+RATE_LIMIT_PER_HOUR = 3
+
+STATUS_SQL = "SELECT status FROM resume_requests WHERE token = $1"
+
+# The hourly rate-limit count is part of the insert, so there is no round trip
+# between "check" and "insert" for a burst from one IP to slip through
+CREATE_SQL = """
+    INSERT INTO resume_requests (email, token, status, expires_at, hashed_ip, user_agent, platform, country)
+    SELECT $1, $2, 'pending', $3, $4, $5, $6, $7
+    WHERE (SELECT count(*) FROM resume_requests WHERE hashed_ip = $4 AND created_at > $8) < $9
+    RETURNING token
+"""
+
+# prev = state before the statement; changed = whether this call approved it.
+# A successful approval also NOTIFYs waiting clients in every worker
+# (app/access_events.py), still within the same round trip.
+APPROVE_SQL = """
+    WITH prev AS (
+        SELECT status, email FROM resume_requests WHERE token = $1
+    ), approved AS (
+        UPDATE resume_requests SET status = 'approved'
+        WHERE token = $1 AND status <> 'approved'
+        RETURNING token
+    ), notified AS (
+        SELECT pg_notify('access_status', token::text || ':approved') FROM approved
+    )
+    SELECT prev.status, prev.email, EXISTS (SELECT 1 FROM approved), (SELECT count(*) FROM notified) FROM prev
+"""
+
+# Only one concurrent caller can move approved -> used; the loser sees consumed = false
+CONSUME_SQL = """
+    WITH prev AS (
+        SELECT status, expires_at FROM resume_requests WHERE token = $1
+    ), consumed AS (
+        UPDATE resume_requests SET status = 'used'
+        WHERE token = $1 AND status = 'approved' AND expires_at > $2
+        RETURNING token
+    ), notified AS (
+        SELECT pg_notify('access_status', token::text || ':used') FROM consumed
+    )
+    SELECT prev.status, prev.expires_at, EXISTS (SELECT 1 FROM consumed), (SELECT count(*) FROM notified) FROM prev
+"""
+
+
+NOT_FOUND = "not_found"
+_status_cache = TTLCache(Config.ACCESS_STATUS_CACHE_SIZE, Config.ACCESS_STATUS_CACHE_TTL)
+register_cache("access_status", _status_cache)
+
+
+def cache_status(token, status):
+    """Record a status learned elsewhere (e.g. a NOTIFY from another worker)"""
+    _status_cache.set(token, status)
+
+
+def create_request(email, token, expires_at, hashed_ip, user_agent, platform, country):
+    """Insert a pending request unless the IP is over its hourly limit. Returns False if rate limited."""
+    one_hour_ago = datetime.now() - timedelta(hours=1)
+    row = execute_prepared(
+        "access_create", CREATE_SQL,
+        (email, token, expires_at, hashed_ip, user_agent, platform, country, one_hour_ago, RATE_LIMIT_PER_HOUR),
+    )
+    if not row:
+        return False
+    _status_cache.set(token, "pending")
+    return True
+
+
+def get_status(token):
+    """Current status of a token ('not_found' if unknown); at most one round trip"""
+    status = _status_cache.get(token)
+    if status is not None:
+        return status
+    row = execute_prepared("access_status", STATUS_SQL, (token,))
+    status = row[0] if row else NOT_FOUND
+    _status_cache.set(token, status)
+    return status
+
+
+def approve(token):
+    """
+    Owner approval. Returns (result, email):
+      'approved' - this call enabled access
+      'already'  - access was already enabled
+      'not_found'
+    """
+    row = execute_prepared("access_approve", APPROVE_SQL, (token,))
+    if not row:
+        return NOT_FOUND, None
+    _previous, email, changed, _notified = row
+    _status_cache.set(token, "approved")
+    return ("approved" if changed else "already"), email
+
+
+def consume(token):
+    """
+    Single-use download. Returns one of:
+      'consumed' - caller may serve the file
+      'not_found', 'pending', 'used', 'expired', 'restricted'
+    """
+    now = datetime.now()
+    row = execute_prepared("access_consume", CONSUME_SQL, (token, now))
+    if not row:
+        return NOT_FOUND
+
+    status, expires_at, consumed, _notified = row
+    if consumed:
+        _status_cache.set(token, "used")
+        return "consumed"
+    if status == 'pending':
+        return "pending"
+    if status == 'used':
+        return "used"
+    if expires_at is not None and now > expires_at:
+        return "expired"
+    if status == 'approved':
+        # Approved and unexpired but not consumed: a concurrent download won the race
+        _status_cache.set(token, "used")
+        return "used"
+    return "restricted"
@@ -0,0 +1,27 @@
+"""
+admin.py - Guard for operator-only endpoints
+Admin routes require the X-Admin-Token header to match ADMIN_TOKEN. When no
+token is configured the routes answer 404, as if they did not exist.
+"""
+
+import hmac
+from functools import wraps
+from flask import request, jsonify
+from app.config import Config
+
+
+def is_admin_request():
+    expected = Config.ADMIN_TOKEN
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(expected) and hmac.compare_digest(supplied.encode(), expected.encode())
+
+
+def require_admin(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not Config.ADMIN_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        if not is_admin_request():
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -1,22 +1,51 @@
 from flask import Flask, request, jsonify, Response, stream_with_context, send_from_directory
 from datetime import datetime, timedelta
 from flask_cors import CORS
-from app.rag_answer import generate_answer_with_sources
-from app.db import get_connection
+from app.db import pooled_connection
 import json
 import uuid
 import os
-import threading
 from app.config import get_config
+from app.admin import require_admin
+from app import ingest_jobs, memory
+from app.log import get_logger, fields, request_id_var, get_stats as log_stats
 
 import hashlib
-from app.email_service import send_download_alert
+
+# The RAG stack (providers, retrieval, embeddings) and the email client are
+# imported on first use, not at boot, so a cold worker can answer /health
+# before any of them are loaded. Run `python -m app.import_report` to audit.
 
 config = get_config()
+logger = get_logger(__name__)
 app = Flask(__name__)
 # Enhanced CORS for production
 CORS(app, resources={r"/*": {"origins": config.CORS_ORIGINS}})
 
+def start_background_services():
+    """
+    Warm-up (/ready reports when it is done) and the resume watcher
+    (app/ingest_jobs.py). Never started at import: gunicorn starts them per
+    worker (post_worker_init in gunicorn.conf.py), the dev server in __main__.
+    """
+    if config.WARMUP_ON_START:
+        from app import warmup
+        warmup.start_background()
+    if config.INGEST_WATCH:
+        ingest_jobs.start_watcher()
+
+def generate_answer_with_sources(*args, **kwargs):
+    from app.rag_answer import generate_answer_with_sources as _generate
+    return _generate(*args, **kwargs)
+
+def should_profile(headers):
+    from app.profiling import should_profile as _should_profile
+    return _should_profile(headers)
+
+def notify_download(*args, **kwargs):
+    from app.notifications import notify_download as _notify
+    return _notify(*args, **kwargs)
+
 def get_platform_from_ua(ua):
     if not ua: return "Unknown"
     ua = ua.lower()
@@ -27,34 +56,258 @@ def get_platform_from_ua(ua):
     if "linux" in ua: return "Linux"
     return "Other"
 
+def get_session_id(data):
+    """Conversation id from the body or X-Session-Id header (None = stateless)"""
+    from app.sessions import is_valid_session_id
+    session_id = data.get('session_id') or request.headers.get('X-Session-Id')
+    return session_id if is_valid_session_id(session_id) else None
+
+@app.before_request
+def assign_request_id():
+    """Tag every log line emitted for this request (X-Request-Id is honoured if sent)"""
+    incoming = request.headers.get('X-Request-Id', '')
+    request_id = incoming if 0 < len(incoming) <= 64 and incoming.replace('-', '').isalnum() else uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+
+@app.after_request
+def echo_request_id(response):
+    response.headers['X-Request-Id'] = request_id_var.get() or ''
+    return response
+
+# Endpoints that run retrieval + generation; refused while over the memory budget
+MEMORY_GUARDED_ENDPOINTS = {'ask', 'ask_sync', 'ask_batch', 'ask_stream'}
+
+@app.before_request
+def enforce_memory_budget():
+    if request.endpoint in MEMORY_GUARDED_ENDPOINTS:
+        if not memory.admit():
+            response = jsonify({"error": "Server is under memory pressure. Please retry shortly."})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+
+@app.before_request
+def refresh_corpus():
+    """Pick up a re-ingest published by any process (throttled file check)"""
+    if request.endpoint in MEMORY_GUARDED_ENDPOINTS:
+        ingest_jobs.check_corpus_version()
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({"status": "healthy" if config.DATABASE_URL else "unhealthy"}), 200
 
 
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness: 200 only once warm-up has made every required dependency ready"""
+    from app import warmup
+    report = warmup.get_report()
+    return jsonify(report), 200 if report["ready"] else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Operational counters for background subsystems"""
+    from app.notifications import get_stats as notification_stats
+    from app.access_events import get_stats as access_event_stats
+    from app.query_resume import get_stats as retrieval_stats
+    from app.embeddings import get_stats as embedding_stats
+    from app.rag_answer import get_inflight_stats, get_router_stats
+    from app.local_llm import get_stats as local_llm_stats
+    from app.prefetch import get_stats as prefetch_stats
+    from app.streams import get_stats as stream_stats
+    return jsonify({
+        "notifications": notification_stats(),
+        "access_events": access_event_stats(),
+        "retrieval": retrieval_stats(),
+        "embeddings": embedding_stats(),
+        "single_flight": get_inflight_stats(),
+        "providers": get_router_stats(),
+        "local_llm": local_llm_stats(),
+        "prefetch": prefetch_stats(),
+        "streams": stream_stats(),
+        "memory": memory.get_gauges(),
+        "logging": log_stats()
+    }), 200
+
+# =============================================================================
+# Admin: memory instrumentation (X-Admin-Token, see app/admin.py)
+# =============================================================================
+@app.route('/admin/memory', methods=['GET'])
+@require_admin
+def admin_memory():
+    return jsonify({
+        "gauges": memory.get_gauges(),
+        "stages": memory.stage_stats(),
+        "tracing": memory.tracing_status()
+    }), 200
+
+@app.route('/admin/memory/tracemalloc', methods=['POST', 'DELETE'])
+@require_admin
+def admin_tracemalloc():
+    """POST starts tracing (or resets the baseline); DELETE stops it"""
+    if request.method == 'DELETE':
+        return jsonify(memory.stop_tracing()), 200
+    frames = request.args.get('frames', type=int)
+    return jsonify(memory.start_tracing(frames)), 200
+
+@app.route('/admin/memory/diff', methods=['GET'])
+@require_admin
+def admin_memory_diff():
+    """Top allocation growth since tracing started (?top=20&group_by=lineno|filename&reset=1)"""
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return jsonify({"error": "group_by must be lineno, filename or traceback"}), 400
+    diff = memory.snapshot_diff(top=request.args.get('top', 20, type=int), group_by=group_by)
+    if diff is None:
+        return jsonify({"error": "tracemalloc is not running; POST /admin/memory/tracemalloc first"}), 409
+    if request.args.get('reset'):
+        memory.reset_baseline()
+    return jsonify({"diff": diff, "tracing": memory.tracing_status()}), 200
+
+@app.route('/admin/profiles', methods=['GET'])
+@require_admin
+def admin_profiles():
+    """Recent request profiles (newest first)"""
+    from app.profiling import list_profiles
+    return jsonify({"profiles": list_profiles()}), 200
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def admin_profile(profile_id):
+    """Collapsed stacks, ready for flamegraph.pl or speedscope"""
+    from app.profiling import read_profile
+    collapsed = read_profile(profile_id)
+    if collapsed is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return Response(collapsed, mimetype='text/plain')
+
+@app.route('/admin/memory/clear_caches', methods=['POST'])
+@require_admin
+def admin_clear_caches():
+    before = memory.rss_bytes()
+    cleared = memory.clear_caches()
+    return jsonify({
+        "cleared": cleared,
+        "rss_before_mb": round(before / memory.MB, 1),
+        "rss_after_mb": round(memory.rss_bytes() / memory.MB, 1)
+    }), 200
+
+# =============================================================================
+# Admin: re-ingest (see app/ingest_jobs.py)
+# =============================================================================
+@app.route('/admin/ingest', methods=['GET'])
+@require_admin
+def admin_ingest_status():
+    return jsonify(ingest_jobs.get_status()), 200
+
+@app.route('/admin/ingest', methods=['POST'])
+@require_admin
+def admin_ingest_trigger():
+    if not ingest_jobs.request_ingest("admin"):
+        return jsonify({"error": "Another worker is already ingesting", **ingest_jobs.get_status()}), 409
+    return jsonify(ingest_jobs.get_status()), 202
+
 @app.route('/ask', methods=['POST'])
 def ask():
     data = request.json
     question = data.get('question')
     mode = data.get('mode', 'auto')
+    session_id = get_session_id(data)
     
     if not question:
         return jsonify({"error": "Question is required"}), 400
 
+    profile, reason = should_profile(request.headers)
+
     def generate():
         user_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
         if ',' in user_ip: user_ip = user_ip.split(',')[0].strip()
-        print(f"🌍 [API] Request from IP: {user_ip} | Mode: {mode}")
+        logger.info("🌍 [API] Request from IP: %s", user_ip, extra=fields(mode=mode))
         
-        for chunk in generate_answer_with_sources(question, user_ip=user_ip, mode=mode):
+        # A profiled request runs its own pipeline so the samples show the real work
+        for chunk in generate_answer_with_sources(question, user_ip=user_ip, mode=mode, session_id=session_id, coalesce=not profile):
             yield json.dumps(chunk) + "\n"
 
-    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if not profile:
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    from app.profiling import new_profile_id, profile_stream
+    profile_id = new_profile_id()
+    response = Response(
+        stream_with_context(profile_stream(generate(), profile_id, "/ask", reason)),
+        mimetype='application/x-ndjson'
+    )
+    response.headers['X-Profile-Id'] = profile_id
+    return response
+
+def sse_response(stream, start_index):
+    """SSE response replaying `stream` from `start_index`, compressed when worth it"""
+    from app import streams
+    encoding = streams.choose_encoding(request.headers.get('Accept-Encoding'), streams.replay_bytes(stream, start_index))
+    body = streams.sse_events(stream, start_index)
+    if encoding:
+        body = streams.compress(body, encoding)
+    response = Response(stream_with_context(body), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx would otherwise hold the events back
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def resume_stream(last_event_id, stream_id=None):
+    """Response continuing a buffered stream after Last-Event-ID, or None if it is gone"""
+    from app import streams
+    event_stream_id, index = streams.parse_last_event_id(last_event_id)
+    if stream_id and event_stream_id not in (None, stream_id):
+        return None
+    stream = streams.resume(stream_id or event_stream_id)
+    if stream is None:
+        return None
+    start_index = index + 1 if index is not None else 0
+    logger.info("🔁 [API] Resuming stream %s", stream.id, extra=fields(from_event=start_index))
+    return sse_response(stream, start_index)
+
+@app.route('/ask_stream', methods=['POST'])
+def ask_stream():
+    """
+    /ask as Server-Sent Events with event ids. A client that drops sends the
+    same request again (or GET /ask_stream/<stream_id>) with Last-Event-ID
+    and continues from there instead of regenerating (see app/streams.py).
+    """
+    from app import streams
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id:
+        resumed = resume_stream(last_event_id)
+        if resumed is not None:
+            return resumed
+
+    data = request.json or {}
+    question = data.get('question')
+    mode = data.get('mode', 'auto')
+    session_id = get_session_id(data)
+    if not question:
+        return jsonify({"error": "Question is required"}), 400
+
+    user_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    if ',' in user_ip: user_ip = user_ip.split(',')[0].strip()
+    logger.info("🌍 [API] SSE request from IP: %s", user_ip, extra=fields(mode=mode))
+
+    stream = streams.start(lambda: generate_answer_with_sources(question, user_ip=user_ip, mode=mode, session_id=session_id))
+    return sse_response(stream, 0)
+
+@app.route('/ask_stream/<stream_id>', methods=['GET'])
+def ask_stream_resume(stream_id):
+    """EventSource-friendly resume: replays from the start without Last-Event-ID"""
+    resumed = resume_stream(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'), stream_id)
+    if resumed is None:
+        return jsonify({"error": "Stream expired or unknown. Please ask again."}), 404
+    return resumed
 
 @app.route('/request_resume', methods=['POST'])
 def request_resume():
     """Initiates the resume_access_control flow with rate limiting and neutral wording"""
+    from app import access_tokens
     data = request.json
     email = data.get('email')
     
@@ -66,26 +319,6 @@ def request_resume():
     hashed_ip = hashlib.sha256(user_ip.encode()).hexdigest()
     
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        
-        # 1. Rate Limiting: Max 3 requests per IP per hour
-        one_hour_ago = datetime.now() - timedelta(hours=1)
-        cur.execute(
-            "SELECT count(*) FROM resume_requests WHERE hashed_ip = %s AND created_at > %s",
-            (hashed_ip, one_hour_ago)
-        )
-        request_count = cur.fetchone()[0]
-        
-        if request_count >= 3:
-            cur.close()
-            conn.close()
-            return jsonify({
-                "error": "Rate limit exceeded. Please try again later.",
-                "message": "To ensure system availability, requests are limited. Please wait an hour."
-            }), 429
-
-        # 2. Generate Access Request
         user_agent = request.headers.get('User-Agent', 'Unknown')
         platform = get_platform_from_ua(user_agent)
         country = request.headers.get('CF-IPCountry', 'Unknown')
@@ -94,22 +327,16 @@ def request_resume():
         # Updated Expiry: 24 hours
         expires_at = datetime.now() + timedelta(hours=24)
         
-        cur.execute(
-            """INSERT INTO resume_requests 
-               (email, token, status, expires_at, hashed_ip, user_agent, platform, country) 
-               VALUES (%s, %s, 'pending', %s, %s, %s, %s, %s)""",
-            (email, token, expires_at, hashed_ip, user_agent, platform, country)
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        # Rate Limiting: Max 3 requests per IP per hour
+        created = access_tokens.create_request(email, token, expires_at, hashed_ip, user_agent, platform, country)
+        if not created:
+            return jsonify({
+                "error": "Rate limit exceeded. Please try again later.",
+                "message": "To ensure system availability, requests are limited. Please wait an hour."
+            }), 429
         
-        # Notify owner in background
-        thread = threading.Thread(
-            target=send_download_alert, 
-            args=(email, token)
-        )
-        thread.start()
+        # Notify owner in background (queued; the request never waits on email)
+        notify_download(email, "Access Request", f"Approve access: {request.host_url}gate_control/{token}")
         
         return jsonify({
             "status": "success",
@@ -117,47 +344,59 @@ def request_resume():
             "message": "Your request is being processed. Resume access will be enabled shortly. This helps ensure availability and prevent misuse."
         }), 200
     except Exception as e:
-        print(f"❌ [Access Control] Error: {e}")
+        logger.error("❌ [Access Control] Error: %s", e)
         return jsonify({"error": "Internal system error. Please try again later."}), 500
 
 @app.route('/check_access_status/<token>', methods=['GET'])
 def check_access_status(token):
     """Internal: Part of access_gate. App polls this to see if owner enabled access."""
+    from app import access_tokens
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT status FROM resume_requests WHERE token = %s", (token,))
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if not result:
+        status = access_tokens.get_status(token)
+        if status == access_tokens.NOT_FOUND:
             return jsonify({"status": "not_found"}), 404
             
-        return jsonify({"status": result[0]}), 200
+        return jsonify({"status": status}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/wait_access_status/<token>', methods=['GET'])
+def wait_access_status(token):
+    """
+    Long-poll replacement for check_access_status: blocks until the status
+    differs from ?since= (default 'pending') or the wait times out, then
+    returns it. Waiting costs no DB queries; approval wakes it immediately.
+    """
+    from app import access_events, access_tokens
+    since = request.args.get('since', 'pending')
+    try:
+        timeout = min(float(request.args.get('timeout', config.ACCESS_WAIT_MAX_SECONDS)), config.ACCESS_WAIT_MAX_SECONDS)
+    except ValueError:
+        return jsonify({"error": "timeout must be a number"}), 400
+
+    try:
+        status = access_events.wait_for_change(token, since, max(timeout, 0))
+        if status == access_tokens.NOT_FOUND:
+            return jsonify({"status": "not_found"}), 404
+        return jsonify({"status": status, "changed": status != since}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/gate_control/<token>', methods=['GET'])
 def gate_control(token):
     """Internal: Secret endpoint for owner to enable resume access."""
+    from app import access_events, access_tokens
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT status, email FROM resume_requests WHERE token = %s", (token,))
-        result = cur.fetchone()
+        result, email = access_tokens.approve(token)
         
-        if not result:
+        if result == access_tokens.NOT_FOUND:
             return "<h1>❌ Invalid Request</h1>", 404
             
-        status, email = result
-        if status == 'approved':
+        if result == 'already':
             return f"<h1>✅ Already Enabled</h1><p>Access for {email} is already active.</p>"
-            
-        cur.execute("UPDATE resume_requests SET status = 'approved' WHERE token = %s", (token,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        
+        # Wake clients waiting in this worker (other workers hear the NOTIFY)
+        access_events.publish(token, 'approved')
         
         return f"<h1>✅ Access Enabled</h1><p>Resume access for <b>{email}</b> has been unlocked in-app.</p>"
     except Exception as e:
@@ -166,50 +405,38 @@ def gate_control(token):
 @app.route('/download_resume', methods=['GET'])
 def download_resume():
     """Validates if access_gate is cleared and serves the file (Single Use)"""
+    from app import access_tokens
     token = request.args.get('token')
     
     if not token:
         return "<h1>❌ Access Denied</h1><p>Request access via the app first.</p>", 403
         
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT status, expires_at FROM resume_requests WHERE token = %s", 
-            (token,)
-        )
-        result = cur.fetchone()
+        # Check and mark-as-used happen in one statement, so a token can't be consumed twice
+        result = access_tokens.consume(token)
         
-        if not result:
+        if result == access_tokens.NOT_FOUND:
             return "<h1>❌ Link Invalid</h1>", 404
-            
-        status, expires_at = result
         
-        if status == 'pending':
+        if result == 'pending':
             return "<h1>⏳ Access Pending</h1><p>Your request is still being processed.</p>", 403
             
-        if status == 'used':
+        if result == 'used':
             return "<h1>❌ Link Expired</h1><p>This single-use access has already been consumed.</p>", 403
             
-        if datetime.now() > expires_at:
+        if result == 'expired':
             return "<h1>❌ Request Timed Out</h1><p>Please initiate a new request (24h limit).</p>", 403
             
-        if status != 'approved':
+        if result != 'consumed':
             return "<h1>❌ Access Restricted</h1>", 403
 
-        # Success! Mark as used and serve
-        cur.execute("UPDATE resume_requests SET status = 'used' WHERE token = %s", (token,))
-        conn.commit()
-        cur.close()
-        conn.close()
-        
         resume_dir = os.path.join(app.root_path, '..', 'data')
         filename = 'resume.pdf' if os.path.exists(os.path.join(resume_dir, 'resume.pdf')) else 'resume.md'
         
         return send_from_directory(resume_dir, filename, as_attachment=True)
         
     except Exception as e:
-        print(f"❌ [API] Download Error: {e}")
+        logger.error("❌ [API] Download Error: %s", e)
         return f"<h1>❌ System Error</h1><p>{str(e)}</p>", 500
 
 @app.route('/ask_sync', methods=['POST'])
@@ -218,26 +445,52 @@ def ask_sync():
     data = request.json
     question = data.get('question')
     mode = data.get('mode', 'auto')
+    session_id = get_session_id(data)
     
     if not question:
         return jsonify({"error": "Question is required"}), 400
 
-    full_answer = ""
-    metadata = None
+    from app.rag_answer import collect_answer
     
     user_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
     if ',' in user_ip: user_ip = user_ip.split(',')[0].strip()
     
-    for chunk in generate_answer_with_sources(question, user_ip=user_ip, mode=mode):
-        if chunk.get("answer_chunk"):
-            full_answer += chunk["answer_chunk"]
-        if chunk.get("metadata"):
-            metadata = chunk["metadata"]
+    profile, reason = should_profile(request.headers)
+    stream = generate_answer_with_sources(question, user_ip=user_ip, mode=mode, session_id=session_id, coalesce=not profile)
+    profile_id = None
+    if profile:
+        from app.profiling import new_profile_id, profile_stream
+        profile_id = new_profile_id()
+        stream = profile_stream(stream, profile_id, "/ask_sync", reason)
+    
+    full_answer, metadata = collect_answer(stream)
             
-    return jsonify({
+    response = jsonify({
         "answer": full_answer,
         "metadata": metadata
     })
+    if profile_id:
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+@app.route('/ask_batch', methods=['POST'])
+def ask_batch():
+    """Several independent questions in one call; answers are returned in order"""
+    from app.rag_answer import answer_batch
+    data = request.json or {}
+    questions = data.get('questions')
+    mode = data.get('mode', 'auto')
+    
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+        return jsonify({"error": "questions must be a non-empty list of strings"}), 400
+    if len(questions) > config.BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {config.BATCH_MAX_QUESTIONS} questions per batch"}), 400
+    
+    user_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    if ',' in user_ip: user_ip = user_ip.split(',')[0].strip()
+    logger.info("🌍 [API] Batch of %d from IP: %s", len(questions), user_ip, extra=fields(mode=mode))
+    
+    return jsonify({"results": answer_batch(questions, user_ip=user_ip, mode=mode)})
 
 
 
@@ -256,37 +509,37 @@ def log_download():
     if user_ip and ',' in user_ip: user_ip = user_ip.split(',')[0].strip()
     hashed_ip = hashlib.sha256(user_ip.encode()).hexdigest()
     
-    # Satisfying DB Constraints
-    real_uuid = str(uuid.uuid4())
-    future_expiry = datetime.now() + timedelta(days=365 * 100) # Prevents null error
+    # 1. Send Email Alert in Background
+    # Queued to the notification workers so the recruiter doesn't wait for the
+    # email API, and before the insert so a database problem can't swallow it
+    notify_download(email, f"Instant Download ({source_ref})", f"Platform: {platform} | IP: {user_ip}")
 
     try:
-        # 1. Save to Database
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(
-            """INSERT INTO resume_requests 
-               (email, token, status, hashed_ip, user_agent, platform, expires_at) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-            (email, real_uuid, f"Downloaded ({source_ref})", hashed_ip, user_agent, platform, future_expiry)
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        # 2. Send Email Alert in Background
-        # We use threading so the recruiter doesn't have to wait for the email API to finish
-        email_thread = threading.Thread(
-            target=send_download_alert, 
-            args=(email, f"Instant Download ({source_ref})", f"Platform: {platform} | IP: {user_ip}")
-        )
-        email_thread.start()
+        # 2. Save to Database (download_events is partitioned by month, see app/schema.py)
+        with pooled_connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    """INSERT INTO download_events 
+                       (email, source_ref, hashed_ip, user_agent, platform) 
+                       VALUES (%s, %s, %s, %s, %s)""",
+                    (email, source_ref, hashed_ip, user_agent, platform)
+                )
+            finally:
+                cur.close()
         
         return jsonify({"status": "success", "message": "Log recorded and alert triggered"}), 200
     except Exception as e:
-        print(f"❌ [API] Log Error: {e}")
+        logger.error("❌ [API] Download log failed (schema migrated? python -m app.schema): %s", e)
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
+    if config.SCHEMA_MIGRATE_ON_START:
+        from app.schema import migrate
+        try:
+            migrate()
+        except Exception as e:
+            logger.error("❌ [Schema] Migration failed, database endpoints will error: %s", e)
+    start_background_services()
     # Listen on all interfaces so mobile device can connect
     app.run(host='0.0.0.0', port=5000, debug=True)
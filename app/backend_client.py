@@ -0,0 +1,55 @@
+"""
+backend_client.py - Thin HTTP client for the RAG API
+Used by the Streamlit UI when BACKEND_URL is set, so UI replicas only render
+and stream; retrieval, DB access and provider calls all stay in the API
+workers. One instance is shared per UI process (keep-alive connection pool).
+"""
+
+import json
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class BackendError(Exception):
+    pass
+
+
+class BackendClient:
+    def __init__(self, base_url, connect_timeout=3.05, read_timeout=120, pool_size=20):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def stream_answer(self, question, mode="auto", session_id=None):
+        """Yield the /ask NDJSON chunks ({"answer_chunk", "metadata"}) as they arrive"""
+        payload = {"question": question, "mode": mode}
+        if session_id:
+            payload["session_id"] = session_id
+
+        try:
+            with self.session.post(f"{self.base_url}/ask", json=payload, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except requests.RequestException as e:
+            raise BackendError(f"Backend request failed: {e}") from e
+
+    def log_download(self, email, source_ref):
+        try:
+            self.session.post(
+                f"{self.base_url}/log_download",
+                json={"email": email, "source_ref": source_ref},
+                timeout=5
+            )
+            return True
+        except requests.RequestException as e:
+            print(f"⚠️ [UI] Download log failed: {e}")
+            return False
@@ -1,7 +1,9 @@
-# app/chunker.py
-from langchain.text_splitter import MarkdownHeaderTextSplitter
+# app/chunker.py (ingest-only)
 
 def chunk_markdown(text):
+    # Imported here so langchain is only loaded by ingest tooling, never by the API
+    from langchain.text_splitter import MarkdownHeaderTextSplitter
+
     headers_to_split_on = [
         ("#", "Header 1"),
         ("##", "Header 2"),
@@ -12,4 +14,4 @@ def chunk_markdown(text):
     md_header_splits = markdown_splitter.split_text(text)
     
     # Return the text content of each split
-    return [split.page_content for split in md_header_splits]
\ No newline at end of file
+    return [split.page_content for split in md_header_splits]
@@ -14,8 +14,181 @@ class Config:
     GROQ_API_KEY = os.getenv('GROQ_API_KEY')
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     
+    # Database Pool (hot-path queries)
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+    DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'auto').lower()  # auto | on | off
+    
+    # Retrieval Tuning (see `python -m app.retrieval_eval`)
+    RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', 7))
+    VECTOR_MIN_SIMILARITY = float(os.getenv('VECTOR_MIN_SIMILARITY', 0.25))
+    KEYWORD_LIMIT = int(os.getenv('KEYWORD_LIMIT', 3))
+    ANSWER_MIN_SCORE = float(os.getenv('ANSWER_MIN_SCORE', 0.12))
+    ANSWER_MAX_CHUNKS = int(os.getenv('ANSWER_MAX_CHUNKS', 6))
+    
+    # Adaptive Retrieval: probe small, stop early on a clear winner
+    ADAPTIVE_RETRIEVAL = os.getenv('ADAPTIVE_RETRIEVAL', 'true').lower() == 'true'
+    PROBE_TOP_K = int(os.getenv('PROBE_TOP_K', 3))
+    EARLY_EXIT_MIN_SCORE = float(os.getenv('EARLY_EXIT_MIN_SCORE', 0.6))
+    EARLY_EXIT_MARGIN = float(os.getenv('EARLY_EXIT_MARGIN', 0.08))
+    EXPAND_MIN_SCORE = float(os.getenv('EXPAND_MIN_SCORE', 0.45))
+    
+    # Shared Vector Index: ingest writes it, every worker maps it read-only
+    VECTOR_INDEX = os.getenv('VECTOR_INDEX', 'mmap').lower()  # mmap | postgres
+    VECTOR_INDEX_DIR = os.getenv('VECTOR_INDEX_DIR', 'data/index')
+    VECTOR_INDEX_CHECK_SECONDS = int(os.getenv('VECTOR_INDEX_CHECK_SECONDS', 5))
+    
+    # Embedding provider: tight timeout on the request path, back off after failures
+    EMBEDDING_TIMEOUT_SECONDS = float(os.getenv('EMBEDDING_TIMEOUT_SECONDS', 2.5))
+    EMBEDDING_FAILURE_THRESHOLD = int(os.getenv('EMBEDDING_FAILURE_THRESHOLD', 2))
+    EMBEDDING_BACKOFF_SECONDS = int(os.getenv('EMBEDDING_BACKOFF_SECONDS', 5))
+    EMBEDDING_BACKOFF_MAX_SECONDS = int(os.getenv('EMBEDDING_BACKOFF_MAX_SECONDS', 120))
+    
+    # Hierarchical Chunks: embed small children, answer with a parent window
+    CHILD_MIN_CHARS = int(os.getenv('CHILD_MIN_CHARS', 40))
+    EXPAND_TO_PARENT = os.getenv('EXPAND_TO_PARENT', 'true').lower() == 'true'
+    PARENT_SIBLING_WINDOW = int(os.getenv('PARENT_SIBLING_WINDOW', 1))
+    PARENT_WINDOW_CHARS = int(os.getenv('PARENT_WINDOW_CHARS', 1200))
+    
+    # Near-duplicate chunk filtering (app/dedup.py), at ingest and merge time
+    DEDUP_NEAR_DUPLICATES = os.getenv('DEDUP_NEAR_DUPLICATES', 'true').lower() == 'true'
+    DEDUP_MAX_DISTANCE = int(os.getenv('DEDUP_MAX_DISTANCE', 3))  # of 64 SimHash bits
+    
+    # Coalesce identical concurrent questions into one pipeline run
+    SINGLE_FLIGHT = os.getenv('SINGLE_FLIGHT', 'true').lower() == 'true'
+    
+    # /ask_batch
+    BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 10))
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+    
+    # LLM provider routing (app/provider_router.py)
+    LLM_MAX_OUTPUT_TOKENS = int(os.getenv('LLM_MAX_OUTPUT_TOKENS', 800))
+    ROUTER_ADAPTIVE = os.getenv('ROUTER_ADAPTIVE', 'true').lower() == 'true'
+    ROUTER_EWMA_ALPHA = float(os.getenv('ROUTER_EWMA_ALPHA', 0.2))
+    ROUTER_PRIOR_LATENCY_MS = int(os.getenv('ROUTER_PRIOR_LATENCY_MS', 2000))
+    ROUTER_ERROR_PENALTY_MS = int(os.getenv('ROUTER_ERROR_PENALTY_MS', 5000))
+    ROUTER_EXPLORE_RATE = float(os.getenv('ROUTER_EXPLORE_RATE', 0.05))
+    ROUTER_TOKEN_BUDGETS = os.getenv('ROUTER_TOKEN_BUDGETS', '')  # per minute, e.g. "Groq=6000,Gemini=30000"
+    
+    # Background re-ingest (app/ingest_jobs.py)
+    INGEST_WATCH = os.getenv('INGEST_WATCH', 'false').lower() == 'true'
+    INGEST_WATCH_DIR = os.getenv('INGEST_WATCH_DIR', 'data')
+    INGEST_WATCH_FILES = os.getenv('INGEST_WATCH_FILES', 'resume.md')
+    INGEST_DEBOUNCE_SECONDS = float(os.getenv('INGEST_DEBOUNCE_SECONDS', 3))
+    INGEST_REBUILD_FAQ = os.getenv('INGEST_REBUILD_FAQ', 'true').lower() == 'true'
+    INGEST_STATE_DIR = os.getenv('INGEST_STATE_DIR', 'data/jobs')
+    CORPUS_CHECK_SECONDS = int(os.getenv('CORPUS_CHECK_SECONDS', 5))
+    
+    # Local generation (app/local_llm.py). LLM_MODE: cloud | local_first | local
+    LLM_MODE = os.getenv('LLM_MODE', 'cloud').lower()
+    OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+    OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.2')
+    OLLAMA_KEEP_ALIVE_SECONDS = int(os.getenv('OLLAMA_KEEP_ALIVE_SECONDS', 1800))  # -1 = never unload
+    OLLAMA_NUM_CTX = int(os.getenv('OLLAMA_NUM_CTX', 4096))  # one value for every worker
+    OLLAMA_CONCURRENCY = int(os.getenv('OLLAMA_CONCURRENCY', 1))  # per host; match the server's OLLAMA_NUM_PARALLEL
+    OLLAMA_LOCK_DIR = os.getenv('OLLAMA_LOCK_DIR', 'data/jobs')
+    OLLAMA_QUEUE_TIMEOUT = float(os.getenv('OLLAMA_QUEUE_TIMEOUT', 10))
+    OLLAMA_CONNECT_TIMEOUT = float(os.getenv('OLLAMA_CONNECT_TIMEOUT', 3))
+    OLLAMA_LOAD_TIMEOUT = float(os.getenv('OLLAMA_LOAD_TIMEOUT', 120))
+    
+    # Speculative follow-up prefetch from query_logs (app/prefetch.py)
+    PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'false').lower() == 'true'
+    PREFETCH_MAX_QUESTIONS = int(os.getenv('PREFETCH_MAX_QUESTIONS', 2))  # per answered question
+    PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', 1))
+    PREFETCH_QUEUE_SIZE = int(os.getenv('PREFETCH_QUEUE_SIZE', 8))
+    PREFETCH_MAX_INFLIGHT = int(os.getenv('PREFETCH_MAX_INFLIGHT', 2))  # live answers that pause prefetching
+    PREFETCH_MAX_DELAY_SECONDS = float(os.getenv('PREFETCH_MAX_DELAY_SECONDS', 30))
+    PREFETCH_RETRIEVALS_PER_MINUTE = int(os.getenv('PREFETCH_RETRIEVALS_PER_MINUTE', 20))
+    PREFETCH_ANSWERS = os.getenv('PREFETCH_ANSWERS', 'false').lower() == 'true'
+    PREFETCH_ANSWERS_PER_HOUR = int(os.getenv('PREFETCH_ANSWERS_PER_HOUR', 20))
+    PREFETCH_ANSWER_TTL = int(os.getenv('PREFETCH_ANSWER_TTL', 900))
+    PREFETCH_LOG_DAYS = int(os.getenv('PREFETCH_LOG_DAYS', 30))
+    PREFETCH_LOG_REFRESH_SECONDS = int(os.getenv('PREFETCH_LOG_REFRESH_SECONDS', 3600))
+    PREFETCH_MIN_TRANSITIONS = int(os.getenv('PREFETCH_MIN_TRANSITIONS', 2))
+    
+    # Resumable SSE streams (app/streams.py). STREAM_COMPRESSION: auto | gzip | off
+    STREAM_BUFFER_TTL_SECONDS = int(os.getenv('STREAM_BUFFER_TTL_SECONDS', 120))
+    STREAM_BUFFER_MAX = int(os.getenv('STREAM_BUFFER_MAX', 200))
+    STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 15))
+    STREAM_COMPRESSION = os.getenv('STREAM_COMPRESSION', 'auto').lower()
+    STREAM_COMPRESS_MIN_BYTES = int(os.getenv('STREAM_COMPRESS_MIN_BYTES', 1024))
+    
+    # Serving Caches
+    EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', 512))
+    EMBEDDING_CACHE_TTL = int(os.getenv('EMBEDDING_CACHE_TTL', 86400))
+    RETRIEVAL_CACHE_SIZE = int(os.getenv('RETRIEVAL_CACHE_SIZE', 256))
+    RETRIEVAL_CACHE_TTL = int(os.getenv('RETRIEVAL_CACHE_TTL', 600))
+    
+    # Warm-up / Readiness
+    WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'true').lower() == 'true'
+    WARMUP_RETRY_SECONDS = float(os.getenv('WARMUP_RETRY_SECONDS', 15))
+    WARMUP_MAX_RETRIES = int(os.getenv('WARMUP_MAX_RETRIES', 20))
+    WARMUP_QUESTIONS = [q.strip() for q in os.getenv(
+        'WARMUP_QUESTIONS',
+        "What technologies did Sahil use in his projects?;What is his CGPA?;What machine learning experience does he have?"
+    ).split(';') if q.strip()]
+    
+    # Conversation Sessions (server-side follow-up context)
+    SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', 1000))
+    SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 1800))
+    SESSION_MAX_TURNS = int(os.getenv('SESSION_MAX_TURNS', 6))
+    
+    # Intent Routing & Precomputed FAQ Answers
+    INTENT_STRONG_MATCH = float(os.getenv('INTENT_STRONG_MATCH', 0.8))
+    INTENT_WEAK_MATCH = float(os.getenv('INTENT_WEAK_MATCH', 0.5))
+    FAQ_REFRESH_SECONDS = int(os.getenv('FAQ_REFRESH_SECONDS', 600))
+    
+    # Owner Email Alerts (bounded worker pool)
+    NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', 2))
+    NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', 200))
+    NOTIFY_DIGEST_WINDOW = float(os.getenv('NOTIFY_DIGEST_WINDOW', 5))
+    NOTIFY_MAX_BATCH = int(os.getenv('NOTIFY_MAX_BATCH', 25))
+    NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', 3))
+    NOTIFY_BACKOFF_SECONDS = float(os.getenv('NOTIFY_BACKOFF_SECONDS', 2))
+    
+    # Resume Access Tokens
+    ACCESS_STATUS_CACHE_TTL = float(os.getenv('ACCESS_STATUS_CACHE_TTL', 2))
+    ACCESS_STATUS_CACHE_SIZE = int(os.getenv('ACCESS_STATUS_CACHE_SIZE', 5000))
+    ACCESS_PUSH_LISTEN = os.getenv('ACCESS_PUSH_LISTEN', 'true').lower() == 'true'
+    ACCESS_WAIT_MAX_SECONDS = float(os.getenv('ACCESS_WAIT_MAX_SECONDS', 25))
+    
+    # Log tables (app/schema.py): monthly partitions and retention
+    SCHEMA_MIGRATE_ON_START = os.getenv('SCHEMA_MIGRATE_ON_START', 'true').lower() == 'true'
+    LOG_PARTITIONS_AHEAD = int(os.getenv('LOG_PARTITIONS_AHEAD', 2))
+    LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', 180))
+    RESUME_REQUEST_RETENTION_DAYS = int(os.getenv('RESUME_REQUEST_RETENTION_DAYS', 90))
+    
+    # Admin endpoints (disabled unless a token is set)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    
+    # Memory budget (0 = disabled) and instrumentation
+    MEMORY_SOFT_LIMIT_MB = int(os.getenv('MEMORY_SOFT_LIMIT_MB', 0))
+    MEMORY_SHED_LIMIT_MB = int(os.getenv('MEMORY_SHED_LIMIT_MB', 0))
+    MEMORY_CHECK_SECONDS = float(os.getenv('MEMORY_CHECK_SECONDS', 1))
+    MEMORY_CLEAR_COOLDOWN_SECONDS = int(os.getenv('MEMORY_CLEAR_COOLDOWN_SECONDS', 300))
+    MEMORY_STAGE_TRACKING = os.getenv('MEMORY_STAGE_TRACKING', 'true').lower() == 'true'
+    MEMORY_COUNT_OBJECTS = os.getenv('MEMORY_COUNT_OBJECTS', 'false').lower() == 'true'
+    TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', 1))
+    
+    # Request profiling (signed X-Profile header or random sampling)
+    PROFILE_SECRET = os.getenv('PROFILE_SECRET', '')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'data/profiles')
+    PROFILE_RING_SIZE = int(os.getenv('PROFILE_RING_SIZE', 50))
+    
+    # Logging (app/log.py)
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json' if APP_ENV == 'prod' else 'text').lower()
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')  # e.g. "app.query_resume=DEBUG,app.db=WARNING"
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    LOG_DEBUG_RATE = float(os.getenv('LOG_DEBUG_RATE', 20))
+    LOG_DEBUG_SAMPLE = float(os.getenv('LOG_DEBUG_SAMPLE', 0.01))
+    
     # Gunicorn / Production Settings
     PORT = int(os.getenv('PORT', 5000))
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
     DEBUG = APP_ENV == 'dev'
 
 class ProductionConfig(Config):
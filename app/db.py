@@ -1,20 +1,28 @@
-import psycopg2
 import os
+import re
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from app.config import Config
+from app.log import get_logger
 
 # This looks for the .env file
 load_dotenv() 
 
+logger = get_logger(__name__)
+
 def get_connection():
     url = os.getenv("DATABASE_URL")
     if not url:
-        print("❌ [DB] DATABASE_URL not found!")
+        logger.error("❌ [DB] DATABASE_URL not found!")
         raise ValueError("DATABASE_URL not found in environment variables")
+    # psycopg2 is imported on first connect so /health never pays for it
+    import psycopg2
     try:
         conn = psycopg2.connect(url)
         return conn
     except Exception as e:
-        print(f"❌ [DB] Connection failed: {e}")
+        logger.error("❌ [DB] Connection failed: %s", e)
         raise e
 
 def log_resume_download(email, purpose, note, source_ref=None, browser=None):
@@ -30,7 +38,147 @@ def log_resume_download(email, purpose, note, source_ref=None, browser=None):
         cur.close()
         return True
     except Exception as e:
-        print(f"❌ [DB] Error: {e}")
+        logger.error("❌ [DB] Error: %s", e)
         return False
     finally:
-        if conn: conn.close()
\ No newline at end of file
+        if conn: conn.close()
+
+# =============================================================================
+# Pooled connections + server-side prepared statements (hot paths)
+# =============================================================================
+_pool = None
+_pool_slots = threading.BoundedSemaphore(Config.DB_POOL_MAX)
+_pool_lock = threading.Lock()
+
+
+def _connection_factory():
+    import psycopg2.extensions
+
+    class PreparingConnection(psycopg2.extensions.connection):
+        """Connection that remembers which statements it has already PREPAREd"""
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.prepared = set()
+
+    return PreparingConnection
+
+
+def get_pool():
+    """Lazily create the process-wide pool (never at import time)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                url = os.getenv("DATABASE_URL")
+                if not url:
+                    raise ValueError("DATABASE_URL not found in environment variables")
+                from psycopg2.pool import ThreadedConnectionPool
+                _pool = ThreadedConnectionPool(
+                    Config.DB_POOL_MIN,
+                    Config.DB_POOL_MAX,
+                    url,
+                    connection_factory=_connection_factory()
+                )
+                logger.info("🔌 [DB] Connection pool ready (%s-%s)", Config.DB_POOL_MIN, Config.DB_POOL_MAX)
+    return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow an autocommit connection from the pool. Waits up to
+    DB_POOL_TIMEOUT seconds for a free slot instead of failing immediately.
+    """
+    if not _pool_slots.acquire(timeout=Config.DB_POOL_TIMEOUT):
+        raise TimeoutError("Timed out waiting for a database connection")
+    pool = None
+    conn = None
+    try:
+        pool = get_pool()
+        conn = pool.getconn()
+        if not conn.autocommit:
+            conn.autocommit = True
+        yield conn
+    finally:
+        if conn is not None:
+            pool.putconn(conn, close=bool(conn.closed))
+        _pool_slots.release()
+
+
+_PLACEHOLDER = re.compile(r"\$(\d+)")
+
+
+def prepared_statements_enabled():
+    """
+    DB_PREPARED_STATEMENTS=auto turns them off behind a transaction-mode
+    pooler (PgBouncer, Supabase port 6543): consecutive statements may run on
+    different server connections, which don't have the statement prepared.
+    """
+    setting = Config.DB_PREPARED_STATEMENTS
+    if setting != "auto":
+        return setting in ("on", "true")
+    url = (os.getenv("DATABASE_URL") or "").lower()
+    return not (":6543" in url or "pgbouncer" in url or "pooler" in url)
+
+
+def _deallocate(conn, name):
+    """Forget a statement whose PREPARE may or may not have reached the server"""
+    conn.prepared.discard(name)
+    if conn.closed:
+        return
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DEALLOCATE {name}")
+    except Exception:
+        pass  # it was never prepared
+    finally:
+        cur.close()
+
+
+def execute_prepared(name, sql, params=(), fetch="one"):
+    """
+    Run a named prepared statement on a pooled connection.
+    `sql` uses $1, $2 ... placeholders. The first use on a connection sends
+    PREPARE and EXECUTE in the same message, so every call costs exactly one
+    round trip. A connection that died while idle in the pool is replaced
+    and the statement retried once. Any other error deallocates the
+    statement, so the connection's record of what it has prepared stays true.
+    When prepared statements are disabled the same SQL runs as a plain query.
+    """
+    import psycopg2
+
+    if prepared_statements_enabled():
+        placeholders = ", ".join(["%s"] * len(params))
+        execute_sql = f"EXECUTE {name}({placeholders})" if params else f"EXECUTE {name}"
+    else:
+        execute_sql = _PLACEHOLDER.sub("%s", sql.replace("%", "%%"))
+        params = tuple(params[int(n) - 1] for n in _PLACEHOLDER.findall(sql))
+        name = None
+
+    for attempt in (1, 2):
+        try:
+            with pooled_connection() as conn:
+                cur = conn.cursor()
+                try:
+                    if name is None or name in conn.prepared:
+                        cur.execute(execute_sql, params)
+                    else:
+                        prepare_sql = f"PREPARE {name} AS {sql};".replace("%", "%%")
+                        conn.prepared.add(name)
+                        cur.execute(prepare_sql + execute_sql, params)
+
+                    if fetch == "one":
+                        return cur.fetchone()
+                    if fetch == "all":
+                        return cur.fetchall()
+                    return cur.rowcount
+                except Exception:
+                    if name is not None:
+                        _deallocate(conn, name)
+                    raise
+                finally:
+                    cur.close()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            if attempt == 2:
+                raise
+            logger.warning("⚠️ [DB] Stale pooled connection, retrying: %s", e)
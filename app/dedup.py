@@ -0,0 +1,72 @@
+"""
+dedup.py - Near-duplicate detection for chunks (SimHash)
+Exact hashing misses chunks that differ only by whitespace, punctuation,
+case or a "Heading: " context prefix, so each text is reduced to a 64-bit
+SimHash over its word unigrams and bigrams (after stripping that prefix).
+Two texts whose fingerprints differ in at most DEDUP_MAX_DISTANCE bits are
+treated as the same content.
+
+NearDuplicateFilter keeps the first text of each near-duplicate group. It
+splits fingerprints into DEDUP_MAX_DISTANCE + 1 bands: any two fingerprints
+within the distance agree on at least one band (pigeonhole), so only texts
+sharing a band are compared. Used at ingest (children) and when merging
+retrieved candidates.
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+from app.config import Config
+
+FINGERPRINT_BITS = 64
+HEADING_PREFIX = re.compile(r"^[^:\n]{1,50}:\s+")
+WORD = re.compile(r"[a-z0-9+#]+")
+
+
+def normalize(text):
+    """Lowercased words with any short "Heading:" prefix removed"""
+    return WORD.findall(HEADING_PREFIX.sub("", text.strip(), count=1).lower())
+
+
+@lru_cache(maxsize=4096)
+def simhash(text):
+    words = normalize(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        value = int.from_bytes(hashlib.md5(feature.encode("utf-8")).digest()[:8], "little")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateFilter:
+    def __init__(self, max_distance=None):
+        if max_distance is None:
+            max_distance = Config.DEDUP_MAX_DISTANCE
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands = [(i * width, width if i < bands - 1 else FINGERPRINT_BITS - i * width) for i in range(bands)]
+        self._buckets = {}  # (band, value) -> [fingerprint]
+        self.duplicates = 0
+
+    def _keys(self, fingerprint):
+        return [(i, fingerprint >> shift & ((1 << width) - 1)) for i, (shift, width) in enumerate(self._bands)]
+
+    def add(self, text):
+        """Record `text` and return True, or return False if it near-duplicates one already added"""
+        fingerprint = simhash(text)
+        keys = self._keys(fingerprint)
+        for key in keys:
+            for other in self._buckets.get(key, ()):
+                if distance(fingerprint, other) <= self.max_distance:
+                    self.duplicates += 1
+                    return False
+        for key in keys:
+            self._buckets.setdefault(key, []).append(fingerprint)
+        return True
@@ -2,8 +2,19 @@ import requests
 import os
 from datetime import datetime
 
-def send_download_alert(requester_email, purpose, note):
-    """Sends a notification to Sahil when someone downloads the resume"""
+class TransientEmailError(Exception):
+    """Resend was unreachable, rate limited us (429) or failed (5xx): worth retrying"""
+
+
+def is_configured():
+    return bool(os.getenv("RESEND_API_KEY") and os.getenv("SENDER_EMAIL"))
+
+def send_email(subject, body):
+    """
+    Sends a plain-text email to Sahil through Resend. Returns True on success,
+    False on a failure retrying can't fix (bad key, rejected payload), and
+    raises TransientEmailError when a retry may succeed.
+    """
     api_key = os.getenv("RESEND_API_KEY")
     sender_email = os.getenv("SENDER_EMAIL") # Your personal email where you want the alert
 
@@ -11,22 +22,6 @@ def send_download_alert(requester_email, purpose, note):
         print("❌ [Email] Missing configuration: Check RESEND_API_KEY and SENDER_EMAIL env vars")
         return False
 
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    subject = f"🚀 New Resume Download: {purpose}"
-    
-    body = f"""
-    Hello Sahil,
-    
-    Someone just downloaded your resume from your AI Portfolio!
-    
-    Details:
-    - Email: {requester_email}
-    - Purpose: {purpose}
-    - Message: {note if note else "No message provided."}
-    
-    Time: {current_time}
-    """
-
     try:
         response = requests.post(
             "https://api.resend.com/emails",
@@ -46,10 +41,50 @@ def send_download_alert(requester_email, purpose, note):
         if response.status_code in [200, 201]:
             print(f"📧 [Email] Success: Alert sent to {sender_email}")
             return True
-        else:
-            print(f"❌ [Email] Resend Error: {response.status_code} - {response.text}")
-            return False
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientEmailError(f"Resend returned {response.status_code}")
+        print(f"❌ [Email] Resend Error: {response.status_code} - {response.text}")
+        return False
             
-    except Exception as e:
-        print(f"❌ [Email] Failed to send alert: {e}")
-        return False
\ No newline at end of file
+    except requests.RequestException as e:
+        raise TransientEmailError(str(e)) from e
+
+def send_download_alert(requester_email, purpose, note):
+    """Sends a notification to Sahil when someone downloads the resume"""
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    subject = f"🚀 New Resume Download: {purpose}"
+    
+    body = f"""
+    Hello Sahil,
+    
+    Someone just downloaded your resume from your AI Portfolio!
+    
+    Details:
+    - Email: {requester_email}
+    - Purpose: {purpose}
+    - Message: {note if note else "No message provided."}
+    
+    Time: {current_time}
+    """
+
+    return send_email(subject, body)
+
+def send_digest_alert(events):
+    """Sends one summary email for a burst of download events"""
+    lines = []
+    for event in events:
+        lines.append(
+            f"    - [{event['time']}] {event['email']} | {event['purpose']}"
+            f" | {event['note'] if event['note'] else 'No message provided.'}"
+        )
+
+    subject = f"🚀 {len(events)} New Resume Downloads"
+    body = f"""
+    Hello Sahil,
+    
+    Your resume was requested {len(events)} times in the last few seconds:
+    
+{chr(10).join(lines)}
+    """
+
+    return send_email(subject, body)
@@ -1,14 +1,27 @@
-from sentence_transformers import SentenceTransformer
+"""
+embed.py - Local SentenceTransformer embedder (ingest-only)
+The model is loaded on first use rather than at import, so importing this
+module never pulls torch into a serving process.
+"""
+
+_model = None
+
+
+def get_model():
+    """Load the local model once, on first use"""
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(
+            "sentence-transformers/all-MiniLM-L6-v2",
+            device="cpu"  # Best for your system
+        )
+    return _model
 
-# Load once (FAST)
-model = SentenceTransformer(
-    "sentence-transformers/all-MiniLM-L6-v2",
-    device="cpu"  # Best for your system
-)
 
 def embed_text(text: str):
     """
     Convert text into pgvector-compatible embedding list
     """
-    embedding = model.encode(text, normalize_embeddings=True)
+    embedding = get_model().encode(text, normalize_embeddings=True)
     return embedding.tolist()
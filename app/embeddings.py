@@ -1,19 +1,127 @@
-import requests
+import hashlib
+import math
 import os
-import json
+import re
+import threading
+import time
+from app.cache import TTLCache
+from app.config import Config
+from app.memory import register_cache
+from app.http_client import get_session
+from app.log import get_logger
 
-def generate_embedding(text: str):
+logger = get_logger(__name__)
+
+# Repeated questions (and warm-up) skip the network round trip entirely
+_embedding_cache = TTLCache(Config.EMBEDDING_CACHE_SIZE, Config.EMBEDDING_CACHE_TTL)
+register_cache("embeddings", _embedding_cache)
+
+EMBEDDING_DIM = 768
+
+# Timeout for ingest / migration, which can afford to wait
+OFFLINE_TIMEOUT_SECONDS = 10
+
+
+class EmbeddingError(RuntimeError):
+    """The embedding provider failed, timed out or is backed off"""
+
+
+# Circuit breaker: after EMBEDDING_FAILURE_THRESHOLD consecutive failures the
+# provider is skipped for a backoff window that doubles on every failed retry
+_breaker = {"failures": 0, "backoff": 0.0, "open_until": 0.0, "errors": 0, "short_circuited": 0}
+_breaker_lock = threading.Lock()
+
+
+def _check_breaker():
+    with _breaker_lock:
+        remaining = _breaker["open_until"] - time.monotonic()
+        if remaining > 0:
+            _breaker["short_circuited"] += 1
+            raise EmbeddingError(f"embedding provider backed off for another {remaining:.1f}s")
+
+
+def _record_success():
+    with _breaker_lock:
+        if _breaker["open_until"]:
+            logger.info("✅ [Embeddings] Provider recovered, closing circuit")
+        _breaker.update(failures=0, backoff=0.0, open_until=0.0)
+
+
+def _record_failure(error):
+    with _breaker_lock:
+        _breaker["failures"] += 1
+        _breaker["errors"] += 1
+        if _breaker["failures"] < Config.EMBEDDING_FAILURE_THRESHOLD:
+            return
+        backoff = min(_breaker["backoff"] * 2 or Config.EMBEDDING_BACKOFF_SECONDS, Config.EMBEDDING_BACKOFF_MAX_SECONDS)
+        _breaker["backoff"] = backoff
+        _breaker["open_until"] = time.monotonic() + backoff
+    logger.warning("🔌 [Embeddings] Provider failing (%s), backing off for %ss", error, backoff)
+
+
+def _post_embedding(url, payload, timeout, fail_fast):
+    """POST to the Gemini API through the breaker; raises EmbeddingError on any failure"""
+    if fail_fast:
+        _check_breaker()
+    try:
+        response = get_session().post(url, headers={'Content-Type': 'application/json'}, json=payload, timeout=timeout)
+        response.raise_for_status()
+        result = response.json()
+    except Exception as e:
+        _record_failure(e)
+        raise EmbeddingError(str(e)) from e
+    _record_success()
+    return result
+
+
+def _api_key():
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment")
+    return api_key
+
+
+def active_provider():
+    """EMBEDDING_PROVIDER, read per call so the eval harness can switch at runtime"""
+    return os.getenv("EMBEDDING_PROVIDER", "gemini").lower()
+
+
+def hash_embedding(text: str, dim: int = EMBEDDING_DIM):
+    """
+    Deterministic offline embedder (EMBEDDING_PROVIDER=hash).
+    Feature-hashes word unigrams and bigrams into `dim` buckets and
+    L2-normalizes, so cosine similarity tracks lexical overlap. Used by the
+    retrieval eval harness; never mix with Gemini vectors in one table.
+    """
+    words = re.findall(r"[a-z0-9+#.]+", text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = [0.0] * dim
+    for feature in features:
+        digest = hashlib.md5(feature.encode("utf-8")).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
+
+def generate_embedding(text: str, fail_fast: bool = True):
     """
     Cloud-based alternative to local sentence-transformers.
     Uses Google Gemini embedding model to save ~500MB of RAM.
+
+    Raises EmbeddingError when the provider fails, so callers can degrade
+    explicitly instead of searching with a meaningless zero vector. With
+    fail_fast (the request path) the call is bounded by
+    EMBEDDING_TIMEOUT_SECONDS and skipped while the provider is backed off;
+    ingest passes fail_fast=False to wait longer and always try.
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found in environment")
+    if active_provider() == "hash":
+        return hash_embedding(text)
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/text-embedding-004:embedContent?key={api_key}"
-    
-    headers = {'Content-Type': 'application/json'}
+    cached = _embedding_cache.get(text)
+    if cached is not None:
+        return list(cached)
+
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/text-embedding-004:embedContent?key={_api_key()}"
     payload = {
         "model": "models/text-embedding-004",
         "content": {
@@ -21,13 +129,64 @@ def generate_embedding(text: str):
         }
     }
 
+    timeout = Config.EMBEDDING_TIMEOUT_SECONDS if fail_fast else OFFLINE_TIMEOUT_SECONDS
+    result = _post_embedding(url, payload, timeout, fail_fast)
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        result = response.json()
-        return result['embedding']['values']
-    except Exception as e:
-        print(f"❌ [Embeddings] Cloud embedding failed: {e}")
-        # Return a zero-vector if everything fails to avoid crashing
-        # (Assuming the vector dimension is 768 for text-embedding-004)
-        return [0.0] * 768
\ No newline at end of file
+        values = result['embedding']['values']
+    except (KeyError, TypeError) as e:
+        raise EmbeddingError(f"malformed embedding response: {e}") from e
+    if len(values) != EMBEDDING_DIM:
+        raise EmbeddingError(f"expected {EMBEDDING_DIM} dims, got {len(values)}")
+    _embedding_cache.set(text, tuple(values))
+    return values
+
+def generate_embeddings(texts):
+    """
+    Embed several texts with one batchEmbedContents call (cached texts are
+    skipped). Raises EmbeddingError if the batch call fails: retrying text by
+    text against a failing provider would only multiply the wait.
+    """
+    if active_provider() == "hash":
+        return [hash_embedding(text) for text in texts]
+
+    vectors = [None] * len(texts)
+    missing = []
+    for i, text in enumerate(texts):
+        cached = _embedding_cache.get(text)
+        if cached is not None:
+            vectors[i] = list(cached)
+        else:
+            missing.append(i)
+    if not missing:
+        return vectors
+
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/text-embedding-004:batchEmbedContents?key={_api_key()}"
+    payload = {
+        "requests": [
+            {"model": "models/text-embedding-004", "content": {"parts": [{"text": texts[i]}]}}
+            for i in missing
+        ]
+    }
+
+    result = _post_embedding(url, payload, Config.EMBEDDING_TIMEOUT_SECONDS, fail_fast=True)
+    try:
+        embeddings = result['embeddings']
+    except (KeyError, TypeError) as e:
+        raise EmbeddingError(f"malformed batch embedding response: {e}") from e
+    if len(embeddings) != len(missing):
+        raise EmbeddingError(f"expected {len(missing)} embeddings, got {len(embeddings)}")
+    for i, embedding in zip(missing, embeddings):
+        vectors[i] = embedding['values']
+        _embedding_cache.set(texts[i], tuple(vectors[i]))
+    return vectors
+
+def get_cache():
+    return _embedding_cache
+
+def get_stats():
+    """Circuit breaker state for /metrics"""
+    with _breaker_lock:
+        stats = dict(_breaker)
+    remaining = stats.pop("open_until") - time.monotonic()
+    stats["backed_off_seconds"] = round(remaining, 1) if remaining > 0 else 0
+    return stats
@@ -0,0 +1,164 @@
+"""
+faq_store.py - Precomputed answers for the top recruiter intents
+At ingest time the canonical question of every intent in app/intent_router.py
+is run once through the normal RAG pipeline and the finished answer (with its
+sources metadata) is stored in `faq_answers`. At serving time the router maps
+a question onto an intent and the stored answer is returned instantly.
+
+Usage:
+    python -m app.faq_store          # (re)build after ingesting the resume
+"""
+
+import json
+import threading
+import time
+from app.config import Config
+from app.db import get_connection
+from app.ingest_jobs import on_corpus_change
+from app.intent_router import INTENTS, route
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+_cache = {"entries": None, "loaded_at": 0.0, "refreshing": False, "generation": 0}
+_cache_lock = threading.Lock()
+
+
+def ensure_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS faq_answers (
+            intent TEXT PRIMARY KEY,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            metadata JSONB NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def build_faq_store(verbose=True):
+    """Generate and store an answer for every intent's canonical question"""
+    from app.rag_answer import generate_answer_with_sources
+
+    rows = []
+    for intent, spec in INTENTS.items():
+        question = spec["canonical"][0]
+        answer_parts = []
+        metadata = None
+        for chunk in generate_answer_with_sources(question, user_ip="faq_builder", mode="recruiter", use_precomputed=False):
+            if chunk.get("answer_chunk"):
+                answer_parts.append(chunk["answer_chunk"])
+            if chunk.get("metadata"):
+                metadata = chunk["metadata"]
+
+        # No metadata means nothing relevant was retrieved or every provider failed
+        if not metadata:
+            if verbose:
+                logger.warning("⚠️ [FAQ] Skipped '%s': no grounded answer generated", intent)
+            continue
+
+        stored_metadata = {k: metadata[k] for k in ("sources", "confidence", "mode") if k in metadata}
+        rows.append((intent, question, "".join(answer_parts).strip(), json.dumps(stored_metadata)))
+        if verbose:
+            logger.info("✅ [FAQ] %-18s | %4d chars | %s", intent, len(rows[-1][2]), question)
+
+    if not rows:
+        logger.error("❌ [FAQ] No answers generated, keeping the existing store")
+        return 0
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        ensure_table(cur)
+        # Replace the whole store in one transaction so readers never see a mix
+        cur.execute("DELETE FROM faq_answers;")
+        for row in rows:
+            cur.execute(
+                "INSERT INTO faq_answers (intent, question, answer, metadata) VALUES (%s, %s, %s, %s::jsonb)",
+                row
+            )
+        conn.commit()
+    except Exception as e:
+        logger.error("❌ [FAQ] Database error: %s", e)
+        conn.rollback()
+        return 0
+    finally:
+        cur.close()
+        conn.close()
+
+    invalidate()
+    if verbose:
+        logger.info("💾 [FAQ] Stored %s/%s precomputed answers", len(rows), len(INTENTS))
+    return len(rows)
+
+
+def _fetch_entries():
+    entries = {}
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT intent, question, answer, metadata FROM faq_answers;")
+        for intent, question, answer, metadata in cur.fetchall():
+            if isinstance(metadata, str):
+                metadata = json.loads(metadata)
+            entries[intent] = {"question": question, "answer": answer, "metadata": metadata}
+        cur.close()
+    except Exception as e:
+        # Missing table or DB hiccup: serve without FAQ until the next refresh
+        logger.warning("⚠️ [FAQ] Could not load precomputed answers: %s", e)
+    finally:
+        if conn:
+            conn.close()
+    return entries
+
+
+def load_entries():
+    """
+    intent -> {question, answer, metadata}; cached and refreshed periodically.
+    The query runs outside the lock: while one thread refreshes, the others
+    keep serving the previous entries. A load that started before
+    invalidate() is returned to its caller but not cached.
+    """
+    with _cache_lock:
+        entries = _cache["entries"]
+        fresh = time.time() - _cache["loaded_at"] < Config.FAQ_REFRESH_SECONDS
+        if entries is not None and (fresh or _cache["refreshing"]):
+            return entries
+        _cache["refreshing"] = True
+        generation = _cache["generation"]
+
+    entries = _fetch_entries()
+
+    with _cache_lock:
+        _cache["refreshing"] = False
+        if _cache["generation"] == generation:
+            _cache["entries"] = entries
+            _cache["loaded_at"] = time.time()
+    return entries
+
+
+def invalidate():
+    with _cache_lock:
+        _cache["entries"] = None
+        _cache["loaded_at"] = 0.0
+        _cache["generation"] += 1
+
+
+on_corpus_change("faq", invalidate)
+
+
+def lookup(question):
+    """Return (IntentMatch, entry) for a precomputed answer, or (None, None)"""
+    match = route(question)
+    if not match:
+        return None, None
+    entry = load_entries().get(match.intent)
+    if not entry:
+        return None, None
+    return match, entry
+
+
+if __name__ == "__main__":
+    print("\n📚 Building precomputed FAQ answers\n")
+    build_faq_store(verbose=True)
@@ -0,0 +1,26 @@
+"""
+http_client.py - Process-wide pooled HTTP session for outbound API calls
+Groq, Gemini (generation + embeddings) and Ollama calls share one
+requests.Session so TCP/TLS connections are reused across requests instead
+of being re-negotiated on every call. Warm-up opens them ahead of traffic.
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
@@ -0,0 +1,125 @@
+"""
+import_report.py - Per-module import cost report for cold starts
+Runs `python -X importtime` in a fresh interpreter (so nothing is already
+cached in sys.modules) and prints the most expensive modules, plus any
+ingest-only dependency that leaked onto the serving path.
+
+Usage:
+    python -m app.import_report                      # audit app.api
+    python -m app.import_report app.rag_answer --top 30
+    python -m app.import_report --json import_report.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that only the ingest tooling needs. None of these should be
+# imported when the API boots.
+INGEST_ONLY_MODULES = [
+    "sentence_transformers", "torch", "langchain", "langchain_text_splitters",
+    "PyPDF2", "pandas", "tqdm", "watchdog",
+]
+
+
+def measure_imports(module="app.api"):
+    """
+    Import `module` in a clean interpreter with -X importtime.
+    Returns (rows, wall_ms) where rows are dicts sorted by cumulative cost.
+    """
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    if proc.returncode != 0:
+        # importtime lines and the traceback both go to stderr; keep only the error
+        error_lines = [l for l in proc.stderr.splitlines() if not l.startswith("import time:")]
+        raise RuntimeError(f"Importing {module} failed:\n" + "\n".join(error_lines[-15:]))
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        name = parts[2].rstrip()
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(parts[0]) / 1000,
+            "cumulative_ms": int(parts[1]) / 1000,
+        })
+
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows, wall_ms
+
+
+def find_ingest_only(rows):
+    """Return ingest-only top-level packages that were imported"""
+    loaded = {r["module"].split(".")[0] for r in rows}
+    return [m for m in INGEST_ONLY_MODULES if m in loaded]
+
+
+def build_report(module="app.api", top=20):
+    rows, wall_ms = measure_imports(module)
+    top_level = [r for r in rows if r["depth"] == 0]
+    return {
+        "module": module,
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(sum(r["cumulative_ms"] for r in top_level), 1),
+        "modules_loaded": len(rows),
+        "ingest_only_loaded": find_ingest_only(rows),
+        "top_cumulative": rows[:top],
+        "top_self": sorted(rows, key=lambda r: r["self_ms"], reverse=True)[:top],
+    }
+
+
+def print_report(report):
+    print("\n" + "=" * 60)
+    print(f"⏱️  Import report for {report['module']}")
+    print("=" * 60)
+    print(f"Process wall time : {report['wall_ms']:.1f} ms (interpreter start included)")
+    print(f"Import time       : {report['import_ms']:.1f} ms")
+    print(f"Modules loaded    : {report['modules_loaded']}")
+
+    print(f"\nTop {len(report['top_cumulative'])} by cumulative cost:")
+    for r in report["top_cumulative"]:
+        print(f"  {r['cumulative_ms']:8.1f} ms  {r['module']}")
+
+    print(f"\nTop {len(report['top_self'])} by self cost:")
+    for r in report["top_self"]:
+        print(f"  {r['self_ms']:8.1f} ms  {r['module']}")
+
+    if report["ingest_only_loaded"]:
+        print(f"\n⚠️ Ingest-only modules on this path: {', '.join(report['ingest_only_loaded'])}")
+    else:
+        print("\n✅ No ingest-only modules on this path")
+    print("=" * 60 + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-module import cost report")
+    parser.add_argument("module", nargs="?", default="app.api")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = build_report(args.module, top=args.top)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.json_path}")
+
+    sys.exit(1 if report["ingest_only_loaded"] else 0)
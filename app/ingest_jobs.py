@@ -0,0 +1,285 @@
+"""
+ingest_jobs.py - Background re-ingest and the corpus version
+Runs the same ingest as `python -m app.ingest_resume` (plus the FAQ
+rebuild) as a background job, so a resume update needs no shell or restart:
+  - triggers: POST /admin/ingest, and a debounced watchdog watcher on
+    INGEST_WATCH_DIR (INGEST_WATCH=true). A trigger that arrives while a job
+    runs queues exactly one re-run.
+  - single runner: one job thread per process, plus an exclusive file lock
+    so gunicorn workers never ingest at the same time (and only one of them
+    watches the directory)
+  - status: stage and progress are kept in a JSON file, so GET /admin/ingest
+    gives the same answer from every worker
+  - corpus version: bumped atomically (os.replace) when a job succeeds. Each
+    worker notices the bump (at most every CORPUS_CHECK_SECONDS) and runs
+    the callbacks registered with on_corpus_change: the retrieval cache and
+    FAQ answers are dropped and the vector index is re-mapped.
+"""
+
+import fnmatch
+import json
+import os
+import threading
+import time
+from app.config import Config
+from app.log import get_logger, fields
+
+logger = get_logger(__name__)
+
+STATUS_FILE = "ingest_status.json"
+VERSION_FILE = "corpus_version.json"
+JOB_LOCK_FILE = "ingest.lock"
+WATCH_LOCK_FILE = "watch.lock"
+_UNSET = object()
+
+_listeners = {}  # name -> callable, run when the corpus version changes
+_lock = threading.Lock()
+_runner = {"thread": None, "pending": None, "running": False, "wake": threading.Event()}
+_watch = {"observer": None, "timer": None, "lock": None}
+_corpus = {"version": _UNSET, "checked_at": 0.0}
+
+
+def _path(name):
+    return os.path.join(Config.INGEST_STATE_DIR, name)
+
+
+def _read_json(name):
+    try:
+        with open(_path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(name, data):
+    """Write via a temp file + os.replace, so readers never see a partial file"""
+    os.makedirs(Config.INGEST_STATE_DIR, exist_ok=True)
+    tmp = _path(f".{name}.{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, _path(name))
+
+
+def _try_lock(name):
+    """Exclusive, non-blocking lock on a state file; the open file holds it (None if taken)"""
+    os.makedirs(Config.INGEST_STATE_DIR, exist_ok=True)
+    handle = open(_path(name), "a")
+    try:
+        import fcntl
+    except ImportError:
+        return handle  # no cross-process locking off POSIX
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return handle
+    except OSError:
+        handle.close()
+        return None
+
+
+# =============================================================================
+# Corpus version
+# =============================================================================
+def on_corpus_change(name, callback):
+    """Run `callback()` in every process once a re-ingest has been published"""
+    with _lock:
+        _listeners[name] = callback
+
+
+def _notify_listeners():
+    with _lock:
+        listeners = list(_listeners.items())
+    for name, callback in listeners:
+        try:
+            callback()
+        except Exception as e:
+            logger.warning("⚠️ [Ingest] Corpus change hook '%s' failed: %s", name, e)
+    return [name for name, _ in listeners]
+
+
+def current_corpus_version():
+    return _read_json(VERSION_FILE).get("version")
+
+
+def check_corpus_version():
+    """Cheap per-request check; refreshes this process's caches after a bump"""
+    now = time.monotonic()
+    with _lock:
+        if now - _corpus["checked_at"] < Config.CORPUS_CHECK_SECONDS:
+            return
+        _corpus["checked_at"] = now
+    version = current_corpus_version()
+    with _lock:
+        previous = _corpus["version"]
+        _corpus["version"] = version
+    if previous is not _UNSET and version != previous:
+        refreshed = _notify_listeners()
+        logger.info("🔄 [Ingest] Corpus version %s picked up", version, extra=fields(refreshed=refreshed))
+
+
+def bump_corpus_version(details=None):
+    version = str(int(time.time() * 1000))
+    _write_json(VERSION_FILE, {"version": version, "bumped_at": time.time(), **(details or {})})
+    with _lock:
+        _corpus["version"] = version
+    _notify_listeners()
+    logger.info("🔄 [Ingest] Published corpus version %s", version)
+    return version
+
+
+# =============================================================================
+# Job runner
+# =============================================================================
+def _set_status(**changes):
+    status = _read_json(STATUS_FILE)
+    status.update(changes)
+    try:
+        _write_json(STATUS_FILE, status)
+    except OSError as e:
+        logger.warning("⚠️ [Ingest] Could not write job status: %s", e)
+
+
+def _progress(stage, done, total):
+    _set_status(stage=stage, done=done, total=total)
+
+
+def get_status():
+    status = _read_json(STATUS_FILE) or {"state": "idle"}
+    with _lock:
+        status["queued"] = _runner["pending"]
+    status["corpus_version"] = current_corpus_version()
+    return status
+
+
+def request_ingest(trigger):
+    """
+    Queue a re-ingest. Returns False if another process is already running
+    one (its status is visible through get_status()).
+    """
+    with _lock:
+        running_here = _runner["running"] or _runner["pending"] is not None
+    if not running_here:
+        probe = _try_lock(JOB_LOCK_FILE)
+        if probe is None:
+            return False
+        probe.close()
+
+    with _lock:
+        _runner["pending"] = trigger
+        if _runner["thread"] is None or not _runner["thread"].is_alive():
+            _runner["thread"] = threading.Thread(target=_run_forever, name="ingest-job", daemon=True)
+            _runner["thread"].start()
+    _runner["wake"].set()
+    logger.info("📥 [Ingest] Re-ingest requested", extra=fields(trigger=trigger, queued_behind_running=running_here))
+    return True
+
+
+def _run_forever():
+    while True:
+        _runner["wake"].wait()
+        _runner["wake"].clear()
+        with _lock:
+            trigger, _runner["pending"] = _runner["pending"], None
+            _runner["running"] = trigger is not None
+        if trigger is None:
+            continue
+        try:
+            run_job(trigger)
+        finally:
+            with _lock:
+                _runner["running"] = False
+                if _runner["pending"] is not None:
+                    _runner["wake"].set()
+
+
+def run_job(trigger):
+    """Ingest, rebuild the FAQ answers and publish a new corpus version"""
+    lock = _try_lock(JOB_LOCK_FILE)
+    if lock is None:
+        logger.warning("⏭️ [Ingest] Another process is already ingesting; skipped", extra=fields(trigger=trigger))
+        return None
+    started = time.time()
+    try:
+        _set_status(state="running", trigger=trigger, stage="starting", done=0, total=0,
+                    started_at=started, finished_at=None, error=None, result=None)
+        from app.ingest_resume import ingest
+        result = ingest(verbose=False, progress=_progress)
+        if result is None:
+            raise RuntimeError("ingest stored nothing; the previous corpus is still served")
+
+        # Drop this process's caches first, so the FAQ answers come from the new corpus
+        _notify_listeners()
+        if Config.INGEST_REBUILD_FAQ:
+            _progress("faq", 0, 1)
+            from app.faq_store import build_faq_store
+            result["faq_answers"] = build_faq_store(verbose=False)
+
+        version = bump_corpus_version({"index_version": result.get("index_version")})
+        _set_status(state="succeeded", stage="done", finished_at=time.time(), result=result)
+        logger.info("✅ [Ingest] Job finished", extra=fields(
+            trigger=trigger, corpus_version=version, duration_s=round(time.time() - started, 1), **result
+        ))
+        return version
+    except Exception as e:
+        _set_status(state="failed", finished_at=time.time(), error=str(e))
+        logger.error("❌ [Ingest] Job failed: %s", e, extra=fields(trigger=trigger))
+        return None
+    finally:
+        lock.close()
+
+
+# =============================================================================
+# Directory watcher
+# =============================================================================
+def _gevent_patched():
+    try:
+        from gevent import monkey
+        return monkey.is_module_patched("threading")
+    except ImportError:
+        return False
+
+
+def _debounced_trigger():
+    """Restart the quiet-period timer; an editor save fires several events"""
+    with _lock:
+        if _watch["timer"] is not None:
+            _watch["timer"].cancel()
+        timer = threading.Timer(Config.INGEST_DEBOUNCE_SECONDS, request_ingest, args=("watch",))
+        timer.daemon = True
+        _watch["timer"] = timer
+    timer.start()
+
+
+def start_watcher():
+    """Watch INGEST_WATCH_DIR for changes to INGEST_WATCH_FILES (one watcher per host)"""
+    if _watch["observer"] is not None:
+        return
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+        from watchdog.observers.polling import PollingObserver
+    except ImportError:
+        logger.warning("⚠️ [Ingest] watchdog is not installed; file watching disabled")
+        return
+
+    lock = _try_lock(WATCH_LOCK_FILE)
+    if lock is None:
+        logger.debug("👀 [Ingest] Another worker is watching %s", Config.INGEST_WATCH_DIR)
+        return
+    patterns = [p.strip() for p in Config.INGEST_WATCH_FILES.split(",") if p.strip()]
+
+    class ResumeChangeHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            paths = [event.src_path, getattr(event, "dest_path", "")]
+            names = [os.path.basename(p) for p in paths if p]
+            if any(fnmatch.fnmatch(name, pattern) for name in names for pattern in patterns):
+                _debounced_trigger()
+
+    # inotify reads would block a gevent worker's hub; polling sleeps cooperatively
+    observer = PollingObserver() if _gevent_patched() else Observer()
+    observer.schedule(ResumeChangeHandler(), Config.INGEST_WATCH_DIR, recursive=False)
+    observer.daemon = True
+    observer.start()
+    _watch.update(observer=observer, lock=lock)
+    logger.info("👀 [Ingest] Watching %s for %s", Config.INGEST_WATCH_DIR, ", ".join(patterns))
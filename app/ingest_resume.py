@@ -5,11 +5,20 @@ Key Improvements:
 2. Smart section detection and labeling
 3. Metadata extraction (section type, keywords)
 4. Chunk quality validation
+5. Hierarchical chunking: each section is stored once as a parent, and its
+   bullets/sentences are embedded as small child chunks linked to it
+6. Near-duplicate children (repeated bullets, whitespace variants) are dropped
 """
 
 import re
+from app.config import Config
 from app.db import get_connection
+from app.dedup import NearDuplicateFilter
 from app.embeddings import generate_embedding
+from app.schema import ensure_schema
+
+BULLET_PATTERN = re.compile(r'^\s*(?:[-*•+]|\d+[.)])\s+')
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9])')
 
 
 def detect_section_type(chunk_text):
@@ -82,6 +91,59 @@ def create_contextual_chunk(chunk_text, section_type):
     return enriched_chunk
 
 
+def split_section(chunk_text):
+    """Split a markdown section into (heading, body); the heading drops its #'s"""
+    lines = chunk_text.strip().split('\n')
+    if lines and lines[0].lstrip().startswith('#'):
+        heading = lines[0].lstrip('#').strip()
+        body = '\n'.join(lines[1:]).strip()
+    else:
+        heading = "Resume"
+        body = chunk_text.strip()
+    return heading, body
+
+
+def split_children(body, min_chars=None):
+    """
+    Break a section body into child chunks: one per bullet (continuation
+    lines stay with their bullet) and one per sentence of plain paragraphs.
+    Fragments shorter than `min_chars` are folded into the following child so
+    short skill lists don't become near-empty embeddings.
+    """
+    if min_chars is None:
+        min_chars = Config.CHILD_MIN_CHARS
+
+    pieces = []
+    current_bullet = None
+    for line in body.split('\n'):
+        stripped = line.strip()
+        if not stripped:
+            current_bullet = None
+            continue
+        if BULLET_PATTERN.match(line):
+            current_bullet = len(pieces)
+            pieces.append(BULLET_PATTERN.sub('', line).strip())
+        elif current_bullet is not None and line[:1].isspace():
+            pieces[current_bullet] += ' ' + stripped
+        else:
+            current_bullet = None
+            pieces.extend(s.strip() for s in SENTENCE_SPLIT.split(stripped) if s.strip())
+
+    children = []
+    pending = ''
+    for piece in pieces:
+        pending = f"{pending} {piece}".strip() if pending else piece
+        if len(pending) >= min_chars:
+            children.append(pending)
+            pending = ''
+    if pending:
+        if children and len(pending) < min_chars:
+            children[-1] = f"{children[-1]} {pending}"
+        else:
+            children.append(pending)
+    return children
+
+
 def validate_chunk(chunk_text):
     """
     Ensure chunk has sufficient information and isn't just a header
@@ -102,13 +164,17 @@ def validate_chunk(chunk_text):
     return True, "Valid"
 
 
-def ingest(verbose=True):
+def ingest(verbose=True, progress=None):
     """
     Production-ready ingestion with contextual chunking and validation
     
     Args:
         verbose: Whether to print detailed progress
+        progress: Optional callback(stage, done, total), used by app/ingest_jobs.py
+    
+    Returns a summary dict on success, None if nothing was ingested.
     """
+    report = progress or (lambda stage, done, total: None)
     
     # Load resume
     try:
@@ -137,8 +203,11 @@ def ingest(verbose=True):
     # Process chunks with validation
     processed_chunks = []
     skipped_chunks = []
+    # Repeated bullets / sentences are stored (and embedded) once
+    near_duplicates = NearDuplicateFilter() if Config.DEDUP_NEAR_DUPLICATES else None
     
     for idx, chunk in enumerate(chunks, 1):
+        report("embedding", idx - 1, len(chunks))
         # Validate chunk quality
         is_valid, reason = validate_chunk(chunk)
         
@@ -148,31 +217,46 @@ def ingest(verbose=True):
         
         # Detect section type
         section_type = detect_section_type(chunk)
+        heading, body = split_section(chunk)
         
-        # Extract keywords
-        keywords = extract_keywords(chunk)
-        
-        # Create contextual chunk
-        enriched_chunk = create_contextual_chunk(chunk, section_type)
+        # Child chunks carry their heading so each one reads on its own
+        children = []
+        for child_idx, child_text in enumerate(split_children(body) or [body]):
+            if near_duplicates is not None and not near_duplicates.add(child_text):
+                continue
+            content = f"{heading}: {child_text}"
+            
+            # Create contextual chunk (what gets embedded)
+            enriched_chunk = create_contextual_chunk(content, section_type)
+            
+            # Generate embedding
+            try:
+                embedding = generate_embedding(enriched_chunk, fail_fast=False)
+            except Exception as e:
+                print(f"⚠️ Warning: Failed to generate embedding for chunk {idx}.{child_idx}: {e}")
+                continue
+            
+            children.append({
+                'content': content,
+                'embedding': embedding,
+                'chunk_index': len(children)  # contiguous, so sibling windows skip no gaps
+            })
         
-        # Generate embedding
-        try:
-            embedding = generate_embedding(enriched_chunk)
-        except Exception as e:
-            print(f"⚠️ Warning: Failed to generate embedding for chunk {idx}: {e}")
+        if not children:
             continue
         
         processed_chunks.append({
             'original': chunk,
-            'enriched': enriched_chunk,
-            'embedding': embedding,
+            'heading': heading,
             'section_type': section_type,
-            'keywords': keywords,
+            'keywords': extract_keywords(chunk),
+            'children': children,
             'chunk_index': idx
         })
         
         if verbose:
-            print(f"✅ Chunk {idx:2d} | Section: {section_type:20s} | Length: {len(chunk):4d} chars")
+            keywords = processed_chunks[-1]['keywords']
+            print(f"✅ Section {idx:2d} | {section_type:20s} | {len(chunk):4d} chars -> {len(children)} child chunks")
             if keywords:
                 print(f"           Keywords: {keywords}")
             print(f"           Preview: {chunk[:60]}...")
@@ -190,32 +274,63 @@ def ingest(verbose=True):
         print("❌ Error: No valid chunks to insert!")
         return
     
+    report("embedding", len(chunks), len(chunks))
+    report("writing", 0, 1)
     conn = get_connection()
     cur = conn.cursor()
     
     try:
+        ensure_schema(cur)
+        
         # Clear existing data
-        cur.execute("TRUNCATE TABLE resume_chunks;")
+        cur.execute("TRUNCATE TABLE resume_chunks, resume_sections RESTART IDENTITY;")
         if verbose:
             print("🗑️ Cleared existing resume data\n")
         
-        # Insert new chunks
+        # Insert each parent section, then its embedded children
+        index_entries = []
+        headings = {}
         for chunk_data in processed_chunks:
             cur.execute(
                 """
-                INSERT INTO resume_chunks (content, embedding) 
-                VALUES (%s, %s::vector)
+                INSERT INTO resume_sections (heading, section_type, content)
+                VALUES (%s, %s, %s)
+                RETURNING id
                 """,
-                (chunk_data['original'], chunk_data['embedding'])
+                (chunk_data['heading'], chunk_data['section_type'], chunk_data['original'])
             )
+            parent_id = cur.fetchone()[0]
+            headings[parent_id] = chunk_data['heading']
+            for child in chunk_data['children']:
+                cur.execute(
+                    """
+                    INSERT INTO resume_chunks (content, embedding, parent_id, chunk_index) 
+                    VALUES (%s, %s::vector, %s, %s)
+                    RETURNING id
+                    """,
+                    (child['content'], child['embedding'], parent_id, child['chunk_index'])
+                )
+                index_entries.append((cur.fetchone()[0], child['content'], child['embedding'], parent_id, child['chunk_index']))
         
         conn.commit()
         
+        # Publish the same corpus as the shared memory-mapped index
+        report("indexing", 0, 1)
+        index_version = None
+        try:
+            from app.vector_index import write_index
+            index_version = write_index(index_entries, headings)
+        except Exception as e:
+            print(f"⚠️ Vector index not written ({e}); workers will search Postgres")
+        
         if verbose:
             print("="*60)
             print(f"✅ SUCCESS!")
-            print(f"   • Processed: {len(processed_chunks)} chunks")
+            print(f"   • Processed: {len(processed_chunks)} sections "
+                  f"({sum(len(c['children']) for c in processed_chunks)} child chunks)")
             print(f"   • Skipped: {len(skipped_chunks)} invalid chunks")
+            if near_duplicates is not None:
+                print(f"   • Near-duplicates dropped: {near_duplicates.duplicates} child chunks")
             print(f"   • Database: Updated with fresh embeddings")
             print("="*60 + "\n")
         
@@ -231,6 +346,14 @@ def ingest(verbose=True):
                 print(f"   • {section}: {count} chunks")
             print()
         
+        return {
+            "sections": len(processed_chunks),
+            "chunks": len(index_entries),
+            "skipped": len(skipped_chunks),
+            "near_duplicates": near_duplicates.duplicates if near_duplicates is not None else 0,
+            "index_version": index_version,
+        }
+        
     except Exception as e:
         print(f"❌ Database error: {e}")
         conn.rollback()
@@ -282,4 +405,8 @@ if __name__ == "__main__":
     # Verify results
     verify_ingestion()
     
+    # Pre-generate answers for the top recruiter intents from the fresh corpus
+    from app.faq_store import build_faq_store
+    build_faq_store(verbose=True)
+    
     print("✨ Ingestion complete! Your resume is now fully searchable.\n")
\ No newline at end of file
@@ -0,0 +1,267 @@
+"""
+intent_router.py - Compiled intent routing for incoming questions
+Replaces the per-request linear keyword scans with precompiled regexes and
+adds nearest-neighbour matching against canonical recruiter questions, so the
+questions everyone asks can be answered from the precomputed FAQ store
+(app/faq_store.py) instead of the full retrieval + LLM path.
+"""
+
+import math
+import re
+from collections import Counter
+from app.config import Config
+
+
+def _alternation(words):
+    # Longest first so "good morning" wins over "good"
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+# Same vocabularies the old substring scans used; compiled once at import
+SUBSTANTIVE_KEYWORDS = ["resume", "project", "work", "job", "skill", "experience", "education", "hired", "contact", "detail"]
+CASUAL_PATTERNS = [
+    "hello", "hi", "hey", "greetings", "good morning", "good evening",
+    "how are you", "what's up", "yo", "thanks", "thank you", "bye"
+]
+RECRUITER_KEYWORDS = ["experience", "skills", "resume", "projects", "hire", "role", "internship", "work", "education", "tech stack"]
+
+SUBSTANTIVE_RE = re.compile(_alternation(SUBSTANTIVE_KEYWORDS))
+CASUAL_EXACT = frozenset(CASUAL_PATTERNS)
+CASUAL_PREFIX_RE = re.compile(f"(?:{_alternation(CASUAL_PATTERNS)})")
+RECRUITER_RE = re.compile(_alternation(RECRUITER_KEYWORDS))
+
+
+def is_greeting_or_casual(question: str) -> bool:
+    """
+    Detect if the query is strictly a greeting.
+    If it contains substantive keywords (resume, project, skills), return False.
+    """
+    cleaned_q = question.lower().strip()
+
+    # If the user asks about specific topics, it is NOT just a greeting
+    if SUBSTANTIVE_RE.search(cleaned_q):
+        return False
+
+    # Exact match or very short greeting
+    if cleaned_q in CASUAL_EXACT:
+        return True
+
+    # If it's a short sentence starting with a greeting but no substantive keywords
+    return len(cleaned_q.split()) < 4 and bool(CASUAL_PREFIX_RE.match(cleaned_q))
+
+
+def detect_mode(question: str, mode: str = "auto") -> str:
+    """Resolve 'auto' to recruiter/casual; explicit modes pass through"""
+    if mode == "auto":
+        return "recruiter" if RECRUITER_RE.search(question.lower()) else "casual"
+    return mode.lower()
+
+
+# =============================================================================
+# Top recruiter intents. The first canonical question of each intent is the
+# one its precomputed answer is generated from.
+# =============================================================================
+INTENTS = {
+    "summary": {
+        "canonical": [
+            "Tell me about Sahil",
+            "Who is Sahil?",
+            "Give me a summary of his profile",
+            "Introduce yourself",
+        ],
+        "patterns": [r"\btell me about (him|sahil|yourself)\s*\??$", r"\bwho is sahil\b", r"\b(summary|overview|introduce)\b"],
+    },
+    "projects": {
+        "canonical": [
+            "What projects has Sahil worked on?",
+            "Tell me about his projects",
+            "What has he built?",
+            "List his projects",
+        ],
+        "patterns": [r"\bprojects?\b", r"\bbuilt\b"],
+    },
+    "best_project": {
+        "canonical": [
+            "What is his best project?",
+            "Which project is he most proud of?",
+            "What is his most impressive project?",
+        ],
+        "patterns": [r"\b(best|strongest|favou?rite|proud|impressive|flagship)\b"],
+    },
+    "technical_skills": {
+        "canonical": [
+            "What are Sahil's technical skills?",
+            "What is his tech stack?",
+            "Which programming languages and frameworks does he know?",
+            "What tools does he use?",
+        ],
+        "patterns": [r"\bskills?\b", r"\btech stack\b", r"\b(languages?|frameworks?|tools|technologies)\b"],
+    },
+    "experience": {
+        "canonical": [
+            "What is his work experience?",
+            "Has he done any internships?",
+            "Where has he worked?",
+            "What roles has he held?",
+        ],
+        "patterns": [r"\bexperience\b", r"\binternships?\b", r"\bworked\b", r"\broles?\b"],
+    },
+    "education": {
+        "canonical": [
+            "What is his educational background?",
+            "Where did he study?",
+            "What degree is he pursuing?",
+        ],
+        "patterns": [r"\beducation(al)?\b", r"\b(degree|college|university|stud(y|ied)|cgpa|gpa)\b"],
+    },
+    "achievements": {
+        "canonical": [
+            "What are his achievements?",
+            "Has he won any hackathons or awards?",
+        ],
+        "patterns": [r"\b(achievements?|awards?|hackathons?|competitions?|won)\b"],
+    },
+    "certifications": {
+        "canonical": [
+            "What certifications does he have?",
+            "Which courses has he completed?",
+        ],
+        "patterns": [r"\b(certifications?|certificates?|certified|courses?|nptel)\b"],
+    },
+    "contact": {
+        "canonical": [
+            "How can I contact Sahil?",
+            "How can I reach him?",
+            "What is his email address?",
+            "Where can I find his LinkedIn or GitHub?",
+        ],
+        "patterns": [r"\b(contact|reach|email|e-mail|phone|linkedin|github)\b"],
+    },
+    "why_hire": {
+        "canonical": [
+            "Why should we hire Sahil?",
+            "What makes him a good fit for the role?",
+            "What are his strengths?",
+        ],
+        "patterns": [r"\bhire\b", r"\b(good fit|strengths?|stand out)\b"],
+    },
+}
+
+# One alternation with a named group per intent: a single scan tells us every
+# intent whose vocabulary appears in the question.
+INTENT_RE = re.compile(
+    "|".join(f"(?P<{name}>{'|'.join(spec['patterns'])})" for name, spec in INTENTS.items())
+)
+
+_NN_STOPWORDS = {
+    'what', 'is', 'the', 'tell', 'me', 'about', 'your', 'my', 'a', 'an', 'are',
+    'how', 'which', 'where', 'when', 'can', 'you', 'of', 'for', 'with', 'and',
+    'was', 'were', 'had', 'has', 'have', 'he', 'his', 'him', 'does', 'do', 'did',
+    'sahil', "sahil's", 'i', 'any', 'or', 'on', 'in', 'to', 'we', 'should', 'give',
+}
+
+
+def _tokens(text):
+    words = re.findall(r"[a-z0-9+#']+", text.lower())
+    # Crude plural folding so "projects" and "project" meet
+    return [w[:-1] if len(w) > 3 and w.endswith('s') else w for w in words if w not in _NN_STOPWORDS]
+
+
+def _vector(text):
+    counts = Counter(_tokens(text))
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {t: v / norm for t, v in counts.items()}
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(t, 0.0) for t, v in a.items())
+
+
+_CANONICAL_VECTORS = [
+    (name, _vector(q)) for name, spec in INTENTS.items() for q in spec["canonical"]
+]
+
+
+# Words that don't narrow a question down any further than its intent does
+_GENERIC_WORDS = {
+    "know", "more", "please", "explain", "describe", "share",
+    "show", "main", "key", "top", "some", "all", "been", "us", "detail",
+}
+
+
+def _intent_vocabulary(spec):
+    """Tokens of an intent's canonical questions plus the literal words of its patterns"""
+    words = set()
+    for question in spec["canonical"]:
+        words.update(_tokens(question))
+    for pattern in spec["patterns"]:
+        words.update(_tokens(re.sub(r"\\[a-zA-Z]", " ", pattern)))
+    return words
+
+
+_INTENT_VOCABULARY = {name: _intent_vocabulary(spec) for name, spec in INTENTS.items()}
+
+
+def specific_terms(question, intent):
+    """Content words of the question that the intent's canonical questions don't cover"""
+    vocabulary = _INTENT_VOCABULARY[intent]
+    terms = []
+    for token in _tokens(question):
+        word = token.split("'")[0]  # "what's" -> "what", "react's" -> "react"
+        if word and word not in vocabulary and word not in _GENERIC_WORDS and word not in _NN_STOPWORDS:
+            terms.append(word)
+    return terms
+
+
+class IntentMatch:
+    def __init__(self, intent, score, method):
+        self.intent = intent
+        self.score = score
+        self.method = method  # "nearest", "pattern+nearest" or "pattern"
+
+    def __repr__(self):
+        return f"IntentMatch({self.intent!r}, {self.score:.2f}, {self.method!r})"
+
+
+def matched_intents(question):
+    """Every intent whose compiled pattern fires on the question"""
+    return {name for m in INTENT_RE.finditer(question.lower()) for name, v in m.groupdict().items() if v}
+
+
+def nearest_intent(question):
+    """(intent, cosine) of the closest canonical question"""
+    q_vec = _vector(question)
+    if not q_vec:
+        return None, 0.0
+    best_name, best_score = None, 0.0
+    for name, vec in _CANONICAL_VECTORS:
+        score = _cosine(q_vec, vec)
+        if score > best_score:
+            best_name, best_score = name, score
+    return best_name, best_score
+
+
+def route(question):
+    """
+    Map a question onto one of the top intents, or None.
+    A near-identical canonical question is enough on its own; a looser
+    neighbour must be confirmed by that intent's compiled pattern. A
+    question naming something the intent doesn't cover ("the SHAIDS
+    project", "built with React") is never routed: its generic FAQ answer
+    would miss the point, so it takes the grounded path.
+    """
+    intent, score = nearest_intent(question)
+    if intent is None:
+        # Only stopwords ("Tell me about Sahil"): nothing specific, so a
+        # single firing pattern decides
+        patterns = matched_intents(question)
+        return IntentMatch(patterns.pop(), 1.0, "pattern") if len(patterns) == 1 else None
+    if specific_terms(question, intent):
+        return None
+    if score >= Config.INTENT_STRONG_MATCH:
+        return IntentMatch(intent, score, "nearest")
+    if score >= Config.INTENT_WEAK_MATCH and intent in matched_intents(question):
+        return IntentMatch(intent, score, "pattern+nearest")
+    return None
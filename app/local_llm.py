@@ -0,0 +1,206 @@
+"""
+local_llm.py - Managed local generation through Ollama
+For self-hosted deployments (LLM_MODE=local or local_first) Ollama becomes
+a first-class provider instead of a last resort:
+  - warm model: warm-up preloads OLLAMA_MODEL, every request passes
+    OLLAMA_KEEP_ALIVE_SECONDS, and a background refresher re-touches the
+    model before it would be unloaded while idle (-1 = keep it loaded)
+  - context size: every request from every worker sends the same
+    OLLAMA_NUM_CTX. Ollama reloads the model whenever num_ctx differs from
+    the loaded one, so a per-request or per-process size would thrash it.
+    The provider router tries Ollama last for prompts that don't fit.
+  - concurrency: at most OLLAMA_CONCURRENCY generations at once across all
+    workers on the host (match the server's OLLAMA_NUM_PARALLEL). Each slot
+    is an exclusive lock on a file in OLLAMA_LOCK_DIR. A request that waits
+    longer than OLLAMA_QUEUE_TIMEOUT for a slot fails fast, so the router
+    falls back to the next provider instead of queueing behind the local GPU.
+
+`python -m app.ollama_mock` serves the same NDJSON protocol for local testing.
+"""
+
+import json
+import os
+import threading
+import time
+from app.config import Config
+from app.http_client import get_session
+from app.log import get_logger, fields
+from app.provider_router import estimate_tokens
+
+logger = get_logger(__name__)
+
+HEADERS = {"ngrok-skip-browser-warning": "any"}
+PROMPT_MARGIN_TOKENS = 64  # template / tokenizer slack on top of the estimate
+SLOT_POLL_SECONDS = 0.05
+
+
+class LocalModelBusy(RuntimeError):
+    """No generation slot freed up within OLLAMA_QUEUE_TIMEOUT"""
+
+
+_state = {"last_used": 0.0, "preloaded_at": None, "refresher": None}
+_stats = {"generations": 0, "busy_rejections": 0, "in_use": 0, "waiting": 0, "preloads": 0, "preload_errors": 0,
+          "truncation_risks": 0}
+_lock = threading.Lock()
+
+
+def _url(path):
+    return f"{Config.OLLAMA_URL.rstrip('/')}{path}"
+
+
+def fits(prompt_chars, max_output_tokens=None):
+    """Whether the prompt plus the answer fits in OLLAMA_NUM_CTX (Ollama truncates otherwise)"""
+    if max_output_tokens is None:
+        max_output_tokens = Config.LLM_MAX_OUTPUT_TOKENS
+    return estimate_tokens(prompt_chars) + max_output_tokens + PROMPT_MARGIN_TOKENS <= Config.OLLAMA_NUM_CTX
+
+
+def preload():
+    """Load the model (an empty prompt only loads it) and start the keep-alive refresher"""
+    started = time.perf_counter()
+    num_ctx = Config.OLLAMA_NUM_CTX
+    try:
+        response = get_session().post(_url("/api/generate"), headers=HEADERS, timeout=(
+            Config.OLLAMA_CONNECT_TIMEOUT, Config.OLLAMA_LOAD_TIMEOUT
+        ), json={
+            "model": Config.OLLAMA_MODEL,
+            "prompt": "",
+            "keep_alive": Config.OLLAMA_KEEP_ALIVE_SECONDS,
+            "options": {"num_ctx": num_ctx},
+        })
+        response.raise_for_status()
+        response.close()
+    except Exception:
+        with _lock:
+            _stats["preload_errors"] += 1
+        raise
+    with _lock:
+        _stats["preloads"] += 1
+        _state["preloaded_at"] = time.time()
+        _state["last_used"] = time.monotonic()
+    _start_refresher()
+    load_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("🦙 [Ollama] %s loaded", Config.OLLAMA_MODEL, extra=fields(num_ctx=num_ctx, load_ms=load_ms))
+    return {"model": Config.OLLAMA_MODEL, "num_ctx": num_ctx, "load_ms": load_ms}
+
+
+def _start_refresher():
+    keep_alive = Config.OLLAMA_KEEP_ALIVE_SECONDS
+    if keep_alive <= 0:
+        return  # 0 unloads right away, -1 never unloads: nothing to refresh
+    with _lock:
+        if _state["refresher"] is not None:
+            return
+        _state["refresher"] = threading.Thread(target=_refresh_loop, args=(keep_alive,), name="ollama-keepalive", daemon=True)
+    _state["refresher"].start()
+
+
+def _refresh_loop(keep_alive):
+    """Re-touch the model when it has been idle for half its keep-alive window"""
+    while True:
+        time.sleep(keep_alive / 2)
+        with _lock:
+            idle = time.monotonic() - _state["last_used"]
+        if idle >= keep_alive / 2:
+            try:
+                preload()
+            except Exception as e:
+                logger.warning("⚠️ [Ollama] Keep-alive refresh failed: %s", e)
+
+
+def _try_slot():
+    """An open file holding one of the host-wide slot locks, or None if all are taken"""
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    os.makedirs(Config.OLLAMA_LOCK_DIR, exist_ok=True)
+    for i in range(max(Config.OLLAMA_CONCURRENCY, 1)):
+        handle = open(os.path.join(Config.OLLAMA_LOCK_DIR, f"ollama-slot-{i}.lock"), "a")
+        if fcntl is None:
+            return handle  # no cross-process locking off POSIX
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return handle
+        except OSError:
+            handle.close()
+    return None
+
+
+def _acquire_slot():
+    with _lock:
+        _stats["waiting"] += 1
+    deadline = time.monotonic() + Config.OLLAMA_QUEUE_TIMEOUT
+    slot = _try_slot()
+    while slot is None and time.monotonic() < deadline:
+        time.sleep(SLOT_POLL_SECONDS)
+        slot = _try_slot()
+    with _lock:
+        _stats["waiting"] -= 1
+        if slot is not None:
+            _stats["in_use"] += 1
+        else:
+            _stats["busy_rejections"] += 1
+    if slot is None:
+        raise LocalModelBusy(f"all {Config.OLLAMA_CONCURRENCY} local generation slots busy")
+    return slot
+
+
+def _release_slot(slot):
+    with _lock:
+        _stats["in_use"] -= 1
+        _state["last_used"] = time.monotonic()
+    slot.close()  # closing the file drops its lock
+
+
+def generate(prompt, usage=None):
+    """Stream the answer for `prompt`; fills `usage` from the final NDJSON record"""
+    if not fits(len(prompt)):
+        with _lock:
+            _stats["truncation_risks"] += 1
+        logger.warning("📐 [Ollama] Prompt may not fit OLLAMA_NUM_CTX=%s; Ollama truncates its start", Config.OLLAMA_NUM_CTX)
+    slot = _acquire_slot()
+    try:
+        num_ctx = Config.OLLAMA_NUM_CTX
+        payload = {
+            "model": Config.OLLAMA_MODEL,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": Config.OLLAMA_KEEP_ALIVE_SECONDS,
+            "options": {"num_ctx": num_ctx, "temperature": 0.2, "num_predict": Config.LLM_MAX_OUTPUT_TOKENS},
+        }
+        with _lock:
+            _stats["generations"] += 1
+        timeout = (Config.OLLAMA_CONNECT_TIMEOUT, Config.OLLAMA_LOAD_TIMEOUT)
+        with get_session().post(_url("/api/generate"), json=payload, headers=HEADERS, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                text = chunk.get("response", "")
+                if text:
+                    yield text
+                if chunk.get("done"):
+                    if usage is not None:
+                        usage.update(prompt_tokens=chunk.get("prompt_eval_count"),
+                                     completion_tokens=chunk.get("eval_count"),
+                                     model=chunk.get("model"))
+                    break
+    finally:
+        _release_slot(slot)
+
+
+def get_stats():
+    with _lock:
+        return {
+            "mode": Config.LLM_MODE,
+            "model": Config.OLLAMA_MODEL,
+            "num_ctx": Config.OLLAMA_NUM_CTX,
+            "concurrency": Config.OLLAMA_CONCURRENCY,
+            "keep_alive_seconds": Config.OLLAMA_KEEP_ALIVE_SECONDS,
+            "preloaded_at": _state["preloaded_at"],
+            **_stats,
+        }
@@ -0,0 +1,189 @@
+"""
+log.py - Non-blocking structured logging for the request path
+Request handlers only put records on a bounded in-memory queue; a single
+QueueListener thread formats them (JSON or text) and writes to stdout, so a
+busy stdout never stalls a request. When the queue is full records are
+dropped and counted instead of blocking.
+
+  - every record carries the request id of the request that emitted it
+    (set per request by app/api.py, propagated through contextvars)
+  - structured fields:  logger.info("Retrieved", extra=fields(path="probe"))
+  - per-logger levels:  LOG_LEVELS="app.query_resume=DEBUG,app.db=WARNING"
+  - DEBUG output is rate limited per logger (LOG_DEBUG_RATE per second) and
+    sampled beyond that (LOG_DEBUG_SAMPLE), so enabling it stays cheap
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from app.config import Config
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+_configured = {"listener": None, "handler": None}
+_configure_lock = threading.Lock()
+_stats = {"dropped": 0, "debug_suppressed": 0}
+_plain = logging.Formatter()
+
+
+def fields(**values):
+    """extra= payload for structured fields on a log call"""
+    return {"fields": values}
+
+
+def get_logger(name):
+    configure_logging()
+    return logging.getLogger(name)
+
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugRateLimiter(logging.Filter):
+    """Token bucket per logger for DEBUG records; beyond it only a sample passes"""
+
+    def __init__(self, per_second, sample):
+        super().__init__()
+        self.per_second = per_second
+        self.sample = sample
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(record.name, (self.per_second, now))
+            tokens = min(self.per_second, tokens + (now - last) * self.per_second)
+            allowed = tokens >= 1
+            self._buckets[record.name] = (tokens - 1 if allowed else tokens, now)
+        if allowed or random.random() < self.sample:
+            return True
+        _stats["debug_suppressed"] += 1
+        return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats["dropped"] += 1
+
+    def prepare(self, record):
+        # Resolve the message (and traceback) on the caller, so mutable args
+        # can't change before the listener formats it; fields stay structured
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _plain.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        extra = getattr(record, "fields", None)
+        if extra:
+            entry.update(extra)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = record.getMessage()
+        extra = getattr(record, "fields", None)
+        if extra:
+            line += " | " + " ".join(f"{k}={v}" for k, v in extra.items())
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            line = f"[{request_id}] {line}"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def _apply_levels():
+    logging.getLogger("app").setLevel(Config.LOG_LEVEL.upper())
+    for item in Config.LOG_LEVELS.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def configure_logging():
+    """Install the queue handler on the `app` logger tree (idempotent)"""
+    if _configured["listener"] is not None:
+        return
+    with _configure_lock:
+        if _configured["listener"] is not None:
+            return
+
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter() if Config.LOG_FORMAT == "json" else TextFormatter())
+
+        records = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        handler = DroppingQueueHandler(records)
+        handler.addFilter(RequestContextFilter())
+        handler.addFilter(DebugRateLimiter(Config.LOG_DEBUG_RATE, Config.LOG_DEBUG_SAMPLE))
+
+        root = logging.getLogger("app")
+        root.addHandler(handler)
+        root.propagate = False
+        _apply_levels()
+
+        listener = logging.handlers.QueueListener(records, stream, respect_handler_level=False)
+        listener.start()
+        atexit.register(lambda: _configured["listener"].stop())
+        _configured["listener"] = listener
+        _configured["handler"] = handler
+
+
+def _restart_after_fork():
+    """A forked worker (gunicorn --preload) inherits the queue but not the listener thread"""
+    listener = _configured["listener"]
+    if listener is None:
+        return
+    records = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+    _configured["handler"].queue = records
+    restarted = logging.handlers.QueueListener(records, *listener.handlers, respect_handler_level=False)
+    restarted.start()
+    _configured["listener"] = restarted
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def get_stats():
+    listener = _configured["listener"]
+    return {
+        **_stats,
+        "queue_depth": listener.queue.qsize() if listener else 0,
+        "format": Config.LOG_FORMAT,
+    }
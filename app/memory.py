@@ -0,0 +1,252 @@
+"""
+memory.py - Memory gauges, allocation tracing and a soft memory budget
+The API runs on a small-memory instance, so this module makes memory use
+visible and keeps it under a budget:
+  - gauges: process RSS, Python heap blocks, gc object counts
+  - stages: per-stage allocation deltas (retrieval, prompt build, streaming),
+    measured with tracemalloc while tracing is on and RSS otherwise
+  - tracing: opt-in tracemalloc snapshot/diff (admin endpoints in app/api.py)
+  - budget: above MEMORY_SOFT_LIMIT_MB registered caches are cleared; above
+    MEMORY_SHED_LIMIT_MB new questions are refused with a 503 until it drops.
+    Freed objects rarely give RSS back, so caches are cleared once and again
+    only after RSS has fallen below the low-water mark (LOW_WATER_RATIO of
+    the soft limit) or MEMORY_CLEAR_COOLDOWN_SECONDS have passed, and never
+    while they are empty
+Stage deltas are process-wide, so concurrent requests overlap in them; read
+them as trends, not exact per-request figures.
+"""
+
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from app.config import Config
+
+MB = 1024 * 1024
+LOW_WATER_RATIO = 0.9
+
+_caches = {}  # name -> object with clear()
+_stages = {}  # name -> {count, total_bytes, max_bytes, last_bytes}
+_lock = threading.Lock()
+_budget = {"checked_at": 0.0, "cleared_at": None, "armed": True, "over_soft": False,
+           "shedding": False, "cache_clears": 0, "clears_skipped": 0, "shed_requests": 0}
+_tracing = {"baseline": None, "started_at": None}
+
+
+def rss_bytes():
+    """Current resident set size (falls back to peak RSS off Linux)"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+def register_cache(name, cache):
+    """Make a cache (anything with clear()) eligible for clearing under memory pressure"""
+    with _lock:
+        _caches[name] = cache
+
+
+def cached_entries():
+    """Entries held by the registered caches that report a size"""
+    with _lock:
+        caches = list(_caches.values())
+    total = 0
+    for cache in caches:
+        try:
+            total += len(cache)
+        except TypeError:
+            pass
+    return total
+
+
+def clear_caches():
+    with _lock:
+        caches = list(_caches.items())
+    for name, cache in caches:
+        try:
+            cache.clear()
+        except Exception as e:
+            print(f"⚠️ [Memory] Could not clear cache '{name}': {e}")
+    gc.collect()
+    return [name for name, _ in caches]
+
+
+# =============================================================================
+# Per-stage allocation deltas
+# =============================================================================
+def _current_bytes():
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return rss_bytes()
+
+
+@contextmanager
+def stage(name):
+    """Record how much memory a block of work added (negative if it freed)"""
+    if not Config.MEMORY_STAGE_TRACKING:
+        yield
+        return
+    before = _current_bytes()
+    try:
+        yield
+    finally:
+        delta = _current_bytes() - before
+        with _lock:
+            s = _stages.setdefault(name, {"count": 0, "total_bytes": 0, "max_bytes": 0, "last_bytes": 0})
+            s["count"] += 1
+            s["total_bytes"] += delta
+            s["max_bytes"] = max(s["max_bytes"], delta)
+            s["last_bytes"] = delta
+
+
+def stage_stats():
+    with _lock:
+        stages = {k: dict(v) for k, v in _stages.items()}
+    for s in stages.values():
+        s["mean_kb"] = round(s["total_bytes"] / s["count"] / 1024, 1) if s["count"] else 0.0
+        s["max_kb"] = round(s.pop("max_bytes") / 1024, 1)
+        s["last_kb"] = round(s.pop("last_bytes") / 1024, 1)
+        s.pop("total_bytes")
+    return {"source": "tracemalloc" if tracemalloc.is_tracing() else "rss", "stages": stages}
+
+
+# =============================================================================
+# Opt-in tracemalloc snapshots
+# =============================================================================
+def start_tracing(frames=None):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames or Config.TRACEMALLOC_FRAMES)
+        _tracing["started_at"] = time.time()
+    _tracing["baseline"] = tracemalloc.take_snapshot()
+    return tracing_status()
+
+
+def stop_tracing():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _tracing["baseline"] = None
+    _tracing["started_at"] = None
+    return tracing_status()
+
+
+def tracing_status():
+    status = {"tracing": tracemalloc.is_tracing(), "started_at": _tracing["started_at"]}
+    if status["tracing"]:
+        current, peak = tracemalloc.get_traced_memory()
+        status.update(traced_mb=round(current / MB, 2), peak_mb=round(peak / MB, 2))
+    return status
+
+
+def snapshot_diff(top=20, group_by="lineno"):
+    """Top allocation growth since the baseline snapshot (taken at start or the last reset)"""
+    if not tracemalloc.is_tracing() or _tracing["baseline"] is None:
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    stats = snapshot.compare_to(_tracing["baseline"], group_by)
+    return [
+        {
+            "location": str(stat.traceback[0]) if stat.traceback else "?",
+            "size_kb": round(stat.size / 1024, 1),
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "count": stat.count,
+            "count_diff": stat.count_diff,
+        }
+        for stat in stats[:top]
+    ]
+
+
+def reset_baseline():
+    if tracemalloc.is_tracing():
+        _tracing["baseline"] = tracemalloc.take_snapshot()
+    return tracing_status()
+
+
+# =============================================================================
+# Soft budget
+# =============================================================================
+def admit():
+    """
+    Called before expensive requests. Clears caches when RSS crosses the soft
+    limit and returns False (shed the request) while it stays above the shed
+    limit. Checks RSS at most once per MEMORY_CHECK_SECONDS.
+    """
+    soft = Config.MEMORY_SOFT_LIMIT_MB * MB
+    shed = Config.MEMORY_SHED_LIMIT_MB * MB
+    if not soft and not shed:
+        return True
+
+    now = time.monotonic()
+    with _lock:
+        if now - _budget["checked_at"] < Config.MEMORY_CHECK_SECONDS:
+            if _budget["shedding"]:
+                _budget["shed_requests"] += 1
+            return not _budget["shedding"]
+        _budget["checked_at"] = now
+
+    rss = rss_bytes()
+    if soft and rss < soft * LOW_WATER_RATIO:
+        with _lock:
+            _budget["armed"] = True
+    if soft and rss > soft:
+        with _lock:
+            cleared_at = _budget["cleared_at"]
+            due = _budget["armed"] or cleared_at is None or now - cleared_at >= Config.MEMORY_CLEAR_COOLDOWN_SECONDS
+        if due and cached_entries():
+            cleared = clear_caches()
+            rss_after = rss_bytes()
+            with _lock:
+                _budget.update(cleared_at=now, armed=False)
+                _budget["cache_clears"] += 1
+            print(f"🧹 [Memory] RSS {rss / MB:.0f} MB over soft limit, cleared {cleared} -> {rss_after / MB:.0f} MB")
+            rss = rss_after
+        else:
+            with _lock:
+                _budget["clears_skipped"] += 1
+
+    shedding = bool(shed and rss > shed)
+    with _lock:
+        _budget["over_soft"] = bool(soft and rss > soft)
+        if shedding and not _budget["shedding"]:
+            print(f"🛑 [Memory] RSS {rss / MB:.0f} MB over shed limit, refusing new questions")
+        _budget["shedding"] = shedding
+        if shedding:
+            _budget["shed_requests"] += 1
+    return not shedding
+
+
+def under_pressure():
+    """Result of the last budget check, without running one (for optional work)"""
+    with _lock:
+        return _budget["shedding"] or _budget["over_soft"]
+
+
+def get_gauges():
+    counts = gc.get_count()
+    with _lock:
+        budget = {k: v for k, v in _budget.items() if k not in ("checked_at", "cleared_at")}
+        caches = sorted(_caches)
+    return {
+        "rss_mb": round(rss_bytes() / MB, 1),
+        "heap_blocks": sys.getallocatedblocks(),
+        "gc_counts": list(counts),
+        "gc_objects": len(gc.get_objects()) if Config.MEMORY_COUNT_OBJECTS else None,
+        "soft_limit_mb": Config.MEMORY_SOFT_LIMIT_MB or None,
+        "shed_limit_mb": Config.MEMORY_SHED_LIMIT_MB or None,
+        "registered_caches": caches,
+        **budget,
+    }
@@ -0,0 +1,167 @@
+"""
+notifications.py - Bounded background delivery for owner email alerts
+Request handlers enqueue an event and return immediately. A fixed pool of
+worker threads drains a bounded queue, coalesces bursts that arrive within a
+short window into a single digest email, and retries sends that failed
+transiently (network error, 429, 5xx) with exponential backoff; a rejected
+send (other 4xx) is dropped at once. When the queue is full new events are
+dropped (and counted) rather than growing threads or memory without bound.
+
+The queue and its digests are per worker process: with WEB_CONCURRENCY
+workers, a burst spread across them sends up to one digest per worker.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+from app.config import Config
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+
+class NotificationQueue:
+    def __init__(self, workers, maxsize, digest_window, max_batch, max_retries, backoff_seconds):
+        self.workers = workers
+        self.digest_window = digest_window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._metrics = {
+            "enqueued": 0,
+            "dropped": 0,
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "digests": 0,
+            "in_flight": 0,
+        }
+
+    def _incr(self, key, amount=1):
+        with self._lock:
+            self._metrics[key] += amount
+
+    def start(self):
+        """Start the worker pool once (lazily, on the first event)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"notify-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def enqueue(self, requester_email, purpose, note):
+        """Queue an alert without blocking the request. Returns False if dropped."""
+        self.start()
+        event = {
+            "email": requester_email,
+            "purpose": purpose,
+            "note": note,
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._incr("dropped")
+            logger.warning("⚠️ [Notify] Queue full (%s), dropped alert for %s", self._queue.maxsize, requester_email)
+            return False
+        self._incr("enqueued")
+        return True
+
+    def _collect_batch(self):
+        """Block for one event, then gather whatever else arrives within the window"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.digest_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            self._incr("in_flight", len(batch))
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                logger.error("❌ [Notify] Worker error: %s", e)
+                self._incr("failed", len(batch))
+            finally:
+                self._incr("in_flight", -len(batch))
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, batch):
+        from app import email_service
+
+        if not email_service.is_configured():
+            # Retrying can't fix missing credentials
+            logger.error("❌ [Notify] Email not configured, discarding alerts")
+            self._incr("failed", len(batch))
+            return
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                if len(batch) == 1:
+                    event = batch[0]
+                    ok = email_service.send_download_alert(event["email"], event["purpose"], event["note"])
+                else:
+                    ok = email_service.send_digest_alert(batch)
+            except email_service.TransientEmailError as e:
+                error = e
+            else:
+                if not ok:
+                    # A 4xx (bad key, rejected payload) fails the same way every time
+                    logger.error("❌ [Notify] Send rejected, not retrying %s alert(s)", len(batch))
+                    self._incr("failed", len(batch))
+                    return
+                self._incr("sent", len(batch))
+                if len(batch) > 1:
+                    self._incr("digests")
+                return
+
+            if attempt < self.max_retries:
+                delay = self.backoff_seconds * (2 ** attempt)
+                self._incr("retries")
+                logger.warning("🔁 [Notify] Send failed (%s), retrying in %.1fs (%s/%s)",
+                               error, delay, attempt + 1, self.max_retries)
+                time.sleep(delay)
+
+        logger.error("❌ [Notify] Giving up on %s alert(s) after %s retries", len(batch), self.max_retries)
+        self._incr("failed", len(batch))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["queue_capacity"] = self._queue.maxsize
+        stats["workers"] = len(self._threads)
+        return stats
+
+
+_notifier = NotificationQueue(
+    workers=Config.NOTIFY_WORKERS,
+    maxsize=Config.NOTIFY_QUEUE_SIZE,
+    digest_window=Config.NOTIFY_DIGEST_WINDOW,
+    max_batch=Config.NOTIFY_MAX_BATCH,
+    max_retries=Config.NOTIFY_MAX_RETRIES,
+    backoff_seconds=Config.NOTIFY_BACKOFF_SECONDS,
+)
+
+
+def notify_download(requester_email, purpose, note):
+    return _notifier.enqueue(requester_email, purpose, note)
+
+
+def get_stats():
+    return _notifier.stats()
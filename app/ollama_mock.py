@@ -0,0 +1,229 @@
+"""
+ollama_mock.py - Stand-in Ollama server speaking the NDJSON protocol
+Lets the local generation path (app/local_llm.py) be exercised without a
+GPU or a downloaded model. It mimics the server behaviour that matters for
+latency:
+  - a model load costs --load-ms, paid again whenever num_ctx changes or
+    the keep_alive window (per request, default 5m) has expired
+  - at most --parallel generations run at once; the rest queue
+  - tokens stream as NDJSON lines every --token-ms, and the final line
+    carries done, prompt_eval_count, eval_count and the durations
+  - --fail-rate makes a share of generations answer HTTP 500
+Implemented: GET /api/tags, GET /api/ps, POST /api/generate (an empty
+prompt only loads the model), plus GET /mock/stats for the counters.
+
+Usage:
+    python -m app.ollama_mock --port 11435 --load-ms 1500 --token-ms 20
+    OLLAMA_URL=http://localhost:11435 LLM_MODE=local python -m app.api
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_KEEP_ALIVE = 300
+DURATION = re.compile(r"^(-?\d+(?:\.\d+)?)(ms|s|m|h)?$")
+UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+
+
+def parse_keep_alive(value):
+    """Seconds from Ollama's keep_alive (number of seconds or "5m"-style); negative = forever"""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = DURATION.match(str(value).strip())
+    if not match:
+        return DEFAULT_KEEP_ALIVE
+    return float(match.group(1)) * UNIT_SECONDS[match.group(2)]
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class MockModel:
+    def __init__(self, args):
+        self.args = args
+        self.slots = threading.BoundedSemaphore(args.parallel)
+        self.lock = threading.Lock()
+        self.loaded = None  # {"model", "num_ctx", "expires_at"}
+        self.stats = {"requests": 0, "loads": 0, "failures": 0, "active": 0, "max_active": 0}
+
+    def ensure_loaded(self, model, num_ctx, keep_alive):
+        """Returns the load time paid by this call (0 if the model was warm)"""
+        with self.lock:
+            now = time.monotonic()
+            current = self.loaded
+            warm = (
+                current is not None and current["model"] == model and current["num_ctx"] == num_ctx
+                and (current["expires_at"] is None or current["expires_at"] > now)
+            )
+            load_seconds = 0.0 if warm else self.args.load_ms / 1000
+            if not warm:
+                self.stats["loads"] += 1
+            self.loaded = {
+                "model": model,
+                "num_ctx": num_ctx,
+                "expires_at": None if keep_alive < 0 else now + load_seconds + keep_alive,
+            }
+        if load_seconds:
+            print(f"🦙 [OllamaMock] Loading {model} (num_ctx={num_ctx}, {self.args.load_ms} ms)")
+            time.sleep(load_seconds)
+        return load_seconds
+
+    def touch(self, keep_alive):
+        with self.lock:
+            if self.loaded is not None:
+                self.loaded["expires_at"] = None if keep_alive < 0 else time.monotonic() + keep_alive
+
+    def answer_tokens(self, prompt):
+        question = prompt.strip().splitlines()[-1] if prompt.strip() else ""
+        text = self.args.answer or f"This is a mock answer from the local model. You asked: {question[:200]}"
+        return re.findall(r"\S+\s*", text)
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json(200, {"models": [{"name": mock.args.model, "model": mock.args.model, "size": 0}]})
+            elif self.path == "/api/ps":
+                with mock.lock:
+                    loaded = dict(mock.loaded) if mock.loaded else None
+                alive = loaded and (loaded["expires_at"] is None or loaded["expires_at"] > time.monotonic())
+                self._json(200, {"models": [{"name": loaded["model"], "context_length": loaded["num_ctx"]}] if alive else []})
+            elif self.path == "/mock/stats":
+                with mock.lock:
+                    self._json(200, dict(mock.stats))
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self._json(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                self._json(400, {"error": "invalid JSON"})
+                return
+            self._generate(request)
+
+        def _generate(self, request):
+            model = request.get("model", mock.args.model)
+            prompt = request.get("prompt", "")
+            options = request.get("options") or {}
+            num_ctx = int(options.get("num_ctx", 2048))
+            keep_alive = parse_keep_alive(request.get("keep_alive"))
+            started = time.perf_counter()
+
+            with mock.slots:
+                with mock.lock:
+                    mock.stats["requests"] += 1
+                    mock.stats["active"] += 1
+                    mock.stats["max_active"] = max(mock.stats["max_active"], mock.stats["active"])
+                try:
+                    load_seconds = mock.ensure_loaded(model, num_ctx, keep_alive)
+                    if not prompt:
+                        self._json(200, {"model": model, "created_at": _now(), "response": "", "done": True, "done_reason": "load"})
+                        return
+                    if random.random() < mock.args.fail_rate:
+                        with mock.lock:
+                            mock.stats["failures"] += 1
+                        self._json(500, {"error": "mock failure"})
+                        return
+
+                    tokens = mock.answer_tokens(prompt)
+                    limit = int(options.get("num_predict", len(tokens)))
+                    tokens = tokens[:limit] if limit >= 0 else tokens
+                    final = {
+                        "model": model,
+                        "created_at": _now(),
+                        "response": "",
+                        "done": True,
+                        "done_reason": "stop",
+                        "load_duration": int(load_seconds * 1e9),
+                        "prompt_eval_count": max(1, len(prompt) // 4),
+                        "eval_count": len(tokens),
+                    }
+                    if request.get("stream", True):
+                        self._stream(model, tokens, final, started)
+                    else:
+                        time.sleep(len(tokens) * mock.args.token_ms / 1000)
+                        final["response"] = "".join(tokens)
+                        final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+                        self._json(200, final)
+                finally:
+                    mock.touch(keep_alive)
+                    with mock.lock:
+                        mock.stats["active"] -= 1
+
+        def _stream(self, model, tokens, final, started):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(record):
+                line = (json.dumps(record) + "\n").encode()
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+
+            for token in tokens:
+                time.sleep(mock.args.token_ms / 1000)
+                send({"model": model, "created_at": _now(), "response": token, "done": False})
+            final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+            send(final)
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def serve(args):
+    mock = MockModel(args)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(mock))
+    server.daemon_threads = True
+    print(f"🦙 [OllamaMock] Serving {args.model} on http://{args.host}:{args.port} "
+          f"(parallel={args.parallel}, load={args.load_ms} ms, token={args.token_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server (NDJSON streaming) for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--load-ms", type=int, default=1500, help="Cost of a (re)load")
+    parser.add_argument("--token-ms", type=int, default=20, help="Delay between streamed tokens")
+    parser.add_argument("--parallel", type=int, default=1, help="Concurrent generations (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of generations answering HTTP 500")
+    parser.add_argument("--answer", default=None, help="Fixed answer text instead of echoing the question")
+    serve(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
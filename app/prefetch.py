@@ -0,0 +1,347 @@
+"""
+prefetch.py - Speculative warm-up of likely follow-up questions
+After an answer completes, the questions a visitor is likely to ask next are
+predicted and their retrieval is run in the background, so the embedding and
+retrieval caches are already warm when the follow-up arrives:
+  - prediction: the answered question is mapped to its intent, and the
+    follow-ups are what visitors actually asked next in query_logs
+    (consecutive questions from one IP within FOLLOWUP_WINDOW_MINUTES, seen
+    at least PREFETCH_MIN_TRANSITIONS times, refreshed every
+    PREFETCH_LOG_REFRESH_SECONDS). Questions the FAQ store already answers
+    are skipped. A fixed intent graph would only predict canonical FAQ
+    wordings, which are either served from the store or never typed.
+  - sessions: a predicted question is resolved through plan_followup first,
+    so the warmed cache key is the rewritten query the follow-up will use
+  - answers (PREFETCH_ANSWERS=true): the full answer is generated too and
+    kept for PREFETCH_ANSWER_TTL. Answers are generated without conversation
+    context, so they are only served to questions without history.
+  - low priority: PREFETCH_WORKERS threads drain a bounded queue (full ->
+    dropped), skip work while PREFETCH_MAX_INFLIGHT live answers are running,
+    under memory pressure or while the embedding provider is backed off, and
+    drop jobs older than PREFETCH_MAX_DELAY_SECONDS
+  - budgets: PREFETCH_RETRIEVALS_PER_MINUTE and PREFETCH_ANSWERS_PER_HOUR
+    cap the extra provider calls
+Off by default (PREFETCH_ENABLED): turn it on once /metrics shows that
+`hits` (live retrievals of a prefetched query) justify the extra calls.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from app.config import Config
+from app.cache import TTLCache
+from app.intent_router import route, nearest_intent
+from app.ingest_jobs import on_corpus_change
+from app.sessions import plan_followup
+from app import memory
+from app.log import get_logger, fields
+
+logger = get_logger(__name__)
+
+FOLLOWUP_WINDOW_MINUTES = 30
+EXCLUDED_LOG_IPS = ("faq_builder", "unknown")
+
+_queue = queue.Queue(maxsize=max(Config.PREFETCH_QUEUE_SIZE, 1))
+_threads = []
+_lock = threading.Lock()
+_spent = {"retrievals": deque(), "answers": deque()}  # timestamps inside the budget window
+_transitions = {"topics": {}, "loaded_at": None, "queued": False}
+_warmed = TTLCache(max_entries=512, ttl_seconds=max(Config.RETRIEVAL_CACHE_TTL // 2, 1))
+_answers = TTLCache(max_entries=64, ttl_seconds=Config.PREFETCH_ANSWER_TTL)
+_stats = {
+    "scheduled": 0, "dropped_queue_full": 0, "dropped_stale": 0, "skipped_busy": 0,
+    "skipped_budget": 0, "warmed": 0, "answers": 0, "errors": 0, "hits": 0, "answer_hits": 0,
+}
+
+memory.register_cache("prefetch_answers", _answers)
+
+
+def _incr(key):
+    with _lock:
+        _stats[key] += 1
+
+
+def _normalize(question):
+    return " ".join(question.lower().split())
+
+
+def _topic(question):
+    """Intent of the question, or its normalized text when it has none"""
+    match = route(question)
+    if match:
+        return match.intent
+    intent, score = nearest_intent(question)
+    return intent if score >= Config.INTENT_WEAK_MATCH else _normalize(question)
+
+
+def _clear():
+    _warmed.clear()
+    _answers.clear()
+
+
+on_corpus_change("prefetch", _clear)
+
+
+# =============================================================================
+# Prediction
+# =============================================================================
+def _load_transitions():
+    """Count (topic -> next question) over consecutive questions in query_logs"""
+    from app.db import pooled_connection
+
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT question, next_question, COUNT(*) FROM (
+                SELECT question, created_at,
+                       LEAD(question) OVER w AS next_question,
+                       LEAD(created_at) OVER w AS next_at
+                FROM query_logs
+                WHERE created_at > now() - %s * INTERVAL '1 day'
+                  AND user_ip IS NOT NULL AND user_ip NOT IN %s
+                WINDOW w AS (PARTITION BY user_ip ORDER BY created_at)
+            ) pairs
+            WHERE next_question IS NOT NULL AND next_at - created_at < %s * INTERVAL '1 minute'
+            GROUP BY question, next_question
+            """,
+            (Config.PREFETCH_LOG_DAYS, EXCLUDED_LOG_IPS, FOLLOWUP_WINDOW_MINUTES),
+        )
+        rows = cur.fetchall()
+        cur.close()
+
+    topics = {}
+    for question, next_question, count in rows:
+        if not question or not next_question or _normalize(question) == _normalize(next_question):
+            continue
+        nexts = topics.setdefault(_topic(question), {})
+        key = _normalize(next_question)
+        text, total = nexts.get(key, (next_question.strip(), 0))
+        nexts[key] = (text, total + count)
+    ranked = {
+        topic: [text for text, count in sorted(nexts.values(), key=lambda item: -item[1])
+                if count >= Config.PREFETCH_MIN_TRANSITIONS]
+        for topic, nexts in topics.items()
+    }
+    return ranked
+
+
+def _transitions_stale():
+    loaded_at = _transitions["loaded_at"]
+    return loaded_at is None or time.monotonic() - loaded_at >= Config.PREFETCH_LOG_REFRESH_SECONDS
+
+
+def _refresh_transitions():
+    """Reload the query_logs transitions (worker thread only)"""
+    _transitions["loaded_at"] = time.monotonic()
+    _transitions["queued"] = False
+    try:
+        _transitions["topics"] = _load_transitions()
+        logger.info("🔮 [Prefetch] Loaded follow-up transitions", extra=fields(topics=len(_transitions["topics"])))
+    except Exception as e:
+        logger.warning("⚠️ [Prefetch] Could not load query_logs transitions: %s", e)
+
+
+def predict(question, limit=None):
+    """Likely next questions after `question`, most likely first"""
+    if limit is None:
+        limit = Config.PREFETCH_MAX_QUESTIONS
+    candidates = _transitions["topics"].get(_topic(question), [])
+
+    asked = _normalize(question)
+    predicted, seen = [], {asked}
+    for candidate in candidates:
+        key = _normalize(candidate)
+        if key not in seen:
+            seen.add(key)
+            predicted.append(candidate)
+        if len(predicted) >= limit:
+            break
+    return predicted
+
+
+# =============================================================================
+# Scheduling
+# =============================================================================
+def _start():
+    with _lock:
+        if _threads:
+            return
+        for i in range(max(Config.PREFETCH_WORKERS, 1)):
+            t = threading.Thread(target=_run, name=f"prefetch-{i}", daemon=True)
+            t.start()
+            _threads.append(t)
+
+
+def schedule(question, mode, session=None):
+    """Queue warm-ups for the predicted follow-ups of an answered question (never blocks)"""
+    if not Config.PREFETCH_ENABLED:
+        return 0
+    _start()
+    if _transitions_stale() and not _transitions["queued"]:
+        try:
+            _queue.put_nowait({"refresh": True})
+            _transitions["queued"] = True
+        except queue.Full:
+            pass
+    try:
+        predicted = predict(question)
+    except Exception as e:
+        logger.warning("⚠️ [Prefetch] Prediction failed: %s", e)
+        return 0
+
+    queued = 0
+    for candidate in predicted:
+        search_query, reused_chunks = plan_followup(candidate, session)
+        if reused_chunks is not None:
+            continue  # the session's chunks will be reused: nothing to retrieve
+        job = {
+            "question": candidate,
+            "search_query": search_query,
+            "mode": mode,
+            "standalone": search_query == candidate,
+            "queued_at": time.monotonic(),
+        }
+        try:
+            _queue.put_nowait(job)
+        except queue.Full:
+            _incr("dropped_queue_full")
+            break
+        _incr("scheduled")
+        queued += 1
+    if queued:
+        logger.debug("🔮 [Prefetch] Queued follow-ups", extra=fields(count=queued))
+    return queued
+
+
+def _within_budget(kind, limit, window):
+    """Take one unit from a sliding-window budget; False when it is spent"""
+    now = time.monotonic()
+    with _lock:
+        spent = _spent[kind]
+        while spent and now - spent[0] > window:
+            spent.popleft()
+        if len(spent) >= limit:
+            return False
+        spent.append(now)
+        return True
+
+
+def _busy():
+    """Live traffic comes first: skip while answers are running or resources are short"""
+    from app.embeddings import get_stats as embedding_stats
+    from app.rag_answer import get_inflight_stats
+
+    if get_inflight_stats()["in_flight"] >= Config.PREFETCH_MAX_INFLIGHT:
+        return True
+    if embedding_stats()["backed_off_seconds"] > 0:
+        return True
+    return memory.under_pressure()
+
+
+def _run():
+    while True:
+        job = _queue.get()
+        try:
+            _process(job)
+        except Exception as e:
+            _incr("errors")
+            logger.warning("⚠️ [Prefetch] Warm-up failed: %s", e)
+        finally:
+            _queue.task_done()
+
+
+def _process(job):
+    if job.get("refresh"):
+        _refresh_transitions()
+        return
+    if time.monotonic() - job["queued_at"] > Config.PREFETCH_MAX_DELAY_SECONDS:
+        _incr("dropped_stale")
+        return
+    if job["standalone"]:
+        from app import faq_store
+        if faq_store.lookup(job["question"])[1]:
+            return  # answered from the FAQ store without retrieval
+
+    key = _normalize(job["search_query"])
+    answer_key = (_normalize(job["question"]), job["mode"])
+    want_retrieval = _warmed.get(key) is None
+    want_answer = Config.PREFETCH_ANSWERS and job["standalone"] and _answers.get(answer_key) is None
+    if not want_retrieval and not want_answer:
+        return
+    if _busy():
+        _incr("skipped_busy")
+        return
+
+    from app.query_resume import hybrid_search
+
+    if want_retrieval:
+        if not _within_budget("retrievals", Config.PREFETCH_RETRIEVALS_PER_MINUTE, 60):
+            _incr("skipped_budget")
+            return
+        # Same call shape as generate_answer_with_sources, so the cache keys match
+        trace = {}
+        hybrid_search(job["search_query"], top_k=Config.RETRIEVAL_TOP_K, trace=trace)
+        _warmed.set(key, True)
+        _incr("warmed")
+        logger.debug("🔮 [Prefetch] Warmed retrieval", extra=fields(query=job["search_query"], path=trace.get("path")))
+
+    if want_answer:
+        if not _within_budget("answers", Config.PREFETCH_ANSWERS_PER_HOUR, 3600):
+            _incr("skipped_budget")
+            return
+        _prefetch_answer(job, answer_key)
+
+
+def _prefetch_answer(job, answer_key):
+    """Run the answer pipeline without history; keep the answer only if it completed"""
+    from app.rag_answer import _answer_pipeline
+
+    parts, completion = [], None
+    for event in _answer_pipeline(job["question"], job["question"], None, job["mode"], ""):
+        if "top_chunks" in event:
+            completion = event
+        elif event.get("answer_chunk"):
+            parts.append(event["answer_chunk"])
+    if completion is None:
+        return
+    _answers.set(answer_key, {
+        "answer": "".join(parts),
+        "metadata": completion["metadata"],
+        "provider": completion["provider"],
+        "top_chunks": completion["top_chunks"],
+    })
+    _incr("answers")
+    logger.info("🔮 [Prefetch] Answer prepared", extra=fields(question=job["question"], provider=completion["provider"]))
+
+
+# =============================================================================
+# Serving
+# =============================================================================
+def note_request(search_query):
+    """Count a live retrieval whose cache entry was warmed by a prefetch"""
+    if Config.PREFETCH_ENABLED and _warmed.get(_normalize(search_query)) is not None:
+        _incr("hits")
+
+
+def take_answer(question, mode):
+    """A prefetched answer for a question asked without history, or None"""
+    if not Config.PREFETCH_ANSWERS:
+        return None
+    entry = _answers.get((_normalize(question), mode))
+    if entry is not None:
+        _incr("answer_hits")
+    return entry
+
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+    return {
+        "enabled": Config.PREFETCH_ENABLED,
+        "queued": _queue.qsize(),
+        "transition_topics": len(_transitions["topics"]),
+        "answers_cached": len(_answers),
+        **stats,
+    }
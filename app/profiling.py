@@ -0,0 +1,230 @@
+"""
+profiling.py - On-demand sampling profiler for individual requests
+A request is profiled when it carries a valid signed `X-Profile` header or
+is picked by PROFILE_SAMPLE_RATE. Its response stream is then wrapped: a
+real OS thread (never a gevent greenlet, so it keeps sampling while the
+request waits on I/O) records the request's stack every
+PROFILE_INTERVAL_MS, whether the request is running or suspended. When the
+stream ends the samples are written as collapsed stacks (flamegraph.pl /
+speedscope input) to a bounded ring of files in PROFILE_DIR. Unprofiled
+requests only pay for one header lookup (and one random() when sampling).
+
+Signed header:  X-Profile: <unix_ts>:<hex hmac-sha256(secret, "profile:<unix_ts>")>
+where secret = PROFILE_SECRET (or ADMIN_TOKEN). `python -m app.profiling`
+prints a fresh header value.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from app.config import Config
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{13}-[0-9a-f]{8}$")
+MAX_STACK_DEPTH = 128
+SIGNATURE_MAX_AGE = 300
+
+
+def _secret():
+    return Config.PROFILE_SECRET or Config.ADMIN_TOKEN
+
+
+def sign_header(secret=None, timestamp=None):
+    secret = secret or _secret()
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    signature = hmac.new(secret.encode(), f"profile:{timestamp}".encode(), hashlib.sha256).hexdigest()
+    return f"{timestamp}:{signature}"
+
+
+def _valid_signature(header):
+    secret = _secret()
+    if not header or not secret:
+        return False
+    timestamp, _, signature = header.partition(":")
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > SIGNATURE_MAX_AGE:
+        return False
+    expected = sign_header(secret, int(timestamp)).partition(":")[2]
+    return hmac.compare_digest(signature, expected)
+
+
+def should_profile(headers):
+    """(profile?, reason) for the incoming request"""
+    header = headers.get("X-Profile")
+    if header is not None and _valid_signature(header):
+        return True, "signed"
+    if Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE:
+        return True, "sampled"
+    return False, None
+
+
+def _real_thread_tools():
+    """start_new_thread, sleep and allocate_lock that bypass gevent's monkey patching"""
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched("threading"):
+            return (monkey.get_original("_thread", "start_new_thread"), monkey.get_original("time", "sleep"),
+                    monkey.get_original("_thread", "allocate_lock"))
+    except ImportError:
+        pass
+    import _thread
+    return _thread.start_new_thread, time.sleep, _thread.allocate_lock
+
+
+def _current_greenlet():
+    try:
+        import greenlet
+        return greenlet.getcurrent()
+    except ImportError:
+        return None
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Sampler:
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000.0
+        self.samples = Counter()
+        self.sample_count = 0
+        self._running = False
+        self._glet = None
+        self._thread_ident = None
+        start_new_thread, self._sleep, allocate_lock = _real_thread_tools()
+        self._start_new_thread = start_new_thread
+        # A real lock: the sampler is an OS thread even under gevent
+        self._samples_lock = allocate_lock()
+
+    def start(self):
+        """Sample the calling thread / greenlet until stop()"""
+        self._thread_ident = threading.get_ident()
+        glet = _current_greenlet()
+        # Only track the greenlet when it isn't the thread's main one (i.e. under gevent)
+        self._glet = glet if glet is not None and glet.parent is not None else None
+        self._running = True
+        self._start_new_thread(self._run, ())
+
+    def stop(self):
+        """Stop sampling; once this returns no sample is being added"""
+        with self._samples_lock:
+            self._running = False
+
+    def _target_frame(self):
+        if self._glet is not None:
+            frame = self._glet.gr_frame  # set while the greenlet is suspended
+            if frame is not None:
+                return frame
+        return sys._current_frames().get(self._thread_ident)
+
+    def _run(self):
+        while self._running:
+            try:
+                frame = self._target_frame()
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    with self._samples_lock:
+                        if not self._running:
+                            break
+                        self.samples[";".join(reversed(stack))] += 1
+                        self.sample_count += 1
+            except Exception:
+                pass
+            self._sleep(self.interval)
+
+    def collapsed(self):
+        with self._samples_lock:
+            samples = self.samples.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in samples)
+
+
+def new_profile_id():
+    return f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+
+
+def profile_stream(stream, profile_id, label, reason):
+    """Wrap a response generator so its whole iteration is sampled"""
+    sampler = Sampler(Config.PROFILE_INTERVAL_MS)
+    started = time.time()
+    sampler.start()
+    try:
+        for item in stream:
+            yield item
+    finally:
+        sampler.stop()
+        _save(profile_id, sampler, {
+            "id": profile_id,
+            "label": label,
+            "reason": reason,
+            "started_at": started,
+            "duration_ms": round((time.time() - started) * 1000, 1),
+            "samples": sampler.sample_count,
+            "interval_ms": Config.PROFILE_INTERVAL_MS,
+        })
+
+
+def _save(profile_id, sampler, meta):
+    try:
+        os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+        base = os.path.join(Config.PROFILE_DIR, profile_id)
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        print(f"🔬 [Profile] Saved {profile_id} ({meta['samples']} samples, {meta['duration_ms']} ms, {meta['reason']})")
+        _trim_ring()
+    except Exception as e:
+        print(f"⚠️ [Profile] Could not save {profile_id}: {e}")
+
+
+def _trim_ring():
+    ids = sorted({name.rsplit(".", 1)[0] for name in os.listdir(Config.PROFILE_DIR)
+                  if PROFILE_ID_PATTERN.match(name.rsplit(".", 1)[0])})
+    for old in ids[:-Config.PROFILE_RING_SIZE]:
+        for ext in (".folded", ".json"):
+            try:
+                os.remove(os.path.join(Config.PROFILE_DIR, old + ext))
+            except OSError:
+                pass
+
+
+def list_profiles():
+    if not os.path.isdir(Config.PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(Config.PROFILE_DIR), reverse=True):
+        if name.endswith(".json") and PROFILE_ID_PATTERN.match(name[:-5]):
+            try:
+                with open(os.path.join(Config.PROFILE_DIR, name), "r", encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+
+def read_profile(profile_id):
+    """Collapsed stacks for one profile, or None"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(Config.PROFILE_DIR, profile_id + ".folded"), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    if not _secret():
+        print("❌ Set PROFILE_SECRET or ADMIN_TOKEN first")
+        sys.exit(1)
+    print(f"X-Profile: {sign_header()}")
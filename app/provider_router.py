@@ -0,0 +1,166 @@
+"""
+provider_router.py - Latency-aware ordering of the LLM providers
+Keeps exponentially weighted moving averages (ROUTER_EWMA_ALPHA) per
+provider/model of time to first token, streaming speed (completion tokens
+per second), error rate and token counts parsed from each provider's
+stream. Every request gets the provider order with the lowest expected
+latency:
+
+    ttft + expected completion tokens / tokens_per_sec
+         + error_rate * ROUTER_ERROR_PENALTY_MS    (a failed attempt delays the fallback)
+
+Providers whose context window can't hold the prompt plus the output, or
+that have spent their per-minute token budget (ROUTER_TOKEN_BUDGETS, e.g.
+"Groq=6000"), are only tried after the others. Unmeasured providers are
+costed at ROUTER_PRIOR_LATENCY_MS, keeping their configured order among
+themselves; ROUTER_EXPLORE_RATE occasionally tries a random provider first
+so stale statistics get refreshed. ROUTER_ADAPTIVE=false keeps the fixed
+configured order and only records statistics.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from app.config import Config
+
+CHARS_PER_TOKEN = 4  # rough estimate when a stream reports no usage
+BUDGET_WINDOW_SECONDS = 60
+
+
+def estimate_tokens(text_chars):
+    return max(1, text_chars // CHARS_PER_TOKEN)
+
+
+def _parse_budgets(spec):
+    budgets = {}
+    for item in spec.split(","):
+        name, _, tokens = item.partition("=")
+        if name.strip() and tokens.strip().isdigit():
+            budgets[name.strip()] = int(tokens)
+    return budgets
+
+
+class ProviderRouter:
+    def __init__(self, providers):
+        """providers: [(name, model, context_tokens)] in fallback order"""
+        self._providers = {name: {"model": model, "context_tokens": context, "rank": rank}
+                           for rank, (name, model, context) in enumerate(providers)}
+        self._stats = {name: {"samples": 0, "errors": 0, "ttft_ms": None, "tokens_per_sec": None,
+                              "error_rate": 0.0, "completion_tokens": None,
+                              "prompt_tokens_total": 0, "completion_tokens_total": 0}
+                       for name in self._providers}
+        self._spent = {name: deque() for name in self._providers}  # (timestamp, tokens)
+        self._budgets = _parse_budgets(Config.ROUTER_TOKEN_BUDGETS)
+        self._lock = threading.Lock()
+
+    def model(self, name):
+        return self._providers[name]["model"]
+
+    def _ewma(self, previous, value):
+        if previous is None:
+            return value
+        alpha = Config.ROUTER_EWMA_ALPHA
+        return alpha * value + (1 - alpha) * previous
+
+    def _spent_recently(self, name, now):
+        spent = self._spent[name]
+        while spent and now - spent[0][0] > BUDGET_WINDOW_SECONDS:
+            spent.popleft()
+        return sum(tokens for _, tokens in spent)
+
+    def expected_latency_ms(self, name, max_output_tokens):
+        s = self._stats[name]
+        if s["ttft_ms"] is None or not s["tokens_per_sec"]:
+            latency = Config.ROUTER_PRIOR_LATENCY_MS
+        else:
+            completion = min(s["completion_tokens"] or max_output_tokens, max_output_tokens)
+            latency = s["ttft_ms"] + completion / s["tokens_per_sec"] * 1000
+        return latency + s["error_rate"] * Config.ROUTER_ERROR_PENALTY_MS
+
+    def order(self, names, prompt_chars, max_output_tokens=None):
+        """`names` re-ordered for this request (unknown names keep their place at the end)"""
+        if max_output_tokens is None:
+            max_output_tokens = Config.LLM_MAX_OUTPUT_TOKENS
+        known = [n for n in names if n in self._providers]
+        unknown = [n for n in names if n not in self._providers]
+        if not Config.ROUTER_ADAPTIVE:
+            return known + unknown
+
+        needed = estimate_tokens(prompt_chars) + max_output_tokens
+        now = time.monotonic()
+        with self._lock:
+            ranked = []
+            for name in known:
+                provider = self._providers[name]
+                budget = self._budgets.get(name)
+                over_budget = (
+                    needed > provider["context_tokens"]
+                    or (budget is not None and self._spent_recently(name, now) + needed > budget)
+                )
+                ranked.append((over_budget, self.expected_latency_ms(name, max_output_tokens), provider["rank"], name))
+        ranked.sort()
+        ordered = [name for *_, name in ranked]
+
+        eligible = [name for over, *_, name in ranked if not over]
+        if len(eligible) > 1 and random.random() < Config.ROUTER_EXPLORE_RATE:
+            explore = random.choice(eligible[1:])
+            ordered.remove(explore)
+            ordered.insert(0, explore)
+        return ordered + unknown
+
+    def record_success(self, name, started, first_token_at, finished, usage, prompt_chars, output_chars):
+        """
+        Fold one completed stream into the averages. `usage` holds whatever
+        token counts the provider reported; missing ones are estimated.
+        Returns the per-request measurements (for query_logs).
+        """
+        prompt_tokens = usage.get("prompt_tokens") or estimate_tokens(prompt_chars)
+        completion_tokens = usage.get("completion_tokens") or estimate_tokens(output_chars)
+        first_token_at = first_token_at or finished
+        ttft_ms = (first_token_at - started) * 1000
+        stream_seconds = finished - first_token_at
+        tokens_per_sec = completion_tokens / stream_seconds if stream_seconds > 0 else None
+
+        with self._lock:
+            s = self._stats[name]
+            s["samples"] += 1
+            s["ttft_ms"] = self._ewma(s["ttft_ms"], ttft_ms)
+            if tokens_per_sec:
+                s["tokens_per_sec"] = self._ewma(s["tokens_per_sec"], tokens_per_sec)
+            s["error_rate"] = self._ewma(s["error_rate"], 0.0)
+            s["completion_tokens"] = self._ewma(s["completion_tokens"], completion_tokens)
+            s["prompt_tokens_total"] += prompt_tokens
+            s["completion_tokens_total"] += completion_tokens
+            self._spent[name].append((time.monotonic(), prompt_tokens + completion_tokens))
+
+        return {
+            "model": usage.get("model") or self.model(name),
+            "ttft_ms": round(ttft_ms, 1),
+            "generation_ms": round((finished - started) * 1000, 1),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_per_sec": round(tokens_per_sec, 1) if tokens_per_sec else None,
+        }
+
+    def record_failure(self, name):
+        with self._lock:
+            s = self._stats[name]
+            s["samples"] += 1
+            s["errors"] += 1
+            s["error_rate"] = self._ewma(s["error_rate"], 1.0)
+
+    def stats(self):
+        max_output = Config.LLM_MAX_OUTPUT_TOKENS
+        with self._lock:
+            now = time.monotonic()
+            return {
+                name: {
+                    "model": self._providers[name]["model"],
+                    **{k: round(v, 3) if isinstance(v, float) else v for k, v in s.items()},
+                    "expected_latency_ms": round(self.expected_latency_ms(name, max_output), 1),
+                    "tokens_last_minute": self._spent_recently(name, now),
+                    "token_budget_per_minute": self._budgets.get(name),
+                }
+                for name, s in self._stats.items()
+            }
@@ -2,99 +2,533 @@
 Enhanced query_resume.py - Production-Ready Retrieval
 Key Improvements:
 1. Balanced top_k (12) for focused but comprehensive context
-2. Tuned similarity threshold (0.25) to reduce noise
+2. Tuned similarity threshold (Config.VECTOR_MIN_SIMILARITY) to reduce noise
 3. Robust keyword extraction and matching
 4. Scoring-aware result merging
+5. Confidence-gated adaptive planning (early exit on a clear vector match)
+6. Small child chunks are matched, then expanded to a bounded parent window
+7. Degraded lexical-only ranking when the embedding provider is unavailable
+Tunables live in app/config.py; `python -m app.retrieval_eval` sweeps them.
 """
 
-from app.db import get_connection
-from app.embeddings import generate_embedding
+from app.cache import TTLCache
+from app.config import Config
+from app.memory import register_cache
+from app.db import pooled_connection
+from app.dedup import NearDuplicateFilter
+from app.ingest_jobs import on_corpus_change
+from app.embeddings import EmbeddingError, generate_embedding, generate_embeddings
+from app.log import get_logger, fields
 import re
+import threading
+import time
 
-def query_resume(question, top_k=12, min_similarity=0.25):
+logger = get_logger(__name__)
+
+# Final hybrid results per (question, parameters); primed by warm-up
+_retrieval_cache = TTLCache(Config.RETRIEVAL_CACHE_SIZE, Config.RETRIEVAL_CACHE_TTL)
+register_cache("retrieval", _retrieval_cache)
+on_corpus_change("retrieval", _retrieval_cache.clear)
+
+# Per-path counters for /metrics (probe / expanded / full / lexical_only / cache)
+_path_counts = {}
+_stats_lock = threading.Lock()
+
+def _elapsed_ms(started):
+    return (time.perf_counter() - started) * 1000
+
+def _mapped_index():
+    """The shared memory-mapped index (app/vector_index.py), if enabled and built"""
+    if Config.VECTOR_INDEX != "mmap":
+        return None
+    from app.vector_index import get_index
+    return get_index()
+
+
+def vector_search(query_embedding, top_k, min_similarity):
+    """Nearest chunks for an already-computed embedding: [(content, similarity, id)]"""
+    index = _mapped_index()
+    if index is not None:
+        return index.search(query_embedding, top_k, min_similarity)
+
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            # Retrieve chunks with similarity scores
+            cur.execute("""
+                SELECT id, content, (1 - (embedding <=> %s::vector)) as similarity 
+                FROM resume_chunks
+                ORDER BY embedding <=> %s::vector
+                LIMIT %s;
+            """, (query_embedding, query_embedding, top_k))
+
+            results = cur.fetchall()
+        finally:
+            cur.close()
+
+    # Filter by minimum similarity threshold
+    return [
+        (res[1], res[2], res[0])  # (content, similarity, id)
+        for res in results 
+        if res[2] > min_similarity
+    ]
+
+
+def query_resume(question, top_k=12, min_similarity=None, timings=None):
     """
     Retrieval function focused on high-quality semantic matches
+    (raises EmbeddingError when the question can't be embedded)
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    if min_similarity is None:
+        min_similarity = Config.VECTOR_MIN_SIMILARITY
 
     # Generate embedding using BGE model
+    started = time.perf_counter()
     query_embedding = generate_embedding(question)
+    if timings is not None:
+        timings["embed_ms"] = _elapsed_ms(started)
 
+    started = time.perf_counter()
     try:
-        # Retrieve chunks with similarity scores
-        cur.execute("""
-            SELECT id, content, (1 - (embedding <=> %s::vector)) as similarity 
-            FROM resume_chunks
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s;
-        """, (query_embedding, query_embedding, top_k))
-
-        results = cur.fetchall()
-        
-        # Filter by minimum similarity threshold
-        filtered_results = [
-            (res[1], res[2], res[0])  # (content, similarity, id)
-            for res in results 
-            if res[2] > min_similarity
-        ]
-        
-        return filtered_results
-        
+        return vector_search(query_embedding, top_k, min_similarity)
     except Exception as e:
-        print(f"❌ Error during query: {e}")
+        logger.error("❌ Error during query: %s", e)
         return []
     finally:
-        cur.close()
-        conn.close()
+        if timings is not None:
+            timings["vector_ms"] = _elapsed_ms(started)
+
+
+def keyword_search(keywords, keyword_limit):
+    """
+    Exact-term matches for `keywords` in a single query (previously one
+    ILIKE query per keyword). Each keyword gets its own keyword_limit rows,
+    so a common term can't crowd out the rare one that names the target
+    chunk. Returns [(content, 1.0, id)], keywords in order, no repeats.
+    """
+    if not keywords or keyword_limit <= 0:
+        return []
+    patterns = [f"%{keyword}%" for keyword in keywords]
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            # We use ILIKE for robustness
+            cur.execute("""
+                SELECT c.id, c.content
+                FROM unnest(%s::text[]) WITH ORDINALITY AS k(pattern, ord)
+                CROSS JOIN LATERAL (
+                    SELECT id, content
+                    FROM resume_chunks
+                    WHERE content ILIKE k.pattern
+                    ORDER BY id
+                    LIMIT %s
+                ) c
+                ORDER BY k.ord, c.id;
+            """, (patterns, keyword_limit))
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+    seen = set()
+    results = []
+    for chunk_id, content in rows:
+        if chunk_id not in seen:
+            seen.add(chunk_id)
+            results.append((content, 1.0, chunk_id))
+    return results
 
 
-def hybrid_search(question, top_k=12):
+def lexical_search(keywords, limit):
+    """
+    Degraded-mode ranking for when no query embedding is available: chunks
+    are scored by the share of `keywords` they contain, shorter chunks first
+    on ties. Returns [(content, score, id)] with scores in (0, 1].
+    """
+    if not keywords or limit <= 0:
+        return []
+    patterns = [f"%{keyword}%" for keyword in keywords]
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT id, content, hits
+                FROM (
+                    SELECT id, content,
+                           (SELECT count(*) FROM unnest(%s::text[]) AS p(pattern)
+                            WHERE content ILIKE p.pattern) AS hits
+                    FROM resume_chunks
+                    WHERE content ILIKE ANY(%s)
+                ) scored
+                ORDER BY hits DESC, length(content)
+                LIMIT %s;
+            """, (patterns, patterns, limit))
+            return [(content, hits / len(keywords), chunk_id) for chunk_id, content, hits in cur.fetchall()]
+        finally:
+            cur.close()
+
+
+def is_confident(results):
+    """
+    Early-exit test for the vector probe: the best hit must be strong and
+    clearly ahead of the runner-up. Returns (confident, top_score, margin).
+    """
+    if not results:
+        return False, 0.0, 0.0
+    top_score = results[0][1]
+    margin = top_score - results[1][1] if len(results) > 1 else top_score
+    confident = top_score >= Config.EARLY_EXIT_MIN_SCORE and margin >= Config.EARLY_EXIT_MARGIN
+    return confident, top_score, margin
+
+
+def _cache_key(question, top_k, min_similarity, keyword_limit, adaptive, planner="single"):
+    """`planner` keeps hybrid_search_batch results (no early-exit planner) apart from hybrid_search's"""
+    return (question.strip().lower(), top_k, min_similarity, keyword_limit, adaptive, planner)
+
+
+def _record_path(path):
+    with _stats_lock:
+        _path_counts[path] = _path_counts.get(path, 0) + 1
+
+
+def hybrid_search(question, top_k=12, min_similarity=None, keyword_limit=None, timings=None, use_cache=True, adaptive=None, trace=None):
     """
     Combines vector search with keyword matching
     Ensures specific terms (CGPA, project names) are prioritized
+
+    With adaptive retrieval (Config.ADAPTIVE_RETRIEVAL) the cheapest signal
+    runs first and work is only added for low-confidence queries:
+      probe    - a small vector probe whose top hit clears the confidence gate
+      expanded - probe was decent but ambiguous: re-query the vector index at top_k
+      full     - weak probe: vector at top_k plus lexical matching
+    Non-adaptive searches always take the `full` path. If the question can't
+    be embedded (provider down, timed out or backed off) the search degrades
+    to `lexical_only`: keyword-coverage ranking, results labelled 'lexical',
+    trace["degraded"] set and nothing cached.
+
+    `timings`, if given, is filled with per-stage latencies in ms
+    (embed_ms, vector_ms, keyword_ms, merge_ms); `trace` with the path taken.
     """
-    print(f"🕵️‍♂️ [Search] Starting Hybrid Search for: {question}")
-    # Step 1: Vector search (semantic understanding)
+    if min_similarity is None:
+        min_similarity = Config.VECTOR_MIN_SIMILARITY
+    if keyword_limit is None:
+        keyword_limit = Config.KEYWORD_LIMIT
+    if adaptive is None:
+        adaptive = Config.ADAPTIVE_RETRIEVAL
+    if trace is None:
+        trace = {}
+    if timings is None:
+        timings = {}
+
+    cache_key = _cache_key(question, top_k, min_similarity, keyword_limit, adaptive)
+    if use_cache:
+        cached = _retrieval_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("⚡ [Search] Retrieval cache hit for: %s", question)
+            trace.update(path="cache", probes=0)
+            _record_path("cache")
+            return list(cached)
+
+    logger.debug("🕵️‍♂️ [Search] Starting Hybrid Search for: %s", question)
+    # Step 1: Vector search (semantic understanding), smallest probe first
+    started = time.perf_counter()
+    vector_ok = True
+    degraded = None
+    vector_results = []
+    path = "full"
+    probes = 0
     try:
-        vector_results = query_resume(question, top_k=top_k)
-        print(f"📊 [Search] Vector search found {len(vector_results)} matches")
+        query_embedding = generate_embedding(question)
+        timings["embed_ms"] = _elapsed_ms(started)
+
+        started = time.perf_counter()
+        probe_k = min(Config.PROBE_TOP_K, top_k) if adaptive else top_k
+        vector_results = vector_search(query_embedding, probe_k, min_similarity)
+        probes = 1
+
+        if adaptive and probe_k < top_k:
+            confident, top_score, margin = is_confident(vector_results)
+            trace.update(top_score=round(top_score, 4), margin=round(margin, 4))
+            if confident:
+                path = "probe"
+            else:
+                if top_score >= Config.EXPAND_MIN_SCORE:
+                    path = "expanded"
+                vector_results = vector_search(query_embedding, top_k, min_similarity)
+                probes = 2
+        logger.debug("📊 [Search] Vector search found %d matches (%s)", len(vector_results), path)
+    except EmbeddingError as e:
+        logger.warning("🔌 [Search] Embedding unavailable, degrading to lexical search: %s", e)
+        degraded = "embedding_unavailable"
     except Exception as e:
-        print(f"❌ [Search] Vector search failed: {e}")
+        logger.error("❌ [Search] Vector search failed: %s", e)
+        degraded = "vector_search_failed"
+    if degraded:
         vector_results = []
+        vector_ok = False
+        path = "lexical_only"
+    timings["vector_ms"] = _elapsed_ms(started)
     
-    # Step 2: Keyword search (exact term matching)
-    keywords = extract_keywords(question)
+    # Step 2: Keyword search (exact term matching), only when confidence is low
+    started = time.perf_counter()
     keyword_results = []
+    if path in ("full", "lexical_only"):
+        try:
+            if degraded:
+                keyword_results = lexical_search(extract_keywords(question), top_k)
+            else:
+                keyword_results = keyword_search(extract_keywords(question), keyword_limit)
+        except Exception as e:
+            logger.warning("⚠️ Keyword search error: %s", e)
+    timings["keyword_ms"] = _elapsed_ms(started)
+    
+    # Step 3: Merge and deduplicate, then widen matched children to their section
+    started = time.perf_counter()
+    if degraded:
+        seen = _new_seen_filter()
+        merged_results = [(content, score, 'lexical') for content, score, _ in keyword_results if seen(content)]
+    else:
+        merged_results = merge_results(vector_results, keyword_results)[:top_k]
+    if Config.EXPAND_TO_PARENT:
+        chunk_ids = {content.strip(): chunk_id for content, _, chunk_id in keyword_results + vector_results}
+        merged_results = expand_to_parents(merged_results, chunk_ids)
+    timings["merge_ms"] = _elapsed_ms(started)
+
+    trace.update(path=path, probes=probes)
+    if degraded:
+        trace["degraded"] = degraded
+    _record_path(path)
+    logger.info("📊 [Search] Retrieved %d chunks", len(merged_results), extra=fields(
+        path=path, probes=probes, keyword_hits=len(keyword_results), degraded=degraded,
+        **{stage: round(ms, 2) for stage, ms in timings.items()}
+    ))
+    
+    # Don't pin a degraded result set in the cache
+    if vector_ok and use_cache:
+        _retrieval_cache.set(cache_key, tuple(merged_results))
     
-    if keywords:
-        conn = get_connection()
+    return merged_results
+
+
+def vector_search_batch(query_embeddings, top_k, min_similarity):
+    """
+    Top-k chunks for many embeddings in one statement (unnest + LATERAL).
+    Returns one [(content, similarity, id)] list per embedding, in order.
+    """
+    index = _mapped_index()
+    if index is not None:
+        return index.search_batch(query_embeddings, top_k, min_similarity)
+
+    vectors = [str(list(embedding)) for embedding in query_embeddings]
+    with pooled_connection() as conn:
         cur = conn.cursor()
         try:
-            # Search for chunks containing any of the extracted keywords
-            # We use ILIKE for robustness
-            for keyword in keywords:
-                cur.execute("""
-                    SELECT content 
-                    FROM resume_chunks 
-                    WHERE content ILIKE %s
-                    LIMIT 3;
-                """, (f"%{keyword}%",))
-                
-                keyword_matches = cur.fetchall()
-                keyword_results.extend([
-                    (res[0], 1.0, 'keyword') for res in keyword_matches
-                ])
-        except Exception as e:
-            print(f"⚠️ Keyword search error: {e}")
+            cur.execute("""
+                SELECT q.ord, c.id, c.content, c.similarity
+                FROM unnest(%s::text[]) WITH ORDINALITY AS q(vec, ord)
+                CROSS JOIN LATERAL (
+                    SELECT id, content, (1 - (embedding <=> q.vec::vector)) AS similarity
+                    FROM resume_chunks
+                    ORDER BY embedding <=> q.vec::vector
+                    LIMIT %s
+                ) c
+                ORDER BY q.ord, c.similarity DESC;
+            """, (vectors, top_k))
+            rows = cur.fetchall()
         finally:
             cur.close()
-            conn.close()
-    
-    # Step 3: Merge and deduplicate
-    merged_results = merge_results(vector_results, keyword_results)
-    
-    return merged_results[:top_k]
+
+    results = [[] for _ in vectors]
+    for ordinal, chunk_id, content, similarity in rows:
+        if similarity > min_similarity:
+            results[ordinal - 1].append((content, similarity, chunk_id))
+    return results
+
+
+def hybrid_search_batch(questions, top_k=12, min_similarity=None, keyword_limit=None):
+    """
+    hybrid_search for several questions at once: one batched embedding call
+    and one vector query for every question not already cached. Lexical
+    matching is only added for questions whose vector hits aren't confident.
+    Returns one result list per question, in order.
+    """
+    if min_similarity is None:
+        min_similarity = Config.VECTOR_MIN_SIMILARITY
+    if keyword_limit is None:
+        keyword_limit = Config.KEYWORD_LIMIT
+    adaptive = Config.ADAPTIVE_RETRIEVAL
+
+    results = [None] * len(questions)
+    pending = []
+    for i, question in enumerate(questions):
+        cached = _retrieval_cache.get(_cache_key(question, top_k, min_similarity, keyword_limit, adaptive, "batch"))
+        if cached is not None:
+            results[i] = list(cached)
+            _record_path("cache")
+        else:
+            pending.append(i)
+    if not pending:
+        return results
+
+    logger.info("🕵️‍♂️ [Search] Batch search for %d questions (%d cached)", len(pending), len(questions) - len(pending))
+    try:
+        embeddings = generate_embeddings([questions[i] for i in pending])
+    except EmbeddingError as e:
+        # Same provider either way: skip the per-question retries
+        logger.warning("🔌 [Search] Batch embedding unavailable, degrading to lexical search: %s", e)
+        for i in pending:
+            results[i] = _degraded_search(questions[i], top_k)
+        return results
+    try:
+        vector_batches = vector_search_batch(embeddings, top_k, min_similarity)
+    except Exception as e:
+        # Degrade to the single-question path, which handles its own failures
+        logger.error("❌ [Search] Batch vector search failed: %s", e)
+        for i in pending:
+            results[i] = hybrid_search(questions[i], top_k=top_k, min_similarity=min_similarity, keyword_limit=keyword_limit)
+        return results
+
+    for i, vector_results in zip(pending, vector_batches):
+        question = questions[i]
+        confident, _, _ = is_confident(vector_results)
+        keyword_results = []
+        if not (adaptive and confident):
+            try:
+                keyword_results = keyword_search(extract_keywords(question), keyword_limit)
+            except Exception as e:
+                logger.warning("⚠️ Keyword search error: %s", e)
+
+        merged_results = merge_results(vector_results, keyword_results)[:top_k]
+        if Config.EXPAND_TO_PARENT:
+            chunk_ids = {content.strip(): chunk_id for content, _, chunk_id in keyword_results + vector_results}
+            merged_results = expand_to_parents(merged_results, chunk_ids)
+
+        _record_path("batch")
+        _retrieval_cache.set(_cache_key(question, top_k, min_similarity, keyword_limit, adaptive, "batch"), tuple(merged_results))
+        results[i] = merged_results
+    return results
+
+
+def _degraded_search(question, top_k):
+    """lexical_only path of hybrid_search for callers that already know embedding failed"""
+    try:
+        lexical_results = lexical_search(extract_keywords(question), top_k)
+    except Exception as e:
+        logger.warning("⚠️ Keyword search error: %s", e)
+        lexical_results = []
+    seen = _new_seen_filter()
+    merged_results = [(content, score, 'lexical') for content, score, _ in lexical_results if seen(content)]
+    if Config.EXPAND_TO_PARENT:
+        chunk_ids = {content.strip(): chunk_id for content, _, chunk_id in lexical_results}
+        merged_results = expand_to_parents(merged_results, chunk_ids)
+    _record_path("lexical_only")
+    return merged_results
+
+
+def expand_to_parents(results, chunk_ids, window=None, max_chars=None):
+    """
+    Replace matched child chunks (bullets/sentences) with a bounded window of
+    their parent section: the heading plus `window` siblings either side,
+    trimmed to `max_chars`. Several hits in one section collapse into a single
+    entry at the best hit's rank. Chunks without a parent pass through as-is.
+    """
+    if window is None:
+        window = Config.PARENT_SIBLING_WINDOW
+    if max_chars is None:
+        max_chars = Config.PARENT_WINDOW_CHARS
+
+    matched = [chunk_ids.get(content.strip()) for content, _, _ in results]
+    wanted = [chunk_id for chunk_id in matched if chunk_id is not None]
+    if not wanted:
+        return results
+
+    mapped = _mapped_index()
+    try:
+        if mapped is not None:
+            rows = mapped.window_rows(wanted, window)
+        else:
+            rows = _window_rows_from_db(wanted, window)
+    except Exception as e:
+        # Older corpora (no resume_sections) are served unexpanded
+        logger.warning("⚠️ [Search] Parent expansion skipped: %s", e)
+        return results
+
+    windows = {}  # matched id -> (parent_id, own index, heading, {index: content})
+    for match_id, parent_id, own_index, heading, index, content in rows:
+        entry = windows.setdefault(match_id, (parent_id, own_index, heading, {}))
+        entry[3][index] = content
+
+    expanded = []
+    sections = {}  # parent_id -> position in expanded
+    for (content, score, source), chunk_id in zip(results, matched):
+        if chunk_id not in windows:
+            expanded.append((content, score, source))
+            continue
+        parent_id, own_index, heading, siblings = windows[chunk_id]
+        if parent_id in sections:
+            section = expanded[sections[parent_id]]
+            section["hits"].add(own_index)
+            section["siblings"].update(siblings)
+            continue
+        sections[parent_id] = len(expanded)
+        expanded.append({"heading": heading, "score": score, "source": source,
+                         "hits": {own_index}, "siblings": dict(siblings)})
+
+    return [
+        _render_window(item, max_chars) if isinstance(item, dict) else item
+        for item in expanded
+    ]
+
+
+def _window_rows_from_db(chunk_ids, window):
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT m.id, m.parent_id, m.chunk_index, s.heading, c.chunk_index, c.content
+                FROM resume_chunks m
+                JOIN resume_sections s ON s.id = m.parent_id
+                JOIN resume_chunks c ON c.parent_id = m.parent_id
+                    AND c.chunk_index BETWEEN m.chunk_index - %s AND m.chunk_index + %s
+                WHERE m.id = ANY(%s);
+            """, (window, window, chunk_ids))
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+
+def _render_window(section, max_chars):
+    """Heading + siblings in document order, dropping those farthest from a hit first"""
+    heading = section["heading"]
+    prefix = f"{heading}: "
+    budget = max_chars - len(prefix)
+    by_distance = sorted(
+        section["siblings"].items(),
+        key=lambda item: min(abs(item[0] - hit) for hit in section["hits"])
+    )
+    kept = {}
+    for index, content in by_distance:
+        body = content[len(prefix):] if content.startswith(prefix) else content
+        if kept and len(body) + 1 > budget:
+            break
+        kept[index] = body
+        budget -= len(body) + 1
+    text = prefix.rstrip() + "\n" + "\n".join(kept[i] for i in sorted(kept))
+    return (text, section["score"], section["source"])
+
+
+def get_stats():
+    """How often each retrieval path was taken since boot"""
+    with _stats_lock:
+        counts = dict(_path_counts)
+    searched = sum(v for k, v in counts.items() if k != "cache")
+    early = counts.get("probe", 0)
+    return {
+        "paths": counts,
+        "early_exit_rate": round(early / searched, 3) if searched else None,
+    }
+
+
+def get_cache():
+    return _retrieval_cache
 
 
 def extract_keywords(question):
@@ -122,27 +556,21 @@ def extract_keywords(question):
 
 def merge_results(vector_results, keyword_results):
     """
-    Merge results, prioritizing exact keyword matches while keeping semantic order
+    Merge results, prioritizing exact keyword matches while keeping semantic order.
+    Near-duplicates (app/dedup.py) keep only their highest-priority copy.
     """
-    seen_content = {} # hash(content) -> score
+    seen = _new_seen_filter()
     merged = []
     
     # 1. Process keyword results first (high priority)
-    for content, score, search_type in keyword_results:
-        content_hash = hash(content.strip())
-        if content_hash not in seen_content:
-            seen_content[content_hash] = score
+    for content, score, chunk_id in keyword_results:
+        if seen(content):
             merged.append((content, score, 'keyword'))
     
-    # 2. Add vector results
+    # 2. Add vector results (copies of keyword matches stay keyword matches)
     for content, score, chunk_id in vector_results:
-        content_hash = hash(content.strip())
-        if content_hash not in seen_content:
-            seen_content[content_hash] = score
+        if seen(content):
             merged.append((content, score, 'vector'))
-        else:
-            # If already added via keyword, we keep it as a keyword match but maybe log it?
-            pass
             
     # Sort by score (keywords already have 1.0)
     merged.sort(key=lambda x: x[1], reverse=True)
@@ -150,6 +578,21 @@ def merge_results(vector_results, keyword_results):
     return merged
 
 
+def _new_seen_filter():
+    """Callable returning True the first time it sees a piece of content"""
+    if Config.DEDUP_NEAR_DUPLICATES:
+        return NearDuplicateFilter().add
+    seen_content = set()
+
+    def first_time(content):
+        content_hash = hash(content.strip())
+        if content_hash in seen_content:
+            return False
+        seen_content.add(content_hash)
+        return True
+    return first_time
+
+
 if __name__ == "__main__":
     print("Testing Hybrid Retrieval...")
     q = "What is Sahil's academic performance?"
@@ -1,38 +1,96 @@
 """
 rag_answer.py - Multi-Provider RAG (Groq -> Gemini -> Ollama)
 This implementation ensures 24/7 availability by falling back to cloud providers
-when local Ollama is offline.
+when local Ollama is offline. Self-hosted deployments can put the managed local
+model first (LLM_MODE=local_first) or use it alone (LLM_MODE=local).
 """
 
-import requests
 import json
 import os
 import time
 from app.query_resume import hybrid_search
+from app.http_client import get_session
 from app.config import Config
 from app.db import get_connection
+from app.sessions import get_session_store, plan_followup, format_history
+from app.intent_router import is_greeting_or_casual, detect_mode
+from app.singleflight import SingleFlight
+from app import local_llm
+from app import prefetch
+from app.provider_router import ProviderRouter
+from app import memory
+from app.log import get_logger, fields
 
-def log_query(question: str, provider: str, confidence: str, user_ip: str = "unknown"):
-    """Saves the user query metadata to Supabase for observability"""
+logger = get_logger(__name__)
+
+# Identical in-flight questions share one retrieval + generation
+_inflight = SingleFlight("answer")
+# Shared by every /ask_batch request so total generation concurrency stays bounded
+_batch_pool = None
+
+GROQ_MODEL = "llama-3.1-8b-instant"
+GEMINI_MODEL = "gemini-1.5-flash"
+
+# (name, model, context window in tokens), in fallback order
+_router = ProviderRouter([
+    ("Groq", GROQ_MODEL, 131072),
+    ("Gemini", GEMINI_MODEL, 1048576),
+    ("Ollama", Config.OLLAMA_MODEL, Config.OLLAMA_NUM_CTX),
+])
+
+UNDEFINED_COLUMN = "42703"  # Postgres error code
+_query_log_columns = {"generation": True}  # False once query_logs is found un-migrated
+
+
+def log_query(question: str, provider: str, confidence: str, user_ip: str = "unknown", generation: dict = None):
+    """
+    Saves the user query metadata to Supabase for observability, with the
+    provider's measurements (model, TTFT, tokens) when there was a generation.
+    The columns are added by the startup migration (app/schema.py); on a
+    database that hasn't been migrated, the question is still logged without them.
+    """
+    generation = generation or {}
     conn = None
     try:
         conn = get_connection()
         cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO query_logs (question, provider, confidence, user_ip) VALUES (%s, %s, %s, %s)",
-            (question, provider, confidence, user_ip)
-        )
+        if _query_log_columns["generation"]:
+            try:
+                cur.execute(
+                    """
+                    INSERT INTO query_logs (question, provider, confidence, user_ip, model, ttft_ms,
+                                            generation_ms, prompt_tokens, completion_tokens, tokens_per_sec)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (question, provider, confidence, user_ip, generation.get("model"), generation.get("ttft_ms"),
+                     generation.get("generation_ms"), generation.get("prompt_tokens"),
+                     generation.get("completion_tokens"), generation.get("tokens_per_sec"))
+                )
+            except Exception as e:
+                if getattr(e, "pgcode", None) != UNDEFINED_COLUMN:
+                    raise
+                conn.rollback()
+                _query_log_columns["generation"] = False
+                logger.warning("⚠️ [Log] query_logs has no generation columns (python -m app.schema); logging without them")
+        if not _query_log_columns["generation"]:
+            cur.execute(
+                "INSERT INTO query_logs (question, provider, confidence, user_ip) VALUES (%s, %s, %s, %s)",
+                (question, provider, confidence, user_ip)
+            )
         conn.commit()
         cur.close()
-        print(f"📝 [Log] Query recorded in Supabase (Provider: {provider})")
+        logger.debug("📝 [Log] Query recorded in Supabase (Provider: %s)", provider)
     except Exception as e:
-        print(f"⚠️ [Log] Failed to log query: {e}")
+        logger.warning("⚠️ [Log] Failed to log query: %s", e)
     finally:
         if conn:
             conn.close()
 
-def generate_with_groq(prompt):
-    """Primary provider: Groq (Llama 3.2 70B or 3B)"""
+def generate_with_groq(prompt, usage=None):
+    """
+    Primary provider: Groq (Llama 3.2 70B or 3B).
+    `usage`, if given, receives the token counts reported at the end of the stream.
+    """
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise ValueError("Missing Groq API Key")
@@ -43,125 +101,116 @@ def generate_with_groq(prompt):
         "Content-Type": "application/json"
     }
     payload = {
-        "model": "llama-3.1-8b-instant",
+        "model": GROQ_MODEL,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.2,
-        "max_tokens": 800, # Increased for detailed project descriptions
-        "stream": True
+        "max_tokens": Config.LLM_MAX_OUTPUT_TOKENS, # Increased for detailed project descriptions
+        "stream": True,
+        "stream_options": {"include_usage": True}
     }
     
-    response = requests.post(url, headers=headers, json=payload, stream=True, timeout=30)
-    if response.status_code != 200:
-        print(f"❌ [Groq] Error {response.status_code}: {response.text}")
-    response.raise_for_status()
-    
-    for line in response.iter_lines():
-        if line:
-            # Robust SSE parsing
-            line_text = line.decode('utf-8').strip()
-            if line_text.startswith("data:"):
-                data_str = line_text[5:].strip()
-                if data_str == "[DONE]":
-                    break
-                try:
-                    chunk = json.loads(data_str)
-                    content = chunk['choices'][0]['delta'].get('content', "")
-                    if content:
-                        yield content
-                except json.JSONDecodeError:
-                    continue
+    with get_session().post(url, headers=headers, json=payload, stream=True, timeout=30) as response:
+        if response.status_code != 200:
+            logger.error("❌ [Groq] Error %s: %s", response.status_code, response.text)
+        response.raise_for_status()
+        
+        for line in response.iter_lines():
+            if line:
+                # Robust SSE parsing
+                line_text = line.decode('utf-8').strip()
+                if line_text.startswith("data:"):
+                    data_str = line_text[5:].strip()
+                    if data_str == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data_str)
+                        reported = chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage')
+                        if reported and usage is not None:
+                            usage.update(prompt_tokens=reported.get('prompt_tokens'),
+                                         completion_tokens=reported.get('completion_tokens'),
+                                         model=chunk.get('model'))
+                        if not chunk.get('choices'):
+                            continue
+                        content = chunk['choices'][0]['delta'].get('content', "")
+                        if content:
+                            yield content
+                    except json.JSONDecodeError:
+                        continue
 
-def generate_with_gemini(prompt):
+def generate_with_gemini(prompt, usage=None):
     """Secondary provider: Google Gemini 1.5 Flash"""
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise ValueError("Missing Gemini API Key")
     
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:streamGenerateContent?key={api_key}"
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:streamGenerateContent?key={api_key}"
     headers = {"Content-Type": "application/json"}
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {
             "temperature": 0.2,
-            "maxOutputTokens": 800
+            "maxOutputTokens": Config.LLM_MAX_OUTPUT_TOKENS
         }
     }
     
-    response = requests.post(url, headers=headers, json=payload, stream=True, timeout=30)
-    if response.status_code != 200:
-        print(f"❌ [Gemini] Error {response.status_code}: {response.text}")
-    response.raise_for_status()
-    
-    for line in response.iter_lines():
-        if line:
-            try:
-                chunk = json.loads(line.decode('utf-8'))
-                # Safety check: ensure candidates and content exist
-                if chunk.get('candidates') and chunk['candidates'][0].get('content'):
-                    parts = chunk['candidates'][0]['content'].get('parts', [])
-                    if parts:
-                        yield parts[0]['text']
-            except (KeyError, IndexError, json.JSONDecodeError):
-                continue
-
-def generate_with_ollama(prompt):
-    """Local fallback / Development provider: Ollama"""
-    ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-    url = f"{ollama_url}/api/generate"
-    payload = {
-        "model": "llama3.2",
-        "prompt": prompt,
-        "stream": True,
-        "options": {"num_ctx": 2048, "temperature": 0.2} # Increased context window
-    }
-    headers = {"ngrok-skip-browser-warning": "any"}
-    
-    try:
-        response = requests.post(url, json=payload, headers=headers, stream=True, timeout=10)
+    with get_session().post(url, headers=headers, json=payload, stream=True, timeout=30) as response:
+        if response.status_code != 200:
+            logger.error("❌ [Gemini] Error %s: %s", response.status_code, response.text)
         response.raise_for_status()
         
         for line in response.iter_lines():
             if line:
-                chunk = json.loads(line)
-                yield chunk.get("response", "")
-                if chunk.get("done"):
-                    break
+                try:
+                    chunk = json.loads(line.decode('utf-8'))
+                    reported = chunk.get('usageMetadata')
+                    if reported and usage is not None:
+                        # Cumulative per chunk, so the last one wins
+                        usage.update(prompt_tokens=reported.get('promptTokenCount'),
+                                     completion_tokens=reported.get('candidatesTokenCount'))
+                    # Safety check: ensure candidates and content exist
+                    if chunk.get('candidates') and chunk['candidates'][0].get('content'):
+                        parts = chunk['candidates'][0]['content'].get('parts', [])
+                        if parts:
+                            yield parts[0]['text']
+                except (KeyError, IndexError, json.JSONDecodeError):
+                    continue
+
+def generate_with_ollama(prompt, usage=None):
+    """Local provider: Ollama (warm model, sized context, bounded concurrency; see app/local_llm.py)"""
+    try:
+        yield from local_llm.generate(prompt, usage=usage)
     except Exception as e:
-        print(f"❌ [Ollama] Connection failed: {e}")
+        logger.error("❌ [Ollama] Generation failed: %s", e)
         raise e
 
-def is_greeting_or_casual(question: str) -> bool:
-    """
-    Detect if the query is strictly a greeting. 
-    If it contains substantive keywords (resume, project, skills), return False.
-    """
-    cleaned_q = question.lower().strip()
-    
-    # If the user asks about specific topics, it is NOT just a greeting
-    substantive_keywords = ["resume", "project", "work", "job", "skill", "experience", "education", "hired", "contact", "detail"]
-    if any(kw in cleaned_q for kw in substantive_keywords):
-        return False
-        
-    casual_patterns = [
-        "hello", "hi", "hey", "greetings", "good morning", "good evening", 
-        "how are you", "what's up", "yo", "thanks", "thank you", "bye"
-    ]
-    
-    # Exact match or very short greeting
-    if cleaned_q in casual_patterns:
-        return True
-    
-    # If it's a short sentence starting with a greeting but no substantive keywords
-    if len(cleaned_q.split()) < 4 and any(cleaned_q.startswith(p) for p in casual_patterns):
-        return True
-        
-    return False
+def provider_order(names, prompt):
+    """Providers to try for this prompt, honouring LLM_MODE"""
+    if Config.LLM_MODE == "local":
+        return ["Ollama"]
+    ordered = _router.order(names, len(prompt))
+    if Config.LLM_MODE == "local_first":
+        return ["Ollama"] + [name for name in ordered if name != "Ollama"]
+    return ordered
+
+def select_context(retrieved_chunks, min_score=None):
+    """Drop weak matches before prompt building (shared with the eval harness)"""
+    if min_score is None:
+        min_score = Config.ANSWER_MIN_SCORE
+    return [c for c in retrieved_chunks if c[1] > min_score]
 
-def generate_answer_with_sources(question: str, user_ip: str = "unknown", mode: str = "auto"):
+def generate_answer_with_sources(question: str, user_ip: str = "unknown", mode: str = "auto", session_id: str = None, use_precomputed: bool = True, retrieved_chunks=None, coalesce: bool = True):
     """
     RAG generator with multi-provider fallback strategy.
+    When a session_id is given, follow-ups are resolved against that session's
+    recent turns (see app/sessions.py). Questions routed to a top intent are
+    served from the precomputed FAQ store unless use_precomputed is False.
+    `retrieved_chunks` (from hybrid_search_batch) skips the retrieval step;
+    coalesce=False opts out of sharing an identical in-flight request.
+    Answered questions queue a warm-up of their likely follow-ups
+    (app/prefetch.py); batch items and FAQ rebuilds don't.
     """
-    print(f"\n🔍 [RAG] Processing Question: {question} (Mode: {mode})")
+    started = time.perf_counter()
+    logger.info("🔍 [RAG] Processing Question: %s", question, extra=fields(mode=mode))
     
     # 1. Handle Greetings
     if is_greeting_or_casual(question):
@@ -169,25 +218,101 @@ def generate_answer_with_sources(question: str, user_ip: str = "unknown", mode:
         return
 
     # 2. Determine Style
-    recruiter_keywords = ["experience", "skills", "resume", "projects", "hire", "role", "internship", "work", "education", "tech stack"]
-    
-    if mode == "auto":
-        detected_mode = "recruiter" if any(kw in question.lower() for kw in recruiter_keywords) else "casual"
+    detected_mode = detect_mode(question, mode)
+    session = get_session_store().get(session_id) if session_id else None
+    search_query, reused_chunks = plan_followup(question, session)
+    is_followup = reused_chunks is not None or search_query != question
+    speculate = use_precomputed and retrieved_chunks is None
+
+    # 3. Serve the most common questions from precomputed answers. They are
+    # generated in recruiter tone and without conversation context, so explicit
+    # casual mode and follow-ups take the full path.
+    if use_precomputed and not is_followup and (mode == "auto" or detected_mode == "recruiter"):
+        from app import faq_store
+        match, entry = faq_store.lookup(question)
+        if entry:
+            logger.info("⚡ [RAG] Served from FAQ store", extra=fields(intent=match.intent, score=round(match.score, 2)))
+            if session:
+                session.add_turn(question, question, entry["answer"], [])
+            log_query(question, "FAQ", entry["metadata"].get("confidence", "high"), user_ip)
+            if speculate:
+                prefetch.schedule(question, detected_mode, session)
+            yield {"answer_chunk": entry["answer"], "metadata": None}
+            yield {
+                "answer_chunk": "",
+                "metadata": {
+                    **entry["metadata"],
+                    "session_id": session.id if session else None,
+                    "reused_context": False,
+                    "precomputed": True,
+                    "intent": match.intent
+                }
+            }
+            return
+
+    # 4-6. Retrieve and generate. A first question with no conversation
+    # context yields the same prompt for everyone asking it, so concurrent
+    # identical requests share one retrieval and one provider stream.
+    history_text = format_history(session)
+    if speculate and not is_followup and not history_text:
+        prefetched = prefetch.take_answer(question, detected_mode)
+        if prefetched:
+            logger.info("🔮 [RAG] Served a prefetched answer", extra=fields(provider=prefetched["provider"]))
+            if session:
+                session.add_turn(question, search_query, prefetched["answer"], prefetched["top_chunks"])
+            log_query(question, prefetched["provider"], prefetched["metadata"]["confidence"], user_ip)
+            prefetch.schedule(question, detected_mode, session)
+            yield {"answer_chunk": prefetched["answer"], "metadata": None}
+            yield {
+                "answer_chunk": "",
+                "metadata": {
+                    **prefetched["metadata"],
+                    "session_id": session.id if session else None,
+                    "prefetched": True
+                }
+            }
+            return
+    if speculate and reused_chunks is None:
+        prefetch.note_request(search_query)
+
+    pipeline = lambda: _answer_pipeline(question, search_query, reused_chunks, detected_mode, history_text, retrieved_chunks)
+    shared = False
+    if coalesce and Config.SINGLE_FLIGHT and not is_followup and not history_text:
+        flight_key = (" ".join(question.lower().split()), detected_mode)
+        is_leader, events = _inflight.stream(flight_key, pipeline)
+        shared = not is_leader
     else:
-        detected_mode = mode.lower()
+        events = pipeline()
 
-    # 3. Retrieve Context
-    # Increased top_k to ensure we capture multiple projects if asked
-    retrieved_chunks = hybrid_search(question, top_k=7) 
-    
-    # Lowered threshold slightly to avoid missing context on specific queries
-    relevant_chunks = [c for c in retrieved_chunks if c[1] > 0.12] 
-    
-    if not relevant_chunks:
-        yield {"answer_chunk": "I checked Sahil's resume, but I couldn't find specific details regarding that. However, I can tell you about his main projects and technical skills. Would you like to hear about those?", "metadata": None}
-        return
+    answer_parts = []
+    for event in events:
+        if "top_chunks" in event:
+            # Completion event: per-request bookkeeping stays with each caller
+            log_query(question, event["provider"], event["metadata"]["confidence"], user_ip, event.get("generation"))
+            if session:
+                session.add_turn(question, search_query, "".join(answer_parts), event["top_chunks"])
+            if speculate and not shared:
+                prefetch.schedule(question, detected_mode, session)
+            yield {
+                "answer_chunk": "",
+                "metadata": {
+                    **event["metadata"],
+                    "session_id": session.id if session else None,
+                    "coalesced": shared
+                }
+            }
+            continue
+        if event.get("answer_chunk"):
+            answer_parts.append(event["answer_chunk"])
+        yield event
+    logger.info("✨ [RAG] Generation complete.", extra=fields(
+        coalesced=shared, answer_chars=sum(len(p) for p in answer_parts),
+        total_ms=round((time.perf_counter() - started) * 1000, 1)
+    ))
 
-    top_chunks = relevant_chunks[:6]
+def build_prompt(question, relevant_chunks, detected_mode, history_text):
+    """Returns (prompt, top_chunks, sources, confidence) for the selected context"""
+    top_chunks = relevant_chunks[:Config.ANSWER_MAX_CHUNKS]
     context_text = "\n---\n".join([c[0] for c in top_chunks])
     
     # Build Metadata
@@ -196,14 +321,17 @@ def generate_answer_with_sources(question: str, user_ip: str = "unknown", mode:
         section = content.split(":")[0] if ":" in content and len(content.split(":")[0]) < 50 else "Resume Detail"
         sources.append({
             "section": section,
-            "relevance": f"{int(score * 100)}%" if search_type == 'vector' else "100%",
+            "relevance": "100%" if search_type == 'keyword' else f"{int(score * 100)}%",
             "preview": content[:100].strip() + "..."
         })
 
     avg_score = sum(rc[1] for rc in top_chunks if rc[2] == 'vector') / len([rc for rc in top_chunks if rc[2] == 'vector']) if [rc for rc in top_chunks if rc[2] == 'vector'] else 0
     confidence = "high" if avg_score > 0.45 else "medium"
+    if any(c[2] == 'lexical' for c in top_chunks):
+        # Degraded retrieval (no query embedding): keyword coverage only
+        confidence = "low"
 
-    # 4. Construct System Prompt (FIXED FOR PROFESSIONALISM)
+    # 5. Construct System Prompt (FIXED FOR PROFESSIONALISM)
     if detected_mode == "recruiter":
         tone_instruction = (
             "You are a professional hiring assistant. Answer with high information density. "
@@ -216,11 +344,16 @@ def generate_answer_with_sources(question: str, user_ip: str = "unknown", mode:
             "Use clear, easy-to-read formatting."
         )
 
+    history_section = f"""
+RECENT CONVERSATION (use it to resolve references like "that project"):
+{history_text}
+""" if history_text else ""
+
     prompt = f"""You are an AI assistant answering questions about Sahil based ONLY on his resume.
 
 CONTEXT FROM RESUME:
 {context_text}
-
+{history_section}
 USER QUESTION:
 {question}
 
@@ -232,43 +365,143 @@ CRITICAL RULES:
 5. {tone_instruction}
 
 Start your answer immediately:"""
+    return prompt, top_chunks, sources, confidence
+
+def _answer_pipeline(question, search_query, reused_chunks, detected_mode, history_text, retrieved_chunks=None):
+    """
+    Retrieval + prompt + provider fallback. Yields answer chunks, then (on
+    success) one completion event carrying the metadata, the provider used
+    and the chunks behind the answer. Holds no per-request state, so its
+    events can be fanned out to several clients.
+    """
+    # 4. Retrieve Context
+    retrieval_trace = {}
+    if reused_chunks:
+        # Same topic as the previous turn: skip embedding + DB entirely
+        logger.info("♻️ [RAG] Follow-up on the same topic, reusing %d chunks from session", len(reused_chunks))
+        retrieval_trace["path"] = "session"
+        relevant_chunks = reused_chunks
+    else:
+        if search_query != question:
+            logger.info("🧵 [RAG] Follow-up rewritten for retrieval: %s", search_query)
+        if retrieved_chunks is None:
+            # Increased top_k to ensure we capture multiple projects if asked
+            with memory.stage("retrieval"):
+                retrieved_chunks = hybrid_search(search_query, top_k=Config.RETRIEVAL_TOP_K, trace=retrieval_trace) 
+        else:
+            retrieval_trace["path"] = "batch"
+        
+        # Lowered threshold slightly to avoid missing context on specific queries
+        relevant_chunks = select_context(retrieved_chunks)
+    
+    if not relevant_chunks:
+        yield {"answer_chunk": "I checked Sahil's resume, but I couldn't find specific details regarding that. However, I can tell you about his main projects and technical skills. Would you like to hear about those?", "metadata": None}
+        return
+
+    with memory.stage("prompt_build"):
+        prompt, top_chunks, sources, confidence = build_prompt(question, relevant_chunks, detected_mode, history_text)
 
-    # 5. Call Providers
-    providers = [
-        ("Groq", generate_with_groq),
-        ("Gemini", generate_with_gemini),
-        ("Ollama", generate_with_ollama)
-    ]
+    # 6. Call Providers, fastest expected first (app/provider_router.py)
+    providers = {
+        "Groq": generate_with_groq,
+        "Gemini": generate_with_gemini,
+        "Ollama": generate_with_ollama
+    }
+
+    provider = None
+    generation = None
+    with memory.stage("streaming"):
+        for name in provider_order(list(providers), prompt):
+            logger.debug("🤖 [RAG] Attempting generation with %s...", name)
+            provider_started = time.perf_counter()
+            first_token_at = None
+            output_chars = 0
+            usage = {}
+            try:
+                for text_chunk in providers[name](prompt, usage=usage):
+                    if first_token_at is None and text_chunk:
+                        first_token_at = time.perf_counter()
+                    output_chars += len(text_chunk)
+                    yield {"answer_chunk": text_chunk, "metadata": None}
+                
+                provider = name
+                generation = _router.record_success(name, provider_started, first_token_at, time.perf_counter(),
+                                                    usage, len(prompt), output_chars)
+                logger.info("🤖 [RAG] Generated with %s", name, extra=fields(provider=name, **generation))
+                break
+            except Exception as e:
+                _router.record_failure(name)
+                logger.warning("⚠️ [RAG] %s failed: %s", name, e)
+                continue
+
+    if provider is None:
+        yield {"answer_chunk": "❌ Service is currently experiencing high load. Please try asking again in a moment.", "metadata": None}
+        return
+
+    yield {
+        "answer_chunk": "", 
+        "metadata": {
+            "sources": sources,
+            "confidence": confidence,
+            "mode": detected_mode,
+            "reused_context": bool(reused_chunks),
+            "retrieval_path": retrieval_trace.get("path"),
+            "degraded": any(c[2] == 'lexical' for c in top_chunks)
+        },
+        "provider": provider,
+        "generation": generation,
+        "top_chunks": top_chunks
+    }
+
+def collect_answer(events):
+    """Drain a generate_answer_with_sources stream into (answer, metadata)"""
+    answer_parts = []
+    metadata = None
+    for chunk in events:
+        if chunk.get("answer_chunk"):
+            answer_parts.append(chunk["answer_chunk"])
+        if chunk.get("metadata"):
+            metadata = chunk["metadata"]
+    return "".join(answer_parts), metadata
+
+def answer_batch(questions, user_ip="unknown", mode="auto"):
+    """
+    Answer several independent questions: one batched retrieval for all of
+    them, then generations on a bounded pool. Results keep the input order.
+    """
+    from app.query_resume import hybrid_search_batch
+
+    to_retrieve = [i for i, q in enumerate(questions) if not is_greeting_or_casual(q)]
+    retrieved = [None] * len(questions)
+    if to_retrieve:
+        batch = hybrid_search_batch([questions[i] for i in to_retrieve], top_k=Config.RETRIEVAL_TOP_K)
+        for i, chunks in zip(to_retrieve, batch):
+            retrieved[i] = chunks
 
-    success = False
-    for name, func in providers:
-        print(f"🤖 [RAG] Attempting generation with {name}...")
+    def answer_one(index):
         try:
-            for text_chunk in func(prompt):
-                yield {"answer_chunk": text_chunk, "metadata": None}
-            
-            success = True
-            log_query(question, name, confidence, user_ip)
-            break
+            answer, metadata = collect_answer(generate_answer_with_sources(
+                questions[index], user_ip=user_ip, mode=mode, retrieved_chunks=retrieved[index]
+            ))
+            return {"question": questions[index], "answer": answer, "metadata": metadata}
         except Exception as e:
-            print(f"⚠️ [RAG] {name} failed: {e}")
-            continue
+            logger.error("❌ [RAG] Batch item %d failed: %s", index, e)
+            return {"question": questions[index], "answer": "", "metadata": None, "error": "generation_failed"}
 
-    if not success:
-        yield {"answer_chunk": "❌ Service is currently experiencing high load. Please try asking again in a moment.", "metadata": None}
-    else:
-        yield {
-            "answer_chunk": "", 
-            "metadata": {
-                "sources": sources,
-                "confidence": confidence,
-                "mode": detected_mode
-            }
-        }
-    print(f"✨ [RAG] Generation complete.")
+    return list(_get_batch_pool().map(answer_one, range(len(questions))))
+
+def _get_batch_pool():
+    global _batch_pool
+    if _batch_pool is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _batch_pool = ThreadPoolExecutor(max_workers=Config.BATCH_WORKERS, thread_name_prefix="batch-answer")
+    return _batch_pool
+
+def get_inflight_stats():
+    return _inflight.stats()
+
+def get_router_stats():
+    return _router.stats()
 
 def generate_answer(question: str) -> str:
-    full_text = ""
-    for chunk in generate_answer_with_sources(question):
-        full_text += chunk.get("answer_chunk", "")
-    return full_text
\ No newline at end of file
+    return collect_answer(generate_answer_with_sources(question))[0]
\ No newline at end of file
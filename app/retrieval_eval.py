@@ -0,0 +1,301 @@
+"""
+retrieval_eval.py - Offline retrieval evaluation and parameter sweeps
+Runs every question in the golden set (eval/golden_set.json) through
+hybrid_search + select_context for each combination of retrieval parameters
+and reports recall@k, MRR, per-stage latency (embed / vector / keyword /
+merge) and which adaptive retrieval paths were taken, then recommends the
+fastest configuration whose recall stays within a tolerance of the best one.
+
+Runs fully offline: point EVAL_DATABASE_URL at a local Postgres+pgvector and
+use the deterministic hash embedder (the default here), which needs no API
+key. When EVAL_DATABASE_URL is set the whole run uses it (and its own vector
+index directory). --ingest truncates the corpus, so it refuses to run unless
+EVAL_DATABASE_URL is set or DATABASE_URL points at localhost. Before the sweep
+one stored chunk is re-embedded with --embedder; if it doesn't match the
+stored vector the corpus was ingested with another provider and the run stops.
+
+Usage:
+    EVAL_DATABASE_URL=postgresql://localhost/resume_eval python -m app.retrieval_eval --ingest
+    python -m app.retrieval_eval
+    python -m app.retrieval_eval --top-k 5,7,9 --min-similarity 0.2,0.3 --json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+DEFAULT_GOLDEN_SET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "eval", "golden_set.json")
+
+STAGES = ("embed_ms", "vector_ms", "keyword_ms", "merge_ms", "total_ms")
+
+
+def load_golden_set(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["questions"]
+
+
+def _is_local(url):
+    from psycopg2.extensions import parse_dsn
+
+    host = parse_dsn(url).get("host") or ""
+    return host in ("", "localhost", "127.0.0.1", "::1") or host.startswith("/")
+
+
+def _use_eval_database():
+    """Point this run at EVAL_DATABASE_URL and a separate vector index; False if it isn't set"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    eval_url = os.getenv("EVAL_DATABASE_URL")
+    if not eval_url:
+        return False
+    os.environ["DATABASE_URL"] = eval_url
+    os.environ["VECTOR_INDEX_DIR"] = os.getenv("EVAL_VECTOR_INDEX_DIR", os.path.join("data", "index-eval"))
+    return True
+
+
+def check_stored_provider(embedder, min_similarity=0.98):
+    """
+    Re-embed one stored chunk with `embedder` and compare it with its stored
+    vector. Returns an error message on a mismatch, None if they agree (or
+    there is nothing to compare).
+    """
+    from app.db import pooled_connection
+    from app.embeddings import generate_embedding
+    from app.ingest_resume import create_contextual_chunk
+
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT c.content, s.section_type, c.embedding::text
+            FROM resume_chunks c JOIN resume_sections s ON s.id = c.parent_id
+            ORDER BY c.id LIMIT 1;
+        """)
+        row = cur.fetchone()
+        cur.close()
+    if row is None:
+        return None
+    content, section_type, stored = row
+    stored = [float(v) for v in stored.strip("[]").split(",")]
+    fresh = generate_embedding(create_contextual_chunk(content, section_type))
+    dot = sum(a * b for a, b in zip(stored, fresh))
+    norm = (sum(a * a for a in stored) * sum(b * b for b in fresh)) ** 0.5
+    similarity = dot / norm if norm else 0.0
+    if similarity < min_similarity:
+        return (f"stored vectors were not made by the {embedder} embedder (similarity {similarity:.2f}); "
+                f"pass the ingest provider with --embedder, or --ingest into EVAL_DATABASE_URL")
+    return None
+
+
+def _parse_list(value, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def score_context(chunks, expected):
+    """
+    Returns (recall, reciprocal_rank) for one question.
+    recall = share of expected substrings present in the context;
+    reciprocal_rank = 1 / rank of the first chunk containing any of them.
+    """
+    expected_lower = [e.lower() for e in expected]
+    found = set()
+    first_rank = None
+    for rank, (content, _score, _source) in enumerate(chunks, 1):
+        content_lower = content.lower()
+        hits = {e for e in expected_lower if e in content_lower}
+        if hits and first_rank is None:
+            first_rank = rank
+        found |= hits
+    recall = len(found) / len(expected_lower) if expected_lower else 1.0
+    return recall, (1.0 / first_rank if first_rank else 0.0)
+
+
+def evaluate(golden, top_k, min_similarity, keyword_limit, min_scores, max_chunks_options, repeat=1, adaptive=False):
+    """
+    Evaluate one retrieval configuration. Context selection (min_score,
+    max_chunks) doesn't change what is retrieved, so all of its variants are
+    scored from the same hybrid_search results.
+    """
+    from app.query_resume import hybrid_search
+    from app.rag_answer import select_context
+
+    latencies = {stage: [] for stage in STAGES}
+    paths = {}
+    scores = {(s, m): {"recall": [], "mrr": []} for s in min_scores for m in max_chunks_options}
+
+    for item in golden:
+        results = None
+        for _ in range(repeat):
+            timings = {}
+            trace = {}
+            started = time.perf_counter()
+            results = hybrid_search(
+                item["question"],
+                top_k=top_k,
+                min_similarity=min_similarity,
+                keyword_limit=keyword_limit,
+                timings=timings,
+                use_cache=False,
+                adaptive=adaptive,
+                trace=trace,
+            )
+            timings["total_ms"] = (time.perf_counter() - started) * 1000
+            for stage in STAGES:
+                latencies[stage].append(timings.get(stage, 0.0))
+        paths[trace.get("path")] = paths.get(trace.get("path"), 0) + 1
+
+        for min_score, max_chunks in scores:
+            context = select_context(results, min_score=min_score)[:max_chunks]
+            recall, rr = score_context(context, item["expected"])
+            scores[(min_score, max_chunks)]["recall"].append(recall)
+            scores[(min_score, max_chunks)]["mrr"].append(rr)
+
+    latency_summary = {
+        stage: {
+            "mean": round(sum(values) / len(values), 2) if values else 0.0,
+            "p95": round(_percentile(values, 95), 2),
+        }
+        for stage, values in latencies.items()
+    }
+
+    rows = []
+    for (min_score, max_chunks), s in scores.items():
+        rows.append({
+            "top_k": top_k,
+            "min_similarity": min_similarity,
+            "keyword_limit": keyword_limit,
+            "adaptive": adaptive,
+            "min_score": min_score,
+            "max_chunks": max_chunks,
+            "recall": round(sum(s["recall"]) / len(s["recall"]), 4),
+            "mrr": round(sum(s["mrr"]) / len(s["mrr"]), 4),
+            "latency": latency_summary,
+            "paths": paths,
+        })
+    return rows
+
+
+def recommend(rows, tolerance):
+    """Fastest configuration (p95 total latency, then fewest prompt chunks) within `tolerance` of the best recall"""
+    if not rows:
+        return None
+    best_recall = max(r["recall"] for r in rows)
+    eligible = [r for r in rows if r["recall"] >= best_recall - tolerance]
+    return min(eligible, key=lambda r: (r["latency"]["total_ms"]["p95"], r["max_chunks"], -r["recall"], -r["mrr"]))
+
+
+def _print_table(rows, baseline, choice):
+    header = f"{'top_k':>5} {'min_sim':>7} {'kw_lim':>6} {'adapt':>5} {'min_sc':>6} {'chunks':>6} | {'recall':>6} {'mrr':>6} | {'embed':>7} {'vector':>7} {'keyword':>7} {'total':>7} {'p95':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in sorted(rows, key=lambda r: (-r["recall"], r["latency"]["total_ms"]["p95"])):
+        lat = r["latency"]
+        marker = " *" if r is choice else (" (current)" if r is baseline else "")
+        print(
+            f"{r['top_k']:>5} {r['min_similarity']:>7} {r['keyword_limit']:>6} {'on' if r['adaptive'] else 'off':>5} {r['min_score']:>6} {r['max_chunks']:>6} | "
+            f"{r['recall']:>6.3f} {r['mrr']:>6.3f} | "
+            f"{lat['embed_ms']['mean']:>7.1f} {lat['vector_ms']['mean']:>7.1f} {lat['keyword_ms']['mean']:>7.1f} "
+            f"{lat['total_ms']['mean']:>7.1f} {lat['total_ms']['p95']:>7.1f}{marker}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep retrieval parameters against the golden set.")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN_SET, help="Path to the golden set JSON")
+    parser.add_argument("--embedder", choices=("hash", "gemini"), default="hash",
+                        help="Embedding provider (must match the one used at ingest; default: hash)")
+    parser.add_argument("--ingest", action="store_true", help="Re-ingest data/resume.md with the chosen embedder first")
+    parser.add_argument("--top-k", default="5,7,9,12")
+    parser.add_argument("--min-similarity", default="0.15,0.25,0.35")
+    parser.add_argument("--keyword-limit", default="0,3,5")
+    parser.add_argument("--adaptive", default="off,on", help="Adaptive early-exit planner settings to compare")
+    parser.add_argument("--min-score", default="0.12")
+    parser.add_argument("--max-chunks", default="4,6")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per question (latency only)")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Allowed recall drop for the recommendation")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args(argv)
+
+    os.environ["EMBEDDING_PROVIDER"] = args.embedder
+    if not _use_eval_database() and args.ingest and not _is_local(os.getenv("DATABASE_URL") or ""):
+        print("❌ [Eval] --ingest truncates resume_chunks: set EVAL_DATABASE_URL to a scratch database "
+              "(DATABASE_URL is not on localhost)", file=sys.stderr)
+        return 2
+
+    from app.config import Config
+
+    if args.ingest:
+        from app.ingest_resume import ingest
+        ingest(verbose=not args.json)
+
+    error = check_stored_provider(args.embedder)
+    if error:
+        print(f"❌ [Eval] {error}", file=sys.stderr)
+        return 2
+
+    golden = load_golden_set(args.golden)
+
+    # Always measure the live configuration, even if it's outside the grid
+    grid = set(itertools.product(
+        _parse_list(args.top_k, int),
+        _parse_list(args.min_similarity, float),
+        _parse_list(args.keyword_limit, int),
+        _parse_list(args.adaptive, lambda v: v.strip().lower() in ("on", "true", "1")),
+    ))
+    current = (Config.RETRIEVAL_TOP_K, Config.VECTOR_MIN_SIMILARITY, Config.KEYWORD_LIMIT, Config.ADAPTIVE_RETRIEVAL)
+    grid.add(current)
+    min_scores = sorted(set(_parse_list(args.min_score, float)) | {Config.ANSWER_MIN_SCORE})
+    max_chunks_options = sorted(set(_parse_list(args.max_chunks, int)) | {Config.ANSWER_MAX_CHUNKS})
+
+    rows = []
+    for top_k, min_similarity, keyword_limit, adaptive in sorted(grid):
+        if not args.json:
+            print(f"📏 [Eval] top_k={top_k} min_similarity={min_similarity} keyword_limit={keyword_limit} adaptive={adaptive}", file=sys.stderr)
+        rows.extend(evaluate(golden, top_k, min_similarity, keyword_limit, min_scores, max_chunks_options,
+                             repeat=max(args.repeat, 1), adaptive=adaptive))
+
+    baseline = next(
+        (r for r in rows
+         if (r["top_k"], r["min_similarity"], r["keyword_limit"], r["adaptive"]) == current
+         and r["min_score"] == Config.ANSWER_MIN_SCORE and r["max_chunks"] == Config.ANSWER_MAX_CHUNKS),
+        None,
+    )
+    choice = recommend(rows, args.tolerance)
+
+    if args.json:
+        print(json.dumps({
+            "embedder": args.embedder,
+            "questions": len(golden),
+            "results": rows,
+            "current": baseline,
+            "recommended": choice,
+        }, indent=2))
+        return 0
+
+    print()
+    _print_table(rows, baseline, choice)
+    if choice:
+        print(f"\n✅ Recommended (fastest within {args.tolerance:.0%} of best recall):")
+        print(f"   RETRIEVAL_TOP_K={choice['top_k']} VECTOR_MIN_SIMILARITY={choice['min_similarity']} "
+              f"KEYWORD_LIMIT={choice['keyword_limit']} ADAPTIVE_RETRIEVAL={str(choice['adaptive']).lower()} ANSWER_MIN_SCORE={choice['min_score']} "
+              f"ANSWER_MAX_CHUNKS={choice['max_chunks']}")
+        print(f"   recall={choice['recall']:.3f} mrr={choice['mrr']:.3f} p95={choice['latency']['total_ms']['p95']:.1f} ms paths={choice['paths']}")
+    if baseline:
+        print(f"   current: recall={baseline['recall']:.3f} mrr={baseline['mrr']:.3f} p95={baseline['latency']['total_ms']['p95']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+schema.py - Idempotent schema setup and maintenance
+`resume_chunks` predates this module (see migrate_embeddings.py); here it
+gains the columns used for hierarchical retrieval:
+  resume_sections  - one row per markdown section (the "parent")
+  parent_id        - the section a child chunk (bullet/sentence) belongs to
+  chunk_index      - the child's position inside that section
+Rows without a parent_id (older ingests) are served as standalone chunks.
+
+`query_logs` (also pre-existing) gains per-generation measurements from
+app/provider_router.py: model, TTFT, total generation time, prompt /
+completion tokens and streaming speed.
+
+Log tables (`query_logs`, `download_events`) are range-partitioned by month
+on created_at, so retention drops whole partitions instead of deleting rows.
+A plain `query_logs` from before this is renamed and attached as a single
+"before" partition. A DEFAULT partition catches rows when maintenance has
+not created the month's partition yet. `resume_requests` gets the indexes
+that its hot-path queries need:
+  unique (token)              - status / approve / download lookups
+  (hashed_ip, created_at)     - the hourly rate-limit count
+  (expires_at)                - the retention purge
+Download logs used to be written to `resume_requests` with a 100-year
+expiry; the migration moves those rows to `download_events`.
+
+The API runs the migration itself when gunicorn starts (on_starting in
+gunicorn.conf.py, SCHEMA_MIGRATE_ON_START) and refuses to start if it fails.
+
+Usage:
+    python -m app.schema              # create / migrate everything
+    python -m app.schema --maintain   # daily: partitions ahead + retention purge
+"""
+
+import argparse
+import re
+from datetime import date, datetime, timedelta
+from app.config import Config
+from app.db import get_connection
+
+PARTITION_SUFFIX = re.compile(r"_(before_)?y(\d{4})m(\d{2})$")
+
+# Column definitions for log tables created from scratch
+LOG_TABLES = {
+    "query_logs": """
+        id BIGSERIAL,
+        question TEXT,
+        provider TEXT,
+        confidence TEXT,
+        user_ip TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT now()
+    """,
+    "download_events": """
+        id BIGSERIAL,
+        email TEXT,
+        source_ref TEXT,
+        hashed_ip TEXT,
+        user_agent TEXT,
+        platform TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT now()
+    """,
+}
+
+
+def ensure_schema(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS resume_sections (
+            id SERIAL PRIMARY KEY,
+            heading TEXT NOT NULL,
+            section_type TEXT,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+    """)
+    cur.execute("ALTER TABLE resume_chunks ADD COLUMN IF NOT EXISTS parent_id INTEGER REFERENCES resume_sections(id) ON DELETE CASCADE;")
+    cur.execute("ALTER TABLE resume_chunks ADD COLUMN IF NOT EXISTS chunk_index INTEGER;")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_resume_chunks_parent ON resume_chunks (parent_id, chunk_index);")
+
+
+def ensure_query_log_schema(cur):
+    for column, kind in (
+        ("model", "TEXT"),
+        ("ttft_ms", "REAL"),
+        ("generation_ms", "REAL"),
+        ("prompt_tokens", "INTEGER"),
+        ("completion_tokens", "INTEGER"),
+        ("tokens_per_sec", "REAL"),
+    ):
+        cur.execute(f"ALTER TABLE query_logs ADD COLUMN IF NOT EXISTS {column} {kind};")
+
+
+# =============================================================================
+# Monthly partitioned log tables
+# =============================================================================
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_suffix(month):
+    return f"y{month.year}m{month.month:02d}"
+
+
+def _relkind(cur, table):
+    """'p' partitioned, 'r' plain table, None if missing"""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);", (table,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _partition_legacy_table(cur, table, today):
+    """
+    Turn a plain log table into the first partition of a partitioned one.
+    ATTACH checks every row against the bound, so the legacy partition ends
+    after the month of its newest row (at least next month); this month's
+    rows stay in it and monthly partitions start where it ends.
+    """
+    cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();")
+    cur.execute(f"UPDATE {table} SET created_at = 'epoch' WHERE created_at IS NULL;")
+    cur.execute(f"SELECT max(created_at) FROM {table};")
+    newest = cur.fetchone()[0]
+    first_month = _add_months(_month_start(today), 1)
+    if newest is not None:
+        first_month = max(first_month, _add_months(_month_start(newest), 1))
+
+    legacy = f"{table}_before_{_month_suffix(first_month)}"
+    cur.execute(f"ALTER TABLE {table} RENAME TO {legacy};")
+    cur.execute(f"ALTER TABLE {legacy} ALTER COLUMN created_at SET NOT NULL;")
+    cur.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at);")
+
+    # Give ids a sequence owned by the new parent, so dropping the legacy
+    # partition later doesn't take the id default with it
+    cur.execute("SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = 'id';", (legacy,))
+    if cur.fetchone():
+        cur.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS;")
+        cur.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT;")
+        cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {table}_partitioned_id_seq OWNED BY {table}.id;")
+        cur.execute(f"SELECT setval('{table}_partitioned_id_seq', (SELECT coalesce(max(id), 0) + 1 FROM {legacy}), false);")
+        cur.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_partitioned_id_seq');")
+
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ('{first_month}');")
+    print(f"🔁 [Schema] {table} is now partitioned by month (history kept in {legacy})")
+
+
+def _legacy_upper_bound(cur, table):
+    """First month not covered by a migrated "before" partition (None if there is none)"""
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s);
+    """, (table,))
+    bounds = []
+    for (name,) in cur.fetchall():
+        match = PARTITION_SUFFIX.search(name)
+        if match and match.group(1):
+            bounds.append(date(int(match.group(2)), int(match.group(3)), 1))
+    return max(bounds) if bounds else None
+
+
+def ensure_partitions(cur, table, today=None, ahead=None):
+    """
+    Monthly partitions from the current month through `ahead` months out,
+    skipping months a migrated "before" partition already covers
+    """
+    if ahead is None:
+        ahead = Config.LOG_PARTITIONS_AHEAD
+    month = _month_start(today or date.today())
+    covered_until = _legacy_upper_bound(cur, table)
+    for offset in range(ahead + 1):
+        start = _add_months(month, offset)
+        if covered_until is not None and start < covered_until:
+            continue
+        _create_partition(cur, table, start)
+
+
+def _create_partition(cur, table, start):
+    """
+    Create one month's partition. Postgres refuses to create it while the
+    DEFAULT partition holds rows in its range (maintenance missed the month),
+    so those rows are moved into a standalone table that is then attached.
+    """
+    name = f"{table}_{_month_suffix(start)}"
+    end = _add_months(start, 1)
+    if _relkind(cur, name) is not None:
+        return
+    default = f"{table}_default"
+    if _relkind(cur, default) is None:
+        cur.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}');")
+        return
+
+    # Block inserts into DEFAULT until the month's partition is attached
+    cur.execute(f"LOCK TABLE {default} IN SHARE ROW EXCLUSIVE MODE;")
+    cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS);")
+    cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM {default} WHERE created_at >= %s AND created_at < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved;
+    """, (start, end))
+    if cur.rowcount:
+        print(f"📦 [Schema] Moved {cur.rowcount} rows from {default} to {name}")
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}');")
+
+
+def ensure_log_table(cur, table, today=None):
+    today = today or date.today()
+    kind = _relkind(cur, table)
+    if kind is None:
+        cur.execute(f"""
+            CREATE TABLE {table} (
+                {LOG_TABLES[table].strip()},
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at);
+        """)
+    elif kind != "p":
+        _partition_legacy_table(cur, table, today)
+    ensure_partitions(cur, table, today)
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT;")
+
+
+def drop_expired_partitions(cur, table, retention_days=None, today=None):
+    """Drop partitions whose whole range is older than the retention window"""
+    if retention_days is None:
+        retention_days = Config.LOG_RETENTION_DAYS
+    cutoff = (today or date.today()) - timedelta(days=retention_days)
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s);
+    """, (table,))
+    dropped = []
+    for (name,) in cur.fetchall():
+        match = PARTITION_SUFFIX.search(name)
+        if not match:
+            continue  # the DEFAULT partition
+        month = date(int(match.group(2)), int(match.group(3)), 1)
+        upper = month if match.group(1) else _add_months(month, 1)
+        if upper <= cutoff:
+            cur.execute(f"DROP TABLE {name};")
+            dropped.append(name)
+    return dropped
+
+
+# =============================================================================
+# resume_requests
+# =============================================================================
+def ensure_request_indexes(cur):
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_resume_requests_token ON resume_requests (token);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_resume_requests_ip_created ON resume_requests (hashed_ip, created_at);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_resume_requests_expires ON resume_requests (expires_at);")
+
+
+def move_legacy_downloads(cur):
+    """Download logs that were stored as fake resume_requests rows -> download_events"""
+    cur.execute("""
+        WITH moved AS (
+            DELETE FROM resume_requests WHERE status LIKE 'Downloaded (%'
+            RETURNING email, status, hashed_ip, user_agent, platform, created_at
+        )
+        INSERT INTO download_events (email, source_ref, hashed_ip, user_agent, platform, created_at)
+        SELECT email, substring(status FROM '^Downloaded \\((.*)\\)$'), hashed_ip, user_agent, platform,
+               coalesce(created_at, now())
+        FROM moved;
+    """)
+    return cur.rowcount
+
+
+def purge_expired_requests(cur, retention_days=None):
+    """Delete access requests whose token expired more than the retention window ago"""
+    if retention_days is None:
+        retention_days = Config.RESUME_REQUEST_RETENTION_DAYS
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    cur.execute("DELETE FROM resume_requests WHERE expires_at < %s;", (cutoff,))
+    return cur.rowcount
+
+
+# =============================================================================
+# Entry points
+# =============================================================================
+def ensure_log_schema(cur, today=None):
+    for table in LOG_TABLES:
+        ensure_log_table(cur, table, today)
+    ensure_query_log_schema(cur)
+    ensure_request_indexes(cur)
+    moved = move_legacy_downloads(cur)
+    if moved:
+        print(f"📦 [Schema] Moved {moved} download logs from resume_requests to download_events")
+
+
+def maintain(cur, today=None):
+    """Daily job: create upcoming partitions, drop expired ones, purge old requests"""
+    report = {"dropped_partitions": [], "purged_requests": 0}
+    for table in LOG_TABLES:
+        ensure_partitions(cur, table, today)
+        report["dropped_partitions"] += drop_expired_partitions(cur, table, today=today)
+    report["purged_requests"] = purge_expired_requests(cur)
+    return report
+
+
+def migrate():
+    """Create / migrate everything in one transaction; raises if it fails"""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        ensure_schema(cur)
+        ensure_log_schema(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create / migrate the schema, or run log retention.")
+    parser.add_argument("--maintain", action="store_true",
+                        help="Create upcoming partitions and purge data past retention (run daily)")
+    args = parser.parse_args()
+
+    if args.maintain:
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            report = maintain(cur)
+            conn.commit()
+            print(f"🧹 [Schema] Dropped {len(report['dropped_partitions'])} partitions "
+                  f"{report['dropped_partitions']}, purged {report['purged_requests']} expired requests")
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ [Schema] Maintenance failed: {e}")
+            raise SystemExit(1)
+        finally:
+            cur.close()
+            conn.close()
+    else:
+        try:
+            migrate()
+            print("✅ [Schema] Up to date")
+        except Exception as e:
+            print(f"❌ [Schema] Migration failed: {e}")
+            raise SystemExit(1)
@@ -0,0 +1,190 @@
+"""
+sessions.py - Server-side conversation sessions
+Bounded LRU + TTL store keyed by the session id the client sends with /ask.
+Each session keeps its last few turns and the chunks they were answered from,
+so a follow-up like "what stack did that project use?" can be rewritten with
+the previous topic and, when the topic hasn't moved, answered from the
+previous turn's chunks without another embedding call or DB round trip.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from app.config import Config
+
+# Words that point back at the previous turn ("that project", "it")
+REFERENCE_PATTERN = re.compile(
+    r"\b(that|this|those|these|it|its|they|them|their|there|same|above|previous|mentioned|earlier)\b",
+    re.IGNORECASE,
+)
+# Openers that continue the conversation ("and his education?")
+CONTINUATION_PATTERN = re.compile(r"^\s*(and|also|what about|how about|more)\b", re.IGNORECASE)
+
+# Generic follow-up vocabulary that says nothing about the topic itself
+FOLLOWUP_STOPWORDS = {
+    'that', 'this', 'those', 'these', 'its', 'they', 'them', 'their', 'there',
+    'did', 'does', 'use', 'used', 'using', 'more', 'also', 'same', 'other',
+    'tell', 'explain', 'elaborate', 'detail', 'details', 'please', 'him', 'his',
+    'project', 'one', 'then', 'else', 'any', 'some', 'like', 'above', 'previous',
+    'mentioned', 'earlier', 'sahil', "sahil's", 'why', 'who', 'whom', 'whose',
+    'really', 'okay', 'sure', 'cool', 'great', 'interesting', 'example', 'examples',
+}
+
+MAX_TOPIC_TERMS = 6
+SHORT_QUESTION_WORDS = 4
+WORD = re.compile(r"[\w\.]+")  # same tokens as extract_keywords
+
+
+def _topic_terms(text):
+    """Content words of a question (same tokenisation as keyword search)"""
+    from app.query_resume import extract_keywords
+    return [kw for kw in extract_keywords(text) if kw not in FOLLOWUP_STOPWORDS]
+
+
+def _words(text):
+    """Whole words of a text, so 'java' doesn't match inside 'javascript'"""
+    return {word.strip(".") for word in WORD.findall(text.lower())}
+
+
+class Turn:
+    def __init__(self, question, search_query, answer, chunks):
+        self.question = question
+        self.search_query = search_query
+        self.answer = answer
+        self.chunks = chunks  # [(content, score, search_type)] the answer was built from
+        self.created_at = time.time()
+
+
+class Session:
+    def __init__(self, session_id, max_turns):
+        self.id = session_id
+        self.turns = deque(maxlen=max_turns)
+        self.last_seen = time.time()
+
+    @property
+    def last_turn(self):
+        return self.turns[-1] if self.turns else None
+
+    def add_turn(self, question, search_query, answer, chunks):
+        self.turns.append(Turn(question, search_query, answer, list(chunks)))
+        self.last_seen = time.time()
+
+
+class SessionStore:
+    """Thread-safe LRU of sessions; idle sessions expire after ttl seconds"""
+
+    def __init__(self, max_entries, ttl_seconds, max_turns):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, create=True):
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session and now - session.last_seen > self.ttl_seconds:
+                del self._sessions[session_id]
+                session = None
+
+            if session is None:
+                if not create:
+                    return None
+                session = Session(session_id, self.max_turns)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+
+            session.last_seen = now
+            self._evict(now)
+            return session
+
+    def _evict(self, now):
+        # Oldest entries sit at the front: drop expired ones, then trim to size
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_entries or now - oldest.last_seen > self.ttl_seconds:
+                del self._sessions[oldest_id]
+            else:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+_store = SessionStore(
+    max_entries=Config.SESSION_MAX_ENTRIES,
+    ttl_seconds=Config.SESSION_TTL_SECONDS,
+    max_turns=Config.SESSION_MAX_TURNS,
+)
+
+
+def get_session_store():
+    return _store
+
+
+def is_valid_session_id(session_id):
+    return isinstance(session_id, str) and 0 < len(session_id) <= 128
+
+
+def plan_followup(question, session):
+    """
+    Decide how to retrieve for `question` given the session history.
+    Returns (search_query, reused_chunks):
+      - not a follow-up            -> (question, None)
+      - follow-up, same topic      -> (rewritten, previous turn's chunks)
+      - follow-up, topic has moved -> (rewritten, None)
+    """
+    previous = session.last_turn if session else None
+    if previous is None:
+        return question, None
+
+    # A follow-up needs a cue: a reference back ("that project"), a
+    # continuation opener ("and ...?"), or a short question with no topic of
+    # its own ("why?"). "Java experience?" is short but a new question.
+    refers_back = bool(REFERENCE_PATTERN.search(question))
+    question_terms = _topic_terms(question)
+    is_followup = (
+        refers_back
+        or bool(CONTINUATION_PATTERN.search(question))
+        or (len(question.split()) <= SHORT_QUESTION_WORDS and not question_terms)
+    )
+    if not is_followup:
+        return question, None
+
+    # Carry the previous topic into the query so retrieval isn't context-free.
+    # "And his education?" names its own topic, so nothing is carried there.
+    search_query = question
+    if refers_back or not question_terms:
+        carried = [t for t in _topic_terms(previous.search_query) if t not in question_terms]
+        if carried:
+            search_query = f"{question} {' '.join(carried[:MAX_TOPIC_TERMS])}"
+
+    # Same topic if everything the question asks about is already in the
+    # chunks we answered from last time
+    if previous.chunks:
+        previous_words = _words(" ".join(c[0] for c in previous.chunks))
+        if all(term.strip(".") in previous_words for term in question_terms):
+            return search_query, previous.chunks
+
+    return search_query, None
+
+
+def format_history(session, max_turns=2, max_answer_chars=300):
+    """Render the last few turns for the prompt ('' when there are none)"""
+    if not session or not session.turns:
+        return ""
+    lines = []
+    for turn in list(session.turns)[-max_turns:]:
+        answer = turn.answer.strip()
+        if len(answer) > max_answer_chars:
+            answer = answer[:max_answer_chars].rstrip() + "..."
+        lines.append(f"User: {turn.question}")
+        lines.append(f"Assistant: {answer}")
+    return "\n".join(lines)
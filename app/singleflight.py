@@ -0,0 +1,125 @@
+"""
+singleflight.py - Coalesce identical in-flight work into one execution
+The first caller for a key becomes the leader: a background thread drives the
+producer and appends each event to a shared EventBuffer. Callers arriving
+while it runs subscribe to the same buffer and replay it from the start.
+Every subscriber reads at its own pace, so a slow client never stalls the
+producer or the other clients, and the producer keeps going if the leader's
+client disconnects. Once the flight finishes the key is released, and later
+callers start a new flight (by then the retrieval caches are warm).
+"""
+
+import contextvars
+import threading
+from app.log import get_logger, fields
+
+logger = get_logger(__name__)
+
+
+class EventBuffer:
+    """Append-only event log that readers can follow from any index"""
+
+    def __init__(self):
+        self._events = []
+        self._closed = False
+        self._error = None
+        self._cond = threading.Condition()
+
+    def append(self, event):
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def close(self, error=None):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._error = error
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        with self._cond:
+            return self._closed
+
+    def __len__(self):
+        with self._cond:
+            return len(self._events)
+
+    def iter_from(self, index=0, timeout=None):
+        """
+        Yield events from `index` onwards, blocking for new ones until the
+        buffer closes. Re-raises the producer's error, if any. With a
+        `timeout`, stops quietly when no event arrives in time.
+        """
+        while True:
+            with self._cond:
+                if index >= len(self._events) and not self._closed:
+                    if not self._cond.wait(timeout) and index >= len(self._events) and not self._closed:
+                        return
+                pending = self._events[index:]
+                closed, error = self._closed, self._error
+            for event in pending:
+                yield event
+            index += len(pending)
+            if closed and not pending:
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._metrics = {"flights": 0, "coalesced": 0, "errors": 0}
+
+    def stream(self, key, producer):
+        """
+        Returns (is_leader, iterator). `producer` is a zero-argument callable
+        returning an iterable; it only runs for the leader.
+        """
+        with self._lock:
+            buffer = self._flights.get(key)
+            leader = buffer is None
+            if leader:
+                buffer = EventBuffer()
+                self._flights[key] = buffer
+                self._metrics["flights"] += 1
+            else:
+                self._metrics["coalesced"] += 1
+
+        if leader:
+            # Run in a copy of the caller's context so its request id follows the work
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._drive, key, buffer, producer),
+                name=f"{self.name}-flight", daemon=True
+            ).start()
+        else:
+            logger.info("🔗 [SingleFlight] Joined in-flight %s request", self.name, extra=fields(buffered_events=len(buffer)))
+        return leader, buffer.iter_from(0)
+
+    def _drive(self, key, buffer, producer):
+        error = None
+        try:
+            for event in producer():
+                buffer.append(event)
+        except Exception as e:
+            error = e
+            with self._lock:
+                self._metrics["errors"] += 1
+        finally:
+            # Release the key before closing, so nobody joins a finished flight
+            with self._lock:
+                if self._flights.get(key) is buffer:
+                    del self._flights[key]
+            buffer.close(error)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["in_flight"] = len(self._flights)
+        return stats
@@ -1,7 +1,7 @@
 import streamlit as st
+import os
 import sys
-import time
-import requests
+import uuid
 from pathlib import Path
 
 # =============================================================================
@@ -16,7 +16,48 @@ st.set_page_config(
 
 # Add PROJECT ROOT to Python path to import your RAG logic
 sys.path.append(str(Path(__file__).parent.parent))
-from app.rag_answer import generate_answer_with_sources
+from app.backend_client import BackendClient, BackendError
+
+# =============================================================================
+# 🔌 BACKEND CONNECTION
+# =============================================================================
+# With BACKEND_URL set (docker-compose does this) the UI is a thin client that
+# streams from the API. Without it, the RAG pipeline runs in-process (local dev).
+BACKEND_URL = os.getenv("BACKEND_URL")
+DEFAULT_LOG_URL = "https://rag-portfolio-mvjo.onrender.com"
+RESUME_PATH = "assets/Sahil_Jadhav_Resume.pdf"
+HISTORY_WINDOW = 20  # Messages re-rendered on each rerun
+
+@st.cache_resource
+def get_backend_client():
+    """One pooled client per UI process, shared by every browser session"""
+    return BackendClient(BACKEND_URL or DEFAULT_LOG_URL)
+
+@st.cache_data
+def load_resume_pdf():
+    """Read the PDF once per process instead of on every rerun"""
+    try:
+        with open(RESUME_PATH, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def stream_answer(question, mode, session_id):
+    if BACKEND_URL:
+        try:
+            yield from get_backend_client().stream_answer(question, mode=mode, session_id=session_id)
+        except BackendError as e:
+            print(f"❌ [UI] {e}")
+            yield {"answer_chunk": "❌ The assistant is unreachable right now. Please try again in a moment.", "metadata": None}
+        return
+
+    from app.rag_answer import generate_answer_with_sources
+    yield from generate_answer_with_sources(
+        question=question,
+        user_ip="streamlit_user",
+        mode=mode,
+        session_id=session_id
+    )
 
 # =============================================================================
 # 🕵️ SECRET IDENTITY TRACKING
@@ -111,14 +152,10 @@ def download_dialog():
             
             if submit:
                 # Log the lead to your backend
-                try:
-                    backend_api = "https://rag-portfolio-mvjo.onrender.com/log_download" 
-                    requests.post(backend_api, json={
-                        "email": email if email else f"Anonymous_{source_ref}",
-                        "source_ref": source_ref
-                    }, timeout=5)
-                except:
-                    pass
+                get_backend_client().log_download(
+                    email if email else f"Anonymous_{source_ref}",
+                    source_ref
+                )
                 
                 # Unlock the download and rerun to refresh the dialog UI
                 st.session_state.download_unlocked = True
@@ -127,16 +164,16 @@ def download_dialog():
     # STEP 2: If unlocked, hide the form and show the actual download button
     else:
         st.success("✅ Access Granted!")
-        try:
-            with open("assets/Sahil_Jadhav_Resume.pdf", "rb") as f:
-                st.download_button(
-                    label="📥 Click to Download PDF Now",
-                    data=f,
-                    file_name="Sahil_Jadhav_Resume.pdf",
-                    mime="application/pdf",
-                    use_container_width=True
-                )
-        except FileNotFoundError:
+        resume_pdf = load_resume_pdf()
+        if resume_pdf:
+            st.download_button(
+                label="📥 Click to Download PDF Now",
+                data=resume_pdf,
+                file_name="Sahil_Jadhav_Resume.pdf",
+                mime="application/pdf",
+                use_container_width=True
+            )
+        else:
             st.error("Resume file not found in /assets")
         
         # Option to go back/reset
@@ -161,6 +198,7 @@ with st.sidebar:
     
     if st.button("🗑️ Clear Chat", use_container_width=True):
         st.session_state.chat_history = []
+        st.session_state.session_id = uuid.uuid4().hex
         st.rerun()
 
 # =============================================================================
@@ -171,9 +209,15 @@ st.markdown('<div class="sub-header">Chat with Sahil\'s Profile via RAG</div>',
 
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
+if "session_id" not in st.session_state:
+    # Lets the backend resolve follow-ups against this conversation
+    st.session_state.session_id = uuid.uuid4().hex
 
-# Display history
-for msg in st.session_state.chat_history:
+# Display history (only the recent window; every rerun re-renders it)
+hidden_count = max(0, len(st.session_state.chat_history) - HISTORY_WINDOW)
+if hidden_count:
+    st.caption(f"{hidden_count} earlier messages hidden")
+for msg in st.session_state.chat_history[hidden_count:]:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
 
@@ -190,12 +234,12 @@ if question:
         full_response = ""
         final_metadata = None
 
-        # Call RAG generator
+        # Stream from the API (or the in-process pipeline in local dev)
         with st.spinner("Analyzing Resume..."):
-            gen = generate_answer_with_sources(
-                question=question, 
-                user_ip="streamlit_user", 
-                mode=mode_selection.lower()
+            gen = stream_answer(
+                question,
+                mode_selection.lower(),
+                st.session_state.session_id
             )
 
             for chunk in gen:
@@ -0,0 +1,209 @@
+"""
+streams.py - Resumable, optionally compressed SSE answer streams
+POST /ask_stream runs the same generator as /ask, but the generation is
+driven by a background thread into an EventBuffer (app/singleflight.py)
+that outlives the HTTP connection:
+  - every chunk is sent as an SSE event with id "<stream_id>-<index>"
+  - a client that drops reconnects with Last-Event-ID (GET
+    /ask_stream/<stream_id>, or the original POST) and gets the events after
+    that id, the ones produced while it was away first; the answer is not
+    generated again
+  - finished streams stay buffered for STREAM_BUFFER_TTL_SECONDS, at most
+    STREAM_BUFFER_MAX of them (the oldest finished ones are evicted first)
+  - idle gaps send a comment every STREAM_HEARTBEAT_SECONDS so proxies keep
+    the connection open
+  - compression (STREAM_COMPRESSION=auto|gzip|off): brotli when the client
+    accepts it and the module is installed, else gzip. The compressor is
+    flushed after every event so chunks are not held back. A replay of a
+    finished stream shorter than STREAM_COMPRESS_MIN_BYTES is sent plain.
+Buffers live in the worker process that started the stream, so a resume
+must reach the same worker (sticky sessions); elsewhere it gets a 404.
+"""
+
+import contextvars
+import json
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from app.config import Config
+from app.singleflight import EventBuffer
+from app.log import get_logger
+
+logger = get_logger(__name__)
+
+RETRY_MS = 2000  # client reconnect delay suggested in the first frame
+
+
+class _Stream:
+    def __init__(self, stream_id):
+        self.id = stream_id
+        self.buffer = EventBuffer()
+        self.created_at = time.monotonic()
+        self.finished_at = None
+
+
+class StreamRegistry:
+    def __init__(self):
+        self._streams = OrderedDict()  # stream_id -> _Stream, oldest first
+        self._lock = threading.Lock()
+        self._metrics = {"started": 0, "resumed": 0, "resume_misses": 0, "evicted": 0, "errors": 0}
+
+    def _evict(self, now):
+        for stream_id, stream in list(self._streams.items()):
+            if stream.finished_at is not None and now - stream.finished_at > Config.STREAM_BUFFER_TTL_SECONDS:
+                del self._streams[stream_id]
+        finished = [sid for sid, s in self._streams.items() if s.finished_at is not None]
+        while len(self._streams) >= Config.STREAM_BUFFER_MAX and finished:
+            del self._streams[finished.pop(0)]
+            self._metrics["evicted"] += 1
+
+    def start(self, producer):
+        """Run `producer()` into a new buffered stream; returns the stream"""
+        stream = _Stream(uuid.uuid4().hex)
+        with self._lock:
+            self._evict(time.monotonic())
+            self._streams[stream.id] = stream
+            self._metrics["started"] += 1
+        # Run in a copy of the caller's context so its request id follows the work
+        context = contextvars.copy_context()
+        threading.Thread(
+            target=context.run, args=(self._drive, stream, producer), name="sse-stream", daemon=True
+        ).start()
+        return stream
+
+    def _drive(self, stream, producer):
+        error = None
+        try:
+            for event in producer():
+                stream.buffer.append(event)
+        except Exception as e:
+            error = e
+            with self._lock:
+                self._metrics["errors"] += 1
+            logger.error("❌ [SSE] Stream %s failed: %s", stream.id, e)
+        finally:
+            stream.finished_at = time.monotonic()
+            stream.buffer.close(error)
+
+    def resume(self, stream_id):
+        """The buffered stream, or None once it has expired (or lives in another worker)"""
+        with self._lock:
+            self._evict(time.monotonic())
+            stream = self._streams.get(stream_id)
+            self._metrics["resumed" if stream else "resume_misses"] += 1
+        return stream
+
+    def stats(self):
+        with self._lock:
+            active = sum(1 for s in self._streams.values() if s.finished_at is None)
+            return {**self._metrics, "buffered": len(self._streams), "active": active}
+
+
+_registry = StreamRegistry()
+
+
+def start(producer):
+    return _registry.start(producer)
+
+
+def resume(stream_id):
+    return _registry.resume(stream_id)
+
+
+def get_stats():
+    return _registry.stats()
+
+
+def parse_last_event_id(value):
+    """(stream_id, index) from a Last-Event-ID header, or (None, None)"""
+    stream_id, _, index = (value or "").strip().rpartition("-")
+    if not stream_id or not index.isdigit():
+        return None, None
+    return stream_id, int(index)
+
+
+# =============================================================================
+# SSE framing
+# =============================================================================
+def _frame(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def sse_events(stream, start_index=0):
+    """SSE frames for `stream` from `start_index` until it finishes, with heartbeats"""
+    yield f"retry: {RETRY_MS}\n\n".encode("utf-8")
+    yield _frame({"stream_id": stream.id, "resume_url": f"/ask_stream/{stream.id}", "from_event": start_index}, event="stream")
+    index = start_index
+    try:
+        while True:
+            for event in stream.buffer.iter_from(index, timeout=Config.STREAM_HEARTBEAT_SECONDS):
+                yield _frame(event, event_id=f"{stream.id}-{index}")
+                index += 1
+            if stream.buffer.closed and index >= len(stream.buffer):
+                break
+            yield b": keep-alive\n\n"
+    except Exception:
+        yield _frame({"error": "generation_failed"}, event="error")
+        return
+    yield _frame({"events": index}, event="done")
+
+
+def replay_bytes(stream, start_index):
+    """Size of the remaining events if the stream has finished, else None"""
+    if not stream.buffer.closed:
+        return None
+    size = 0
+    try:
+        for event in stream.buffer.iter_from(start_index, timeout=0):
+            size += len(json.dumps(event))
+    except Exception:
+        pass  # a failed stream replays what it produced plus an error event
+    return size
+
+
+# =============================================================================
+# Compression
+# =============================================================================
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def choose_encoding(accept_encoding, replay_size=None):
+    """'br', 'gzip' or None for this request's Accept-Encoding"""
+    setting = Config.STREAM_COMPRESSION
+    if setting == "off":
+        return None
+    if replay_size is not None and replay_size < Config.STREAM_COMPRESS_MIN_BYTES:
+        return None
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if setting == "auto" and "br" in accepted and _brotli() is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(frames, encoding):
+    """Compress a frame iterator, flushing after every frame so nothing waits in the compressor"""
+    if encoding == "br":
+        compressor = _brotli().Compressor()
+        for frame in frames:
+            yield compressor.process(frame) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for frame in frames:
+        yield compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,253 @@
+"""
+vector_index.py - Memory-mapped chunk index shared by every worker
+Ingest writes the chunk embedding matrix (float32, rows L2-normalized) as a
+.npy file plus a small JSON metadata file (ids, content, parent links), then
+atomically repoints `current.json` at the new pair with os.replace. Workers
+map the matrix read-only (np.load mmap_mode="r"), so the pages live once in
+the OS page cache however many gunicorn workers there are. Each worker
+notices a new version on its next lookup and maps it; files from the
+previous version are kept so in-flight readers are never cut off.
+
+When Config.VECTOR_INDEX is "mmap" and an index exists, vector search and
+parent expansion run against it; otherwise they fall back to Postgres. An
+index written with another EMBEDDING_PROVIDER (e.g. a `retrieval_eval
+--ingest` run with hash vectors) is skipped too: its vectors aren't
+comparable with the query embeddings.
+
+Usage:
+    python -m app.vector_index        # export the current DB corpus
+"""
+
+import json
+import os
+import threading
+import time
+import numpy as np
+from app.config import Config
+from app.ingest_jobs import on_corpus_change
+from app.embeddings import active_provider
+
+POINTER_FILE = "current.json"
+
+
+class VectorIndex:
+    def __init__(self, version, vectors, meta):
+        self.version = version
+        self.vectors = vectors
+        self.ids = meta["ids"]
+        self.contents = meta["contents"]
+        self.parent_ids = meta["parent_ids"]
+        self.chunk_indexes = meta["chunk_indexes"]
+        self.headings = meta["headings"]
+        self.embedding_provider = meta.get("embedding_provider")
+        self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._row_by_position = {
+            (parent_id, index): row
+            for row, (parent_id, index) in enumerate(zip(self.parent_ids, self.chunk_indexes))
+            if parent_id is not None
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _top(self, scores, top_k, min_similarity):
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            (self.contents[row], float(scores[row]), self.ids[row])
+            for row in best
+            if scores[row] > min_similarity
+        ]
+
+    def search(self, query_embedding, top_k, min_similarity):
+        """Same result shape as query_resume.vector_search: [(content, similarity, id)]"""
+        return self.search_batch([query_embedding], top_k, min_similarity)[0]
+
+    def search_batch(self, query_embeddings, top_k, min_similarity):
+        if not len(self):
+            return [[] for _ in query_embeddings]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = (queries / norms) @ self.vectors.T
+        return [self._top(row_scores, top_k, min_similarity) for row_scores in scores]
+
+    def window_rows(self, chunk_ids, window):
+        """Sibling rows for parent expansion, shaped like the SQL in expand_to_parents"""
+        rows = []
+        for chunk_id in chunk_ids:
+            row = self._row_by_id.get(chunk_id)
+            if row is None or self.parent_ids[row] is None:
+                continue
+            parent_id, own_index = self.parent_ids[row], self.chunk_indexes[row]
+            heading = self.headings.get(str(parent_id), "")
+            for index in range(own_index - window, own_index + window + 1):
+                sibling = self._row_by_position.get((parent_id, index))
+                if sibling is not None:
+                    rows.append((chunk_id, parent_id, own_index, heading, index, self.contents[sibling]))
+        return rows
+
+
+_state = {"index": None, "pointer_mtime": None, "checked_at": 0.0, "mismatch": None}
+_state_lock = threading.Lock()
+
+
+def _index_dir():
+    return Config.VECTOR_INDEX_DIR
+
+
+def load_index():
+    """Map the version named by current.json (None if no index has been written)"""
+    pointer_path = os.path.join(_index_dir(), POINTER_FILE)
+    try:
+        with open(pointer_path, "r", encoding="utf-8") as f:
+            pointer = json.load(f)
+    except FileNotFoundError:
+        return None
+    with open(os.path.join(_index_dir(), pointer["meta"]), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    vectors = np.load(os.path.join(_index_dir(), pointer["vectors"]), mmap_mode="r")
+    return VectorIndex(pointer["version"], vectors, meta)
+
+
+def get_index():
+    """
+    The current index for this process, re-mapped when ingest swaps in a new
+    version (checked at most every VECTOR_INDEX_CHECK_SECONDS).
+    """
+    if Config.VECTOR_INDEX != "mmap":
+        return None
+    now = time.monotonic()
+    with _state_lock:
+        if now - _state["checked_at"] < Config.VECTOR_INDEX_CHECK_SECONDS:
+            return _usable(_state["index"])
+        _state["checked_at"] = now
+        try:
+            mtime = os.stat(os.path.join(_index_dir(), POINTER_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            _state["index"] = None
+            return None
+        if mtime != _state["pointer_mtime"]:
+            try:
+                _state["index"] = load_index()
+                _state["pointer_mtime"] = mtime
+                if _state["index"] is not None:
+                    print(f"🗺️ [Index] Mapped vector index {_state['index'].version} ({len(_state['index'])} chunks)")
+            except Exception as e:
+                print(f"❌ [Index] Failed to map vector index: {e}")
+        return _usable(_state["index"])
+
+
+def _usable(index):
+    """`index` if its vectors come from the active embedding provider, else None"""
+    if index is None or index.embedding_provider is None or index.embedding_provider.lower() == active_provider():
+        return index
+    mismatch = (index.version, active_provider())
+    if _state["mismatch"] != mismatch:
+        _state["mismatch"] = mismatch
+        print(f"⚠️ [Index] Index {index.version} holds {index.embedding_provider} vectors but queries use "
+              f"{active_provider()}; searching Postgres instead")
+    return None
+
+
+def refresh():
+    """Look for a new version on the next lookup instead of after the check interval"""
+    with _state_lock:
+        _state["checked_at"] = 0.0
+
+
+on_corpus_change("vector_index", refresh)
+
+
+def write_index(entries, headings, embedding_provider=None):
+    """
+    Persist a new index version and swap it in atomically.
+    entries: [(id, content, embedding, parent_id, chunk_index)]
+    headings: {parent_id: heading}
+    """
+    directory = _index_dir()
+    os.makedirs(directory, exist_ok=True)
+    version = str(int(time.time() * 1000))
+    vectors_name = f"vectors-{version}.npy"
+    meta_name = f"meta-{version}.json"
+
+    vectors = np.asarray([e[2] for e in entries], dtype=np.float32)
+    if len(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+    meta = {
+        "version": version,
+        "embedding_provider": (embedding_provider or active_provider()).lower(),
+        "ids": [e[0] for e in entries],
+        "contents": [e[1] for e in entries],
+        "parent_ids": [e[3] for e in entries],
+        "chunk_indexes": [e[4] for e in entries],
+        "headings": {str(k): v for k, v in headings.items()},
+    }
+
+    with open(os.path.join(directory, vectors_name), "wb") as f:
+        np.save(f, vectors)
+    with open(os.path.join(directory, meta_name), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    # The swap itself: readers see either the old pointer or the new one
+    tmp_pointer = os.path.join(directory, f".{POINTER_FILE}.{version}")
+    previous = None
+    try:
+        with open(os.path.join(directory, POINTER_FILE), "r", encoding="utf-8") as f:
+            previous = json.load(f)["version"]
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "vectors": vectors_name, "meta": meta_name}, f)
+    os.replace(tmp_pointer, os.path.join(directory, POINTER_FILE))
+
+    _remove_old_versions(directory, keep={version, previous})
+    print(f"✅ [Index] Wrote vector index {version} ({len(entries)} chunks) to {directory}")
+    return version
+
+
+def _remove_old_versions(directory, keep):
+    for name in os.listdir(directory):
+        for prefix, suffix in (("vectors-", ".npy"), ("meta-", ".json")):
+            if name.startswith(prefix) and name.endswith(suffix):
+                if name[len(prefix):-len(suffix)] not in keep:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+
+
+def export_from_database():
+    """Build the index from what is currently in resume_chunks"""
+    from app.db import get_connection
+    from app.schema import ensure_schema
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        ensure_schema(cur)
+        conn.commit()
+        cur.execute("""
+            SELECT c.id, c.content, c.embedding::text, c.parent_id, c.chunk_index, s.heading
+            FROM resume_chunks c
+            LEFT JOIN resume_sections s ON s.id = c.parent_id
+            WHERE c.embedding IS NOT NULL
+            ORDER BY c.id;
+        """)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+    entries = [(r[0], r[1], json.loads(r[2]), r[3], r[4]) for r in rows]
+    headings = {r[3]: r[5] for r in rows if r[3] is not None}
+    return write_index(entries, headings)
+
+
+if __name__ == "__main__":
+    export_from_database()
@@ -0,0 +1,221 @@
+"""
+warmup.py - Startup warm-up and per-dependency readiness
+Runs once per worker process in the background, started by gunicorn's
+post_worker_init (or the dev server's __main__), never at import:
+  1. modules    - import the RAG stack
+  2. database   - open the pool's connections and round-trip each one
+  3. groq/gemini/ollama - open pooled TLS connections to the providers
+                  (in local LLM modes: preload the Ollama model instead)
+  4. retrieval  - load the FAQ store, then run common questions through
+                  hybrid_search, which primes the embedding and retrieval caches
+Each step's outcome and timing is recorded; /ready reports them so a load
+balancer only routes traffic once the first request will be served at
+steady-state latency. Failed steps are retried every WARMUP_RETRY_SECONDS,
+at most WARMUP_MAX_RETRIES times. /health remains a pure liveness check.
+
+/ready is unauthenticated, so a failed step only reports its error class
+(or the HTTP status); the full message goes to the server log.
+"""
+
+import os
+import threading
+import time
+from contextlib import ExitStack
+from app.config import Config
+from app.log import get_logger, fields
+
+logger = get_logger(__name__)
+
+# Dependencies that must be ready before /ready returns 200. Providers are
+# checked as a group: at least one LLM provider has to be reachable.
+REQUIRED_STEPS = ("modules", "database", "retrieval")
+LLM_STEPS = ("groq", "gemini", "ollama")
+
+_state = {
+    "started_at": None,
+    "finished_at": None,
+    "duration_ms": None,
+    "retries": 0,
+    "steps": {},
+}
+_state_lock = threading.Lock()
+_started = threading.Event()
+
+
+def _record(name, ready, started, error=None, **extra):
+    step = {
+        "ready": ready,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "error": error,
+        **extra,
+    }
+    with _state_lock:
+        _state["steps"][name] = step
+    if ready:
+        logger.info("✅ [Warmup] %s: %s ms", name, step["duration_ms"], extra=fields(step=name, ready=True))
+    else:
+        logger.warning("⚠️ [Warmup] %s: %s ms (%s)", name, step["duration_ms"], error, extra=fields(step=name, ready=False))
+
+
+class DependencyError(RuntimeError):
+    """A dependency answered, but not with something we can serve from"""
+
+    def __init__(self, summary):
+        super().__init__(summary)
+        self.summary = summary
+
+
+def _public_error(error):
+    """What /ready may show: never the message, which can carry URLs and credentials"""
+    if isinstance(error, DependencyError):
+        return error.summary
+    return type(error).__name__
+
+
+def _run_step(name, func):
+    started = time.perf_counter()
+    try:
+        extra = func() or {}
+        _record(name, True, started, **extra)
+    except Exception as e:
+        logger.warning("⚠️ [Warmup] %s failed: %s", name, e)
+        _record(name, False, started, error=_public_error(e))
+
+
+def _warm_modules():
+    import app.rag_answer  # noqa: F401 - pulls in retrieval, providers, sessions
+
+
+def _warm_database():
+    from app.db import get_pool, pooled_connection
+    get_pool()
+    # Hold DB_POOL_MIN connections at once so each one is opened and validated
+    opened = 0
+    with ExitStack() as stack:
+        for _ in range(max(Config.DB_POOL_MIN, 1)):
+            conn = stack.enter_context(pooled_connection())
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.close()
+            opened += 1
+    return {"connections": opened}
+
+
+def _warm_https(url, headers=None):
+    """Open (and keep in the pool) a connection to a provider host"""
+    from app.http_client import get_session
+    response = get_session().get(url, headers=headers or {}, timeout=5)
+    response.close()
+    if response.status_code >= 500:
+        raise DependencyError(f"HTTP {response.status_code}")
+    if response.status_code in (401, 403):
+        raise DependencyError(f"Credentials rejected (HTTP {response.status_code})")
+    return {"status_code": response.status_code}
+
+
+def _warm_groq():
+    return _warm_https(
+        "https://api.groq.com/openai/v1/models",
+        {"Authorization": f"Bearer {os.getenv('GROQ_API_KEY')}"}
+    )
+
+
+def _warm_gemini():
+    # Key in a header, not the query string: connection errors quote the URL
+    return _warm_https(
+        "https://generativelanguage.googleapis.com/v1beta/models?pageSize=1",
+        {"x-goog-api-key": os.getenv('GEMINI_API_KEY')}
+    )
+
+
+def _warm_ollama():
+    if Config.LLM_MODE != "cloud":
+        # Local modes serve from Ollama: load the model now, not on the first question
+        from app import local_llm
+        return local_llm.preload()
+    return _warm_https(f"{Config.OLLAMA_URL}/api/tags", {"ngrok-skip-browser-warning": "any"})
+
+
+def _warm_retrieval():
+    from app.faq_store import load_entries
+    from app.query_resume import hybrid_search
+
+    faq_entries = len(load_entries())
+    primed = 0
+    for question in Config.WARMUP_QUESTIONS:
+        # Same call shape as generate_answer_with_sources, so the cache keys match
+        hybrid_search(question, top_k=Config.RETRIEVAL_TOP_K)
+        primed += 1
+    return {"questions_primed": primed, "faq_entries": faq_entries}
+
+
+def run_warmup():
+    with _state_lock:
+        _state["started_at"] = time.time()
+    started = time.perf_counter()
+    logger.info("🔥 [Warmup] Starting worker warm-up...")
+
+    steps = [("modules", _warm_modules), ("database", _warm_database)]
+    if os.getenv("GROQ_API_KEY") and Config.LLM_MODE != "local":
+        steps.append(("groq", _warm_groq))
+    if os.getenv("GEMINI_API_KEY") and Config.LLM_MODE != "local":
+        steps.append(("gemini", _warm_gemini))
+    steps.append(("ollama", _warm_ollama))
+    steps.append(("retrieval", _warm_retrieval))
+
+    for name, func in steps:
+        _run_step(name, func)
+
+    with _state_lock:
+        _state["finished_at"] = time.time()
+        _state["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("🔥 [Warmup] Finished in %s ms (ready: %s)", _state["duration_ms"], is_ready())
+
+    # A dependency that was down at boot shouldn't keep the worker unready
+    # forever: retry the failed steps (at most WARMUP_MAX_RETRIES rounds)
+    # until /ready can flip to 200.
+    for attempt in range(1, Config.WARMUP_MAX_RETRIES + 1):
+        if is_ready():
+            return
+        time.sleep(Config.WARMUP_RETRY_SECONDS)
+        with _state_lock:
+            failed = [name for name, _ in steps if not _state["steps"].get(name, {}).get("ready")]
+            _state["retries"] = attempt
+        for name, func in steps:
+            if name in failed:
+                _run_step(name, func)
+    if not is_ready():
+        logger.error("❌ [Warmup] Still not ready after %s retries, giving up", Config.WARMUP_MAX_RETRIES)
+
+
+def start_background():
+    """Kick off warm-up once per process without blocking boot"""
+    if _started.is_set():
+        return
+    _started.set()
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
+
+
+def is_ready():
+    with _state_lock:
+        steps = dict(_state["steps"])
+        finished = _state["finished_at"] is not None
+    if not finished:
+        return False
+    if not all(steps.get(name, {}).get("ready") for name in REQUIRED_STEPS):
+        return False
+    return any(steps.get(name, {}).get("ready") for name in LLM_STEPS)
+
+
+def get_report():
+    with _state_lock:
+        report = {
+            "started_at": _state["started_at"],
+            "finished_at": _state["finished_at"],
+            "duration_ms": _state["duration_ms"],
+            "retries": _state["retries"],
+            "dependencies": {k: dict(v) for k, v in _state["steps"].items()},
+        }
+    report["ready"] = is_ready()
+    report["warming"] = _started.is_set() and report["finished_at"] is None
+    return report
@@ -0,0 +1,48 @@
+"""
+gunicorn.conf.py - Production server settings for the API
+The app is preloaded once in the master and forked into WEB_CONCURRENCY
+gevent workers, so imported code is shared copy-on-write and the vector
+index (app/vector_index.py) is mapped once and inherited by every worker.
+Anything that must not cross a fork (DB connections, background threads,
+warm-up) is started per worker in post_worker_init instead.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = "gevent"
+preload_app = True
+timeout = 120
+keep_alive = 5
+
+
+def on_starting(server):
+    """Migrate the schema before any worker serves; a failed migration stops the server"""
+    from app.config import Config
+    if not Config.SCHEMA_MIGRATE_ON_START:
+        return
+    from app.schema import migrate
+    try:
+        migrate()
+    except Exception as e:
+        server.log.error(f"Schema migration failed, not starting: {e}")
+        raise SystemExit(1)
+    server.log.info("Schema up to date")
+
+
+def when_ready(server):
+    """Map the shared vector index in the master, before workers are forked"""
+    try:
+        from app.vector_index import get_index
+        index = get_index()
+        if index is not None:
+            server.log.info(f"Vector index {index.version} mapped ({len(index)} chunks), shared by all workers")
+    except Exception as e:
+        server.log.warning(f"Vector index not preloaded: {e}")
+
+
+def post_worker_init(worker):
+    """Runs inside each worker after gevent has patched the process"""
+    from app.api import start_background_services
+    start_background_services()
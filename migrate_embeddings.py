@@ -37,7 +37,7 @@ def migrate():
             print(f"🔄 [Migration] Re-embedding chunk {i+1}/{len(chunks)}...")
             
             try:
-                new_embedding = generate_embedding(content)
+                new_embedding = generate_embedding(content, fail_fast=False)
                 
                 # Verify dimension
                 if len(new_embedding) != 768:
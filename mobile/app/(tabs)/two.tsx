@@ -1,9 +1,9 @@
-import { useState, useEffect, useRef } from "react"
+import { useState, useEffect } from "react"
 import { StyleSheet, ScrollView, Image, TouchableOpacity, Alert, Modal, TextInput, ActivityIndicator, Linking } from "react-native"
 import { Text, View } from "@/components/Themed"
 import Colors from "@/constants/Colors"
 import { useColorScheme } from "react-native"
-import { requestResume, checkAccessStatus, getDownloadUrl } from "@/services/api"
+import { requestResume, waitForAccessStatus, getDownloadUrl } from "@/services/api"
 import { Ionicons } from "@expo/vector-icons"
 
 export default function PortfolioScreen() {
@@ -15,23 +15,32 @@ export default function PortfolioScreen() {
   const [accessApproved, setAccessApproved] = useState(false)
   const [accessToken, setAccessToken] = useState<string | null>(null)
 
-  const pollInterval = useRef<any>(null)
-
-  // System Internal: resume_access_control polling
+  // System Internal: resume_access_control push channel (long-poll)
   useEffect(() => {
-    if (accessPending && accessToken && !accessApproved) {
-      pollInterval.current = setInterval(async () => {
-        const status = await checkAccessStatus(accessToken)
+    if (!(accessPending && accessToken && !accessApproved)) return
+
+    let cancelled = false
+    const waitForApproval = async () => {
+      let known = 'pending'
+      while (!cancelled) {
+        const status = await waitForAccessStatus(accessToken, known)
+        if (cancelled) return
         if (status === 'approved') {
           setAccessApproved(true)
           setAccessPending(false)
-          if (pollInterval.current) clearInterval(pollInterval.current)
+          return
         }
-      }, 5000) // Poll every 5s
+        if (status === 'error') {
+          await new Promise((resolve) => setTimeout(resolve, 5000)) // Back off, then reconnect
+        } else {
+          known = status
+        }
+      }
     }
+    waitForApproval()
 
     return () => {
-      if (pollInterval.current) clearInterval(pollInterval.current)
+      cancelled = true
     }
   }, [accessPending, accessToken, accessApproved])
 
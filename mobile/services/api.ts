@@ -5,6 +5,18 @@ import axios from 'axios';
 // if you are using an Android emulator, 10.0.2.2 usually works.
 const BASE_URL = 'https://rag-portfolio-mvjo.onrender.com';
 
+// Conversation id sent with every question so the backend can resolve
+// follow-ups ("what stack did that project use?") against earlier turns.
+let sessionId = newSessionId();
+
+function newSessionId() {
+  return `m-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+}
+
+export function resetSession() {
+  sessionId = newSessionId();
+}
+
 export function askStreamingQuestion(
   question: string,
   onChunk: (chunk: string) => void,
@@ -51,7 +63,7 @@ export function askStreamingQuestion(
     };
 
     xhr.onerror = () => reject(new Error('Network error'));
-    xhr.send(JSON.stringify({ question, mode }));
+    xhr.send(JSON.stringify({ question, mode, session_id: sessionId }));
   });
 }
 
@@ -60,6 +72,7 @@ export async function askQuestion(question: string, mode: string = 'auto') {
     const response = await axios.post(`${BASE_URL}/ask_sync`, {
       question: question,
       mode: mode,
+      session_id: sessionId,
     });
     return response.data;
   } catch (error) {
@@ -88,6 +101,22 @@ export async function checkAccessStatus(token: string) {
   }
 }
 
+// Long-poll: resolves as soon as the status differs from `since` (or after
+// ~25s with the unchanged status), so waiting costs one open request instead
+// of a DB read every few seconds.
+export async function waitForAccessStatus(token: string, since: string = 'pending') {
+  try {
+    const response = await axios.get(`${BASE_URL}/wait_access_status/${token}`, {
+      params: { since },
+      timeout: 35000,
+    });
+    return response.data.status;
+  } catch (error) {
+    console.error('Wait Access Status Error:', error);
+    return 'error';
+  }
+}
+
 export function getDownloadUrl(token: string) {
   return `${BASE_URL}/download_resume?token=${token}`;
 }
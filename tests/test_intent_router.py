@@ -0,0 +1,42 @@
+"""
+Intent routing (app/intent_router.py): which questions may be answered from
+the precomputed FAQ store.
+"""
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from app.intent_router import INTENTS, route  # noqa: E402
+
+
+@pytest.mark.parametrize("question", [
+    "What was his role in the SHAIDS project?",
+    "Tell me about the forgery detection project",
+    "What projects has he built with React?",
+    "What was the tech stack of the image forgery project?",
+    "What is React's role in his projects?",
+])
+def test_specific_questions_are_not_routed_to_a_generic_answer(question):
+    assert route(question) is None
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("What are his skills?", "technical_skills"),
+    ("What's his tech stack?", "technical_skills"),
+    ("Tell me about his projects", "projects"),
+    ("Show me his projects", "projects"),
+    ("Where did Sahil study?", "education"),
+    ("What internships has he done?", "experience"),
+    ("How do I contact him?", "contact"),
+])
+def test_generic_questions_are_routed(question, intent):
+    match = route(question)
+    assert match is not None and match.intent == intent
+
+
+def test_every_faq_question_routes_to_its_intent():
+    # The FAQ store answers INTENTS[x]["canonical"][0]
+    for name, spec in INTENTS.items():
+        match = route(spec["canonical"][0])
+        assert match is not None and match.intent == name, spec["canonical"][0]
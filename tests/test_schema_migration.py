@@ -0,0 +1,108 @@
+"""
+Migration of a plain query_logs table into monthly partitions (app/schema.py).
+Needs a scratch Postgres: TEST_DATABASE_URL=postgresql://... python -m pytest tests
+Every test runs in its own schema, dropped afterwards.
+"""
+
+import os
+import uuid
+from datetime import date, datetime
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.fixture
+def cur():
+    conn = psycopg2.connect(DATABASE_URL)
+    schema = f"test_schema_{uuid.uuid4().hex[:8]}"
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE SCHEMA {schema}; SET search_path TO {schema};")
+    try:
+        yield cursor
+    finally:
+        conn.rollback()
+        cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+        conn.commit()
+        conn.close()
+
+
+def _legacy_query_logs(cur, created_at_values):
+    cur.execute("""
+        CREATE TABLE query_logs (
+            id SERIAL PRIMARY KEY,
+            question TEXT, provider TEXT, confidence TEXT, user_ip TEXT,
+            created_at TIMESTAMP DEFAULT now()
+        );
+    """)
+    for created_at in created_at_values:
+        cur.execute("INSERT INTO query_logs (question, created_at) VALUES ('q', %s);", (created_at,))
+
+
+def _partitions(cur, table):
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s) ORDER BY 1;
+    """, (table,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def test_legacy_table_with_current_month_rows_is_attached(cur):
+    from app.schema import ensure_log_table
+
+    _legacy_query_logs(cur, [datetime(2026, 3, 1), datetime(2026, 10, 18, 12), None])
+    ensure_log_table(cur, "query_logs", today=TODAY)
+
+    assert _partitions(cur, "query_logs") == [
+        "query_logs_before_y2026m11",
+        "query_logs_default",
+        "query_logs_y2026m11",
+        "query_logs_y2026m12",
+    ]
+    cur.execute("SELECT count(*) FROM query_logs;")
+    assert cur.fetchone()[0] == 3
+
+    # New rows, this month and later, land in a partition
+    cur.execute("INSERT INTO query_logs (question) VALUES ('now') RETURNING id;")
+    assert cur.fetchone()[0] == 4
+    cur.execute("INSERT INTO query_logs (question, created_at) VALUES ('later', '2026-12-05');")
+
+
+def test_legacy_bound_covers_rows_dated_after_next_month(cur):
+    from app.schema import ensure_log_table
+
+    _legacy_query_logs(cur, [datetime(2027, 1, 2)])
+    ensure_log_table(cur, "query_logs", today=TODAY)
+
+    assert "query_logs_before_y2027m02" in _partitions(cur, "query_logs")
+    assert "query_logs_y2026m12" not in _partitions(cur, "query_logs")
+
+
+def test_maintenance_is_idempotent_after_migration(cur):
+    from app.schema import ensure_log_table, ensure_partitions
+
+    _legacy_query_logs(cur, [datetime(2026, 10, 1)])
+    ensure_log_table(cur, "query_logs", today=TODAY)
+    ensure_partitions(cur, "query_logs", today=date(2026, 11, 3))
+
+    assert "query_logs_y2027m01" in _partitions(cur, "query_logs")
+
+
+def test_rows_in_default_move_to_the_new_month_partition(cur):
+    from app.schema import ensure_log_table, ensure_partitions
+
+    ensure_log_table(cur, "download_events", today=TODAY)
+    # Maintenance did not run for months: January rows landed in DEFAULT
+    cur.execute("INSERT INTO download_events (email, created_at) VALUES ('a', '2027-01-10'), ('b', '2027-02-01');")
+    ensure_partitions(cur, "download_events", today=date(2027, 1, 5), ahead=0)
+
+    assert "download_events_y2027m01" in _partitions(cur, "download_events")
+    cur.execute("SELECT email FROM download_events_y2027m01;")
+    assert [row[0] for row in cur.fetchall()] == ["a"]
+    cur.execute("SELECT email FROM download_events_default;")
+    assert [row[0] for row in cur.fetchall()] == ["b"]
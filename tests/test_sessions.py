@@ -0,0 +1,46 @@
+"""
+Follow-up planning (app/sessions.py): when a question is rewritten with the
+previous topic and when the previous turn's chunks are reused.
+"""
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("requests")
+
+from app.sessions import Session, plan_followup  # noqa: E402
+
+JS_CHUNK = ("Projects: Portfolio site built with JavaScript and React", 0.8, "vector")
+
+
+def _session(question, chunks):
+    session = Session("test", max_turns=4)
+    session.add_turn(question, question, "answer", chunks)
+    return session
+
+
+def test_first_question_is_not_a_followup():
+    assert plan_followup("What about Java?", None) == ("What about Java?", None)
+
+
+def test_substring_of_a_previous_word_is_a_new_topic():
+    session = _session("What frontend work has he done?", [JS_CHUNK])
+    search_query, reused = plan_followup("And Java?", session)
+    assert reused is None
+
+
+def test_same_topic_reuses_previous_chunks():
+    session = _session("What frontend work has he done?", [JS_CHUNK])
+    search_query, reused = plan_followup("What about React?", session)
+    assert reused == [JS_CHUNK]
+
+
+def test_short_question_with_its_own_topic_is_not_a_followup():
+    session = _session("What frontend work has he done?", [JS_CHUNK])
+    assert plan_followup("Java experience?", session) == ("Java experience?", None)
+
+
+def test_short_question_without_a_topic_carries_the_previous_one():
+    session = _session("Tell me about the forgery detection project", [JS_CHUNK])
+    search_query, _ = plan_followup("Why?", session)
+    assert "forgery" in search_query and "detection" in search_query